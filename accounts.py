@@ -0,0 +1,206 @@
+# class to check several binance accounts, gathered in parallel processes
+# License: MIT
+# Author: mhl5k
+
+from concurrent.futures import ProcessPoolExecutor
+import contextlib
+import copy
+import io
+import logging
+import re
+
+from mhl5k.settings import Settings
+from cryptoset import CryptoSet
+from dataset import BinanceDataSet, printSection, showGrowthRow, showValue
+from history import HistoryMatrix
+from profiler import Profiler
+
+
+class Account:
+    """
+    One binance account of the settings. Without "accounts" the apiKey/apiSecret of the
+    settings is the only account, its files keep their names. Each entry of "accounts"
+    needs a name and may override every other setting, e.g.
+    {"name": "sub1", "apiKey": "...", "apiSecret": "...", "storage": "jsonl"}
+    """
+
+    __slots__ = ("name", "settings")
+
+    @staticmethod
+    def fromSettings(settings:Settings) -> list["Account"]:
+        allEntries:list[dict]=settings.current.get("accounts", [])
+        if len(allEntries)==0:
+            return [Account("",settings)]
+
+        accounts:list[Account]=[]
+        for entry in allEntries:
+            name=entry.get("name","")
+            # the name becomes part of the filenames, e.g. database-sub1.json
+            if re.fullmatch(r"[A-Za-z0-9_]+",name) is None:
+                raise ValueError(f"Account name '{name}' must consist of letters, digits and _ only")
+            if name in [account.name for account in accounts]:
+                raise ValueError(f"Account name '{name}' is used twice")
+
+            accountSettings=copy.copy(settings)
+            accountSettings.current={key: value for key, value in settings.current.items() if key!="accounts"}
+            accountSettings.current.update(entry)
+            accounts.append(Account(name,accountSettings))
+        return accounts
+
+    def __init__(self, name:str, settings:Settings):
+        self.name:str=name
+        self.settings:Settings=settings
+
+
+def _gatherAccount(account:Account, tickers:list, bypassCache:bool, sequential:bool) -> tuple[str, list[CryptoSet], str]:
+    # runs in a worker process, returns the output, the gathered sets and an error text
+    output=io.StringIO()
+    with contextlib.redirect_stdout(output):
+        try:
+            dataSet=BinanceDataSet(account.settings, bypassCache=bypassCache, account=account.name)
+            dataSet.loadData()
+            dataSet.gatherNewDataSet(sequential=sequential, tickers=tickers)
+        except Exception as E:
+            logging.exception(E)
+            return output.getvalue(), [], "%s" % (E)
+    return output.getvalue(), dataSet.unsavedSets, ""
+
+
+class AccountGroup:
+    """
+    Data sets of all accounts. With several accounts, every account is gathered in its own
+    worker process with one shared price ticker snapshot, the gathered sets are saved by the
+    main process. The analysis shows every account and the sums of all accounts.
+    """
+
+    def isMultiAccount(self) -> bool:
+        return len(self.accounts)>1
+
+    def iterDataSets(self):
+        # yields the data set of each account, with a section per account when there are several
+        for account in self.accounts:
+            if self.isMultiAccount():
+                printSection(f"Account {account.name}")
+            yield self.allDataSets[account.name]
+
+    def loadData(self):
+        for dataSet in self.iterDataSets():
+            dataSet.loadData()
+
+    def saveData(self):
+        for dataSet in self.iterDataSets():
+            dataSet.saveData()
+
+    def gatherNewDataSets(self, sequential:bool=False) -> dict[str, str]:
+        """
+        Gathers a new set of every account. A single account raises its error,
+        with several accounts the others are still gathered.
+
+        :return: error per account whose gathering failed
+        """
+        if not self.isMultiAccount():
+            self.allDataSets[self.accounts[0].name].gatherNewDataSet(sequential=sequential)
+            return {}
+
+        with Profiler.phase("gather"):
+            return self._gatherNewDataSets(sequential)
+
+    def _gatherNewDataSets(self, sequential:bool) -> dict[str, str]:
+        # one price snapshot for all accounts, so all totals are converted with the same prices
+        print("Gathering price tickers for %d accounts..." % (len(self.accounts)))
+        with Profiler.phase("gather.tickers"):
+            tickers=self.allDataSets[self.accounts[0].name].spotClient.ticker_price()
+
+        print("Gathering accounts with %d processes..." % (min(self.accountWorkers,len(self.accounts))))
+        allErrors:dict[str, str]={}
+        with ProcessPoolExecutor(max_workers=self.accountWorkers) as executor:
+            futures=[executor.submit(_gatherAccount,account,tickers,self.bypassCache,sequential) for account in self.accounts]
+
+            # output in order of the accounts, not in order of finishing
+            for account, dataSet, future in zip(self.accounts, self.iterDataSets(), futures):
+                output, gatheredSets, error=future.result()
+                print(output, end="")
+                if error!="":
+                    print("Error: %s" % (error))
+                    allErrors[account.name]=error
+                    continue
+                dataSet.addGatheredSets(gatheredSets)
+        return allErrors
+
+    def analyzeGrowthAndShow(self, compareNrOfDays:list[int]):
+        for dataSet in self.iterDataSets():
+            if len(dataSet.timeIndex)==0:
+                print("No datasets to analyze")
+                continue
+            dataSet.analyzeGrowthAndShow(compareNrOfDays)
+
+        if self.isMultiAccount():
+            with Profiler.phase("analyze"):
+                self._analyzeCombinedAndShow(compareNrOfDays)
+
+    def _analyzeCombinedAndShow(self, compareNrOfDays:list[int]):
+        printSection("Analyze all accounts")
+
+        # per account the before set of each nr. of days and the last set
+        allCompared:list[tuple[str, list[CryptoSet], CryptoSet]]=[]
+        for account in self.accounts:
+            dataSet=self.allDataSets[account.name]
+            if len(dataSet.timeIndex)>0:
+                first, allBefore, last=dataSet.getCompareSets(compareNrOfDays)
+                allCompared.append((account.name, allBefore, last))
+        if len(allCompared)==0:
+            return
+
+        def getGrowth(newer:float, older:float, last:CryptoSet, before:CryptoSet) -> HistoryMatrix.Growth:
+            return HistoryMatrix.Growth(newer,older,(last.timestamp-before.timestamp)/3600/24)
+
+        def getSumGrowths(currency:str, withoutDeposit:bool) -> list[HistoryMatrix.Growth]:
+            # from the oldest compared set of all accounts to the newest one, per nr. of days
+            allGrowths:list[HistoryMatrix.Growth]=[]
+            lastTimestamp=max(last.timestamp for name, allBefore, last in allCompared)
+            for horizon in range(len(compareNrOfDays)):
+                allNewer=[last.getTotalByName(currency) for name, allBefore, last in allCompared]
+                allOlder=[allBefore[horizon].getTotalByName(currency) for name, allBefore, last in allCompared]
+                days=(lastTimestamp-min(allBefore[horizon].timestamp for name, allBefore, last in allCompared))/3600/24
+                if withoutDeposit:
+                    allGrowths.append(HistoryMatrix.Growth(sum(t.total-t.deposit for t in allNewer),sum(t.total-t.deposit for t in allOlder),days))
+                else:
+                    allGrowths.append(HistoryMatrix.Growth(sum(t.total for t in allNewer),sum(t.total for t in allOlder),days))
+            return allGrowths
+
+        if len(compareNrOfDays)==1:
+            for currency in HistoryMatrix.CURRENCIES:
+                headerTitle=f"{currency} Total"
+                for name, allBefore, last in allCompared:
+                    newer, older=last.getTotalByName(currency), allBefore[0].getTotalByName(currency)
+                    showValue(name,getGrowth(newer.total,older.total,last,allBefore[0]),headerTitle=headerTitle)
+                    headerTitle=""
+
+                showValue(f"∑ {currency} all",getSumGrowths(currency,False)[0])
+                showValue(f"∑ {currency} -Depo",getSumGrowths(currency,True)[0])
+            return
+
+        # one column per nr. of days
+        allTitles=["%dd" % (days) if days>0 else "before" for days in compareNrOfDays]
+        for currency in HistoryMatrix.CURRENCIES:
+            headerTitle=f"{currency} Total"
+            for name, allBefore, last in allCompared:
+                newer=last.getTotalByName(currency).total
+                allGrowths=[getGrowth(newer,before.getTotalByName(currency).total,last,before) for before in allBefore]
+                showGrowthRow(name,newer,allGrowths,headerTitle=headerTitle,allTitles=allTitles)
+                headerTitle=""
+
+            for withoutDeposit in (False, True):
+                allGrowths=getSumGrowths(currency,withoutDeposit)
+                showGrowthRow(f"∑ {currency} {'-Depo' if withoutDeposit else 'all'}",allGrowths[0].newer,allGrowths)
+
+    def __init__(self, settings:Settings, bypassCache:bool=False):
+        self.accounts:list[Account]=Account.fromSettings(settings)
+        self.bypassCache:bool=bypassCache
+
+        # nr. of accounts gathered at the same time
+        self.accountWorkers:int=int(settings.current.get("accountWorkers", len(self.accounts)))
+
+        self.allDataSets:dict[str, BinanceDataSet]={
+            account.name: BinanceDataSet(account.settings, bypassCache=bypassCache, account=account.name) for account in self.accounts
+        }
@@ -0,0 +1,104 @@
+# class to analyze the whole history of all assets and set totals as time series
+# License: MIT
+# Author: mhl5k
+
+import numpy as np
+
+from mhl5k.colors import Colors
+from history import HistoryMatrix
+
+
+class HistoryAnalytics:
+    """
+    Time series over all snapshots of a HistoryMatrix, for the USDC value of every asset
+    and for the BTC/USDC set totals. Every series is computed for all columns at once
+    in one pass over the snapshots.
+    """
+
+    SECONDS_PER_YEAR: int = 365*24*3600
+
+    class Series:
+        """
+        Series of a snapshot x column matrix of values and the net flows since the snapshot before
+        (deposits minus withdrawals):
+        - growth: value to the value windowDays before
+        - adjustedGrowth: the same without deposits and withdrawals, from the time-weighted return index
+        - drawdown: fall of the return index from its former high
+        - volatility: standard deviation of the log returns between two snapshots, per year
+        """
+        def __init__(self, values:np.ndarray, flows:np.ndarray, timestamps:np.ndarray, windowDays:float):
+            values=np.asarray(values, dtype=np.float64).reshape(len(timestamps),-1)
+            flows=np.nan_to_num(np.asarray(flows, dtype=np.float64).reshape(len(timestamps),-1))
+
+            # return between two snapshots without the payments in between, 0 when there was no value before
+            previous, current=values[:-1], values[1:]
+            valid=np.isfinite(previous) & np.isfinite(current) & (previous>0)
+            returns=np.zeros(current.shape)
+            np.divide(current-flows[1:],previous,out=returns,where=valid)
+            returns=np.where(valid,returns-1.0,0.0)
+            valid&=returns>-1.0
+            returns=np.where(valid,returns,0.0)
+
+            # return index, starts at 1 for every column
+            self.index:np.ndarray=np.vstack([np.ones((1,values.shape[1])),np.cumprod(1.0+returns,axis=0)])
+
+            # snapshot at or before windowDays earlier, -1 when the history is shorter
+            starts=np.searchsorted(timestamps,timestamps-windowDays*24*3600,side="right")-1
+            hasStart=(starts>=0)[:,None]
+            starts=np.maximum(starts,0)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                self.growth:np.ndarray=np.where(hasStart & (values[starts]>0),values/values[starts]-1.0,np.nan)*100
+                self.adjustedGrowth:np.ndarray=np.where(hasStart,self.index/self.index[starts]-1.0,np.nan)*100
+            self.drawdown:np.ndarray=(self.index/np.maximum.accumulate(self.index,axis=0)-1.0)*100
+
+            # log returns of the valid intervals, per year by the median time between two snapshots
+            logReturns=np.where(valid,np.log1p(returns),np.nan)
+            periodsPerYear=HistoryAnalytics.SECONDS_PER_YEAR/np.median(np.diff(timestamps)) if len(timestamps)>1 else 0.0
+            self.volatility:np.ndarray=np.full(values.shape[1],np.nan)
+            hasReturns=valid.sum(axis=0)>1
+            if np.any(hasReturns):
+                self.volatility[hasReturns]=np.nanstd(logReturns[:,hasReturns],axis=0)*np.sqrt(periodsPerYear)*100
+
+        def getMaxDrawdown(self) -> np.ndarray:
+            return self.drawdown.min(axis=0)
+
+        def getTotalGrowth(self) -> np.ndarray:
+            return (self.index[-1]-1.0)*100
+
+    def show(self):
+        def showRow(name:str, value:float, series:"HistoryAnalytics.Series", column:int):
+            growth=series.growth[-1,column]
+            adjusted=series.adjustedGrowth[-1,column]
+            color=Colors.getColorByGLTZero(0.0 if np.isnan(adjusted) else adjusted)
+            print("%-13s %17.8f %s%11s %11s %11s%s %9.2f%% %9.2f%%" % (
+                name,value,color,
+                "n/a" if np.isnan(growth) else "%.2f%%" % growth,
+                "n/a" if np.isnan(adjusted) else "%.2f%%" % adjusted,
+                "%.2f%%" % series.getTotalGrowth()[column],
+                Colors.CRESET,series.getMaxDrawdown()[column],
+                0.0 if np.isnan(series.volatility[column]) else series.volatility[column]))
+
+        window="%gd" % (self.windowDays)
+        print("\n%-13s %17s %11s %11s %11s %10s %10s" % ("Asset","Value USDC",f"Growth {window}",f"Adj. {window}","Adj. all","Max DD","Vol p.a."))
+        last=len(self.history.timestamps)-1
+        for column, name in enumerate(self.history.assets):
+            # only assets of the last snapshot
+            if self.history.present[last,column]:
+                showRow(name,np.nan_to_num(self.history.allConverted["USDC"][last,column]),self.assetSeries,column)
+
+        print("\n%-13s %17s %11s %11s %11s %10s %10s" % ("Set total","Value",f"Growth {window}",f"Adj. {window}","Adj. all","Max DD","Vol p.a."))
+        for currency in HistoryMatrix.CURRENCIES:
+            showRow(f"∑ {currency}",self.history.allSetTotals[currency][last],self.totalSeries[currency],0)
+
+    def __init__(self, history:HistoryMatrix, windowDays:float=30):
+        self.history:HistoryMatrix=history
+        self.windowDays:float=windowDays
+
+        # USDC value of every asset, missing values are NaN
+        self.assetSeries=HistoryAnalytics.Series(history.allConverted["USDC"],history.getNetFlows("USDC"),history.timestamps,windowDays)
+
+        # set totals per currency
+        self.totalSeries:dict[str, HistoryAnalytics.Series]={
+            currency: HistoryAnalytics.Series(history.allSetTotals[currency],history.getSetNetFlows(currency),history.timestamps,windowDays)
+            for currency in HistoryMatrix.CURRENCIES
+        }
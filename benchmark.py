@@ -0,0 +1,255 @@
+# benchmarks of the in-memory and stored history
+# License: MIT
+# Author: mhl5k
+
+import argparse
+import copy
+import gc
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from analytics import HistoryAnalytics
+from conversiongraph import ConversionGraph
+from crypto import PriceConversion
+from crypto import Crypto
+from cryptoset import CryptoSet
+from history import HistoryMatrix
+from klinerating import KlineRatingEngine
+from storage import BinaryStorage, JsonLinesStorage
+from symbolindex import SymbolIndex
+from valuation import ValuationEngine
+
+
+def createSetJSON(nr:int, nrOfAssets:int) -> dict:
+    # synthetic set like it is stored by CryptoSet.toJSON
+    cryptoList:list=[]
+    for a in range(nrOfAssets):
+        value=random.random()*10
+        cryptoList.append({
+            "asset": f"A{a:03d}",
+            "orderWalletFree": "{:.8f}".format(value),
+            "orderWalletLocked": "0.00000000",
+            "orderWalletTotal": "{:.8f}".format(value),
+            "liquidSwapValue": "0.00000000",
+            "totalValue": "{:.8f}".format(value),
+            "paymentDeposit": "0.00000000",
+            "earnPlan": "0.00000000",
+            "convertedTotal": [
+                {"name": "BTC", "total": "{:.8f}".format(value/60000), "deposit": "0.00000000"},
+                {"name": "USDC", "total": "{:.8f}".format(value), "deposit": "0.00000000"}
+            ],
+            "earnFlexible": "0.00000000",
+            "earnLocked": "0.00000000",
+            "paymentWithdraw": "0.00000000",
+        })
+    return {
+        "uuid": f"00000000-0000-0000-0000-{nr:012d}",
+        "timestamp": "%s" % (1700000000.0+nr*3600),
+        "time": "2023-11-14 22:13:20.000000",
+        "crypto": cryptoList,
+        "totals": {
+            "BTC": {"name": "BTC", "total": "1.00000000", "deposit": "0.00000000"},
+            "USDC": {"name": "USDC", "total": "60000.00000000", "deposit": "0.00000000"}
+        }
+    }
+
+
+def benchmarkMemory(nrOfSets:int, nrOfAssets:int):
+    """
+    Memory of loaded CryptoSets, measured with tracemalloc.
+    """
+    allJSON=[createSetJSON(nr,nrOfAssets) for nr in range(nrOfSets)]
+    gc.collect()
+
+    tracemalloc.start()
+    startSize, _=tracemalloc.get_traced_memory()
+    allSets:list[CryptoSet]=[]
+    for entry in allJSON:
+        cryptoSet=CryptoSet()
+        cryptoSet.fromJSON(entry)
+        allSets.append(cryptoSet)
+    gc.collect()
+    size, peak=tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    size-=startSize
+    print("Memory of %d sets with %d assets: %.2f MB, %.0f bytes per crypto (peak %.2f MB)" % (
+        nrOfSets,nrOfAssets,size/1024/1024,size/(nrOfSets*nrOfAssets),(peak-startSize)/1024/1024))
+
+
+def createHistoryJSON(nrOfSets:int, nrOfAssets:int, changedPerSet:float=0.05) -> list[dict]:
+    # synthetic history, between two sets only some of the assets change
+    allJSON=[createSetJSON(0,nrOfAssets)]
+    for nr in range(1,nrOfSets):
+        entry=copy.deepcopy(allJSON[-1])
+        entry["uuid"]=f"00000000-0000-0000-0000-{nr:012d}"
+        entry["timestamp"]="%s" % (1700000000.0+nr*3600)
+        for crypto in random.sample(entry["crypto"],max(1,int(nrOfAssets*changedPerSet))):
+            value=random.random()*10
+            crypto["convertedTotal"][1]["total"]="{:.8f}".format(value)
+        allJSON.append(entry)
+    return allJSON
+
+
+def benchmarkDelta(nrOfSets:int, nrOfAssets:int, keyframeInterval:int):
+    """
+    Size and load time of the logs with all sets complete and with sets stored as changes.
+    """
+    allJSON=createHistoryJSON(nrOfSets,nrOfAssets)
+
+    with tempfile.TemporaryDirectory() as directory:
+        for storageClass in (JsonLinesStorage, BinaryStorage):
+            for interval in (0, keyframeInterval):
+                # a storage in the temporary directory, never the database files of the script
+                filename=os.path.join(directory,f"{storageClass.name}-{interval}")
+
+                class TempStorage(storageClass):
+                    def getFilename(self) -> str:
+                        return filename
+
+                    def exists(self) -> bool:
+                        return os.path.exists(filename)
+
+                TempStorage(keyframeInterval=interval).rewrite(allJSON)
+                size=os.path.getsize(filename)
+
+                start=time.perf_counter()
+                loaded=TempStorage(keyframeInterval=interval).load()
+                loadTime=time.perf_counter()-start
+
+                storage=TempStorage(keyframeInterval=interval)
+                refs=storage.loadIndex()
+                start=time.perf_counter()
+                last=list(storage.iterSelected([refs[-1]]))[0]
+                lastTime=time.perf_counter()-start
+
+                if loaded!=allJSON or last!=allJSON[-1]:
+                    raise ValueError(f"{storageClass.name} with keyframe interval {interval} does not give the sets back")
+                print("%-6s keyframe interval %3d: %8.2f MB, load all %.3f s, load last %.4f s" % (
+                    storageClass.name,interval,size/1024/1024,loadTime,lastTime))
+
+
+def benchmarkAnalytics(nrOfSets:int, nrOfAssets:int):
+    """
+    Time of the analytics of a whole history, sets are built one after another like from the storage.
+    """
+    allJSON=[createSetJSON(nr,nrOfAssets) for nr in range(nrOfSets)]
+
+    def iterCryptoSets():
+        for entry in allJSON:
+            cryptoSet=CryptoSet()
+            cryptoSet.fromJSON(entry)
+            yield cryptoSet
+
+    start=time.perf_counter()
+    history=HistoryMatrix(iterCryptoSets())
+    historyTime=time.perf_counter()-start
+
+    start=time.perf_counter()
+    HistoryAnalytics(history,30)
+    analyticsTime=time.perf_counter()-start
+
+    print("Analytics of %d sets with %d assets: history %.2f s, series %.2f s" % (nrOfSets,nrOfAssets,historyTime,analyticsTime))
+
+
+def benchmarkValuation(nrOfSets:int, nrOfAssets:int, currencies:list[str]):
+    """
+    Time of valuing all cryptos of the sets in the given currencies, one currency after another
+    like before and with one pass of the valuation engine. Like a gathering, every set is valued
+    with its own engine.
+    """
+    allAssets=[f"A{a:03d}" for a in range(nrOfAssets)]
+    priceTickers=[{"symbol": f"{asset}USDC", "price": "%.8f" % (random.random()*10)} for asset in allAssets]
+    priceTickers+=[{"symbol": "BTCUSDC", "price": "60000"}, {"symbol": "EURUSDC", "price": "1.08"}, {"symbol": "ETHUSDC", "price": "3000"}]
+    symbolIndex=SymbolIndex.fromTickers(priceTickers,allAssets+["BTC","EUR","ETH"])
+    PriceConversion.graph=ConversionGraph({t["symbol"]: float(t["price"]) for t in priceTickers},symbolIndex,bridges=["USDC"],targets=currencies)
+
+    allCryptoSets=[]
+    for nr in range(nrOfSets):
+        cryptoSet=CryptoSet()
+        cryptoSet.fromJSON(createSetJSON(nr,nrOfAssets))
+        allCryptoSets.append(cryptoSet)
+
+    start=time.perf_counter()
+    for cryptoSet in allCryptoSets:
+        for currency in currencies:
+            for crypto in cryptoSet.allCryptos.values():
+                crypto.updateTotalIn(currency)
+            PriceConversion.getUnconvertible(currency,cryptoSet.allCryptos.keys())
+    perCurrencyTime=time.perf_counter()-start
+
+    start=time.perf_counter()
+    for cryptoSet in allCryptoSets:
+        ValuationEngine(currencies).valueCryptos(cryptoSet.allCryptos)
+    engineTime=time.perf_counter()-start
+
+    print("Valuation of %d sets with %d assets in %s: per currency %.2f s, engine %.2f s" % (nrOfSets,nrOfAssets,", ".join(currencies),perCurrencyTime,engineTime))
+
+
+def benchmarkRating(nrOfSets:int, nrOfAssets:int):
+    """
+    Time of rating all assets like one run of the script per set, the klines change only with every 24th set.
+    """
+    allCryptos:list[Crypto]=[]
+    for a in range(nrOfAssets):
+        crypto=Crypto(f"A{a:03d}")
+        crypto.monthKlines={"symbol": "USDC", "volumes": [random.random()*1e6 for m in range(12)], "closes": [random.random()*10 for m in range(12)]}
+        allCryptos.append(crypto)
+
+    with tempfile.TemporaryDirectory() as directory:
+        # ratings in the temporary directory, never the ratings of the script
+        filename=os.path.join(directory,"ratings.json")
+
+        class TempEngine(KlineRatingEngine):
+            def getFilename(self) -> str:
+                return filename
+
+            def exists(self) -> bool:
+                return os.path.exists(filename)
+
+        uncached=TempEngine()
+        ratingTime=0.0
+        cachedTime=0.0
+        for nr in range(nrOfSets):
+            if nr%24==0:
+                # the open candle of every asset changes
+                for crypto in allCryptos:
+                    crypto.monthKlines={**crypto.monthKlines, "closes": crypto.monthKlines["closes"][:-1]+[random.random()*10]}
+
+            start=time.perf_counter()
+            uncached._rate(allCryptos)
+            ratingTime+=time.perf_counter()-start
+
+            # every run starts with the ratings of the run before
+            start=time.perf_counter()
+            engine=TempEngine()
+            engine.rateAll(allCryptos)
+            engine.save()
+            cachedTime+=time.perf_counter()-start
+
+        print("Rating of %d runs with %d assets: %.2f s, with ratings.json %.2f s, %d ratings stored" % (nrOfSets,nrOfAssets,ratingTime,cachedTime,len(engine.allRatings)))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmarks of the history representation.')
+    parser.add_argument('--sets', type=int, help='Nr. of sets', default=1000)
+    parser.add_argument('--assets', type=int, help='Nr. of assets per set', default=100)
+    parser.add_argument('--delta', type=int, help='Compare the logs stored complete and as changes with this keyframe interval', default=0)
+    parser.add_argument('--analytics', action='store_true', help='Time of the analytics of the whole history', default=False)
+    parser.add_argument('--rating', action='store_true', help='Time of the kline rating of all assets', default=False)
+    parser.add_argument('--valuation', nargs='*', help='Time of valuing all cryptos in these currencies (default BTC USDC EUR ETH)', default=None)
+    args = parser.parse_args()
+
+    random.seed(1)
+    if args.delta>0:
+        benchmarkDelta(args.sets,args.assets,args.delta)
+    elif args.analytics:
+        benchmarkAnalytics(args.sets,args.assets)
+    elif args.rating:
+        benchmarkRating(args.sets,args.assets)
+    elif args.valuation is not None:
+        benchmarkValuation(args.sets,args.assets,args.valuation or ["BTC", "USDC", "EUR", "ETH"])
+    else:
+        benchmarkMemory(args.sets,args.assets)
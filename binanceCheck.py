@@ -5,13 +5,16 @@
 
 import logging
 import argparse
+from datetime import datetime
 from binance.lib.utils import config_logging
-from dataset import BinanceDataSet
+from accounts import AccountGroup
+from daemon import CollectorDaemon
 from mhl5k.settings import Settings
 from mhl5k.files import Files
+from profiler import Profiler
 
 
-VERSION = "0.70"
+VERSION = "0.75"
 
 
 # Functions and constants
@@ -20,15 +23,36 @@ VERSION = "0.70"
 APIURL = "https://api.binance.com"
 
 
+def parseDate(text:str) -> float:
+    # local date as YYYY-MM-DD
+    try:
+        return datetime.strptime(text, "%Y-%m-%d").timestamp()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid date {text}, expected YYYY-MM-DD")
+
+
 # Main start up
 if __name__ == "__main__":
     print(f"Binance Check {VERSION}")
 
     # parse command line
     parser = argparse.ArgumentParser(description='Check binance account, gathers data and compare values between dates.')
-    parser.add_argument('-d', '--days', type=int, help='Nr. of days to go back for comparison', default=0)
+    parser.add_argument('-d', '--days', type=int, nargs='+', help='Nr. of days to go back for comparison, several ones are shown as columns, e.g. -d 1 7 30 365', default=[0])
     parser.add_argument('-g', '--no-gather', action='store_true', help='Do not gather new dataset', default=False)
     parser.add_argument('-s', '--no-save', action='store_true', help='Do not save gathered dataset', default=False)
+    parser.add_argument('--no-cache', action='store_true', help='Do not use cached responses, fetch everything again', default=False)
+    parser.add_argument('--compact', action='store_true', help='Compact the storage, move klines of older datasets into the kline archive and exit', default=False)
+    parser.add_argument('--import-json', action='store_true', help='Import database.json into the jsonl, binary or sqlite storage and exit', default=False)
+    parser.add_argument('--export-json', action='store_true', help='Export the configured storage into database.json and exit', default=False)
+    parser.add_argument('-a', '--asset', type=str, help='Show history of an asset and exit', default="")
+    parser.add_argument('--analytics', action='store_true', help='Show growth, drawdown and volatility of the whole history and exit', default=False)
+    parser.add_argument('--window', type=float, help='Nr. of days of the rolling growth of --analytics', default=30)
+    parser.add_argument('--revalue', action='store_true', help='Re-price the converted totals of stored datasets with daily prices and exit', default=False)
+    parser.add_argument('--since', type=parseDate, help='First day (YYYY-MM-DD) of the datasets of --revalue', default=0.0)
+    parser.add_argument('--until', type=parseDate, help='Last day (YYYY-MM-DD) of the datasets of --revalue', default=None)
+    parser.add_argument('-p', '--profile', action='store_true', help='Append profiling summary as JSON line to profile.jsonl', default=False)
+    parser.add_argument('--sequential', action='store_true', help='Gather all requests one after another (no worker pool)', default=False)
+    parser.add_argument('--daemon', action='store_true', help='Keep running and gather a new dataset every gatherInterval seconds', default=False)
 
     args = parser.parse_args()
 
@@ -41,22 +65,64 @@ if __name__ == "__main__":
         logging.basicConfig(filename=Files.getLoggingFilenameWithPath(extension="Check"), level=logging.DEBUG, filemode="w")
         config_logging(logging, logging.DEBUG)
 
-        # Binance Data Set
-        binanceAccountDataSet = BinanceDataSet(settings)
-        binanceAccountDataSet.loadData()
+        # Binance Data Set of each account
+        accountGroup = AccountGroup(settings, bypassCache=args.no_cache)
+        accountGroup.loadData()
+
+        # maintenance commands of the storage
+        if args.import_json or args.export_json or args.compact:
+            for binanceAccountDataSet in accountGroup.iterDataSets():
+                if args.import_json:
+                    binanceAccountDataSet.importJSONDatabase()
+                elif args.export_json:
+                    binanceAccountDataSet.exportJSONDatabase()
+                else:
+                    binanceAccountDataSet.compactData()
+            exit(0)
+
+        if args.asset!="":
+            for binanceAccountDataSet in accountGroup.iterDataSets():
+                binanceAccountDataSet.showAssetHistory(args.asset)
+            exit(0)
+
+        if args.analytics:
+            for binanceAccountDataSet in accountGroup.iterDataSets():
+                binanceAccountDataSet.showAnalytics(args.window)
+            Profiler.printSummary()
+            exit(0)
+
+        if args.revalue:
+            # until the end of the last day
+            untilTimestamp = args.until+24*3600-0.001 if args.until is not None else datetime.now().timestamp()
+            for binanceAccountDataSet in accountGroup.iterDataSets():
+                binanceAccountDataSet.revalueStoredSets(args.since, untilTimestamp, sequential=args.sequential)
+            Profiler.printSummary()
+            exit(0)
+
+        # keeps running until SIGINT/SIGTERM
+        if args.daemon:
+            daemon = CollectorDaemon(accountGroup, jitter=float(settings.current.get("gatherJitter", 60)), sequential=args.sequential,
+                                     save=not args.no_save, profileFilename=Files.getProfileFilenameWithPath() if args.profile else None)
+            daemon.run()
+            exit(0)
 
         # only gather new data if not disabled
         if args.no_gather == False:
-            binanceAccountDataSet.gatherNewDataSet()
+            accountGroup.gatherNewDataSets(sequential=args.sequential)
 
         # only save data if not disabled
         if args.no_save == False:
-            binanceAccountDataSet.saveData()
+            accountGroup.saveData()
 
         print("Done")
 
-        # analyze datasets
-        binanceAccountDataSet.analyzeGrowthAndShow(compareNrOfDays)
+        # analyze datasets, with several accounts also the sums of all accounts
+        accountGroup.analyzeGrowthAndShow(compareNrOfDays)
+
+        # show where the time went
+        Profiler.printSummary()
+        if args.profile:
+            Profiler.appendJSON(Files.getProfileFilenameWithPath())
 
     except Exception as E:
         print("Error: %s" % E)
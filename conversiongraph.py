@@ -0,0 +1,94 @@
+# class to precompute conversion rates between assets from price tickers
+# License: MIT
+# Author: mhl5k
+
+import logging
+
+from symbolindex import SymbolIndex
+
+
+class ConversionGraph:
+
+    def _addEdge(self, fromAsset:str, toAsset:str, rate:float):
+        # first edge wins, direct pairs are added before reverse pairs
+        edges=self.allEdges.setdefault(fromAsset,{})
+        if toAsset not in edges:
+            edges[toAsset]=rate
+
+    def precompute(self, toAsset:str):
+        """
+        Computes the rate of every asset to the given asset. Routes with fewer hops
+        win, routes of the same length are chosen by the order of the bridge assets.
+        Only bridge assets are used in between.
+        """
+        rates:dict[str, float]={toAsset: 1.0}
+        routes:dict[str, list[str]]={toAsset: [toAsset]}
+
+        # start at the destination, each hop adds all assets with a pair to an asset reached before
+        reached:list[str]=[toAsset]
+        for hop in range(self.maxHops):
+            nextReached:list[str]=[]
+            for via in reached:
+                if via!=toAsset and via not in self.bridges:
+                    continue
+                for fromAsset, rate in self.allIncoming.get(via,{}).items():
+                    if fromAsset in rates:
+                        continue
+                    rates[fromAsset]=rate*rates[via]
+                    routes[fromAsset]=[fromAsset]+routes[via]
+                    nextReached.append(fromAsset)
+            # expand bridges in configured order on next level
+            reached=sorted(nextReached, key=lambda a: self.bridges.index(a) if a in self.bridges else len(self.bridges))
+
+        self.allRates[toAsset]=rates
+        self.allRoutes[toAsset]=routes
+        logging.debug(f"Conversion graph to {toAsset}: {len(rates)} assets convertible")
+
+    def getRate(self, fromAsset:str, toAsset:str) -> float | None:
+        """
+        Returns the rate to convert fromAsset into toAsset, or None if not convertible.
+        """
+        if toAsset not in self.allRates:
+            self.precompute(toAsset)
+        return self.allRates[toAsset].get(fromAsset)
+
+    def getRoute(self, fromAsset:str, toAsset:str) -> list[str]:
+        if toAsset not in self.allRoutes:
+            self.precompute(toAsset)
+        return self.allRoutes[toAsset].get(fromAsset,[])
+
+    def getUnconvertible(self, toAsset:str, assets) -> list[str]:
+        """
+        Returns all given assets which cannot be converted into toAsset.
+        """
+        if toAsset not in self.allRates:
+            self.precompute(toAsset)
+        rates=self.allRates[toAsset]
+        return [asset for asset in assets if asset not in rates]
+
+    def __init__(self, priceTickers:dict[str, float], symbolIndex:SymbolIndex, bridges:list[str], maxHops:int=2, targets:list[str]|None=None):
+        # assets allowed in between a route, in order of preference
+        self.bridges:list[str]=list(bridges)
+        self.maxHops:int=maxHops
+
+        # rate per edge, allEdges[from][to] and the same edges keyed by destination
+        self.allEdges:dict[str, dict[str, float]]={}
+        for symbol, (base, quote) in symbolIndex.allPairs.items():
+            price=priceTickers.get(symbol)
+            if price is not None:
+                self._addEdge(base,quote,price)
+        for symbol, (base, quote) in symbolIndex.allPairs.items():
+            price=priceTickers.get(symbol)
+            if price is not None and price>0.0:
+                self._addEdge(quote,base,1.0/price)
+
+        self.allIncoming:dict[str, dict[str, float]]={}
+        for fromAsset, edges in self.allEdges.items():
+            for toAsset, rate in edges.items():
+                self.allIncoming.setdefault(toAsset,{})[fromAsset]=rate
+
+        # precomputed rates and routes per destination asset
+        self.allRates:dict[str, dict[str, float]]={}
+        self.allRoutes:dict[str, dict[str, list[str]]]={}
+        for toAsset in targets or []:
+            self.precompute(toAsset)
@@ -2,10 +2,12 @@
 # License: MIT
 # Author: mhl5k
 
-import json
 import logging
+import sys
 
-from binance.spot import Spot as SpotClient
+from symbolindex import SymbolIndex
+from conversiongraph import ConversionGraph
+from profiler import Profiler
 
 
 class PriceConversion:
@@ -13,99 +15,96 @@ class PriceConversion:
     # all price tickers
     allAssets:list[str] = []
     allGatheredPriceTickers:dict[str, float] = {}
+    symbolIndex:SymbolIndex = SymbolIndex()
+
+    # precomputed conversion rates, bridge assets used for routing
+    graph:ConversionGraph = ConversionGraph({}, SymbolIndex(), [])
+    bridges:list[str] = ["USDC", "USDT"]
+    maxHops:int = 2
 
     @staticmethod
-    def init(accountData,spotClient:SpotClient):
+    def init(accountData,priceTickers:list,symbolIndex:SymbolIndex|None=None,targets:list[str]|None=None):
         logging.debug("Generating list of all assets")
         PriceConversion.allAssets = [entry["asset"] for entry in accountData["balances"]]
 
+        # available pairs, built from the tickers when not given
+        if symbolIndex is None:
+            symbolIndex=SymbolIndex.fromTickers(priceTickers,PriceConversion.allAssets)
+        PriceConversion.symbolIndex=symbolIndex
+
         logging.debug("Initializing price ticker once from binance...")
-        rawlist=spotClient.ticker_price()
+        rawlist=priceTickers
         # convert to dict with "ETHBTC":"0.03270000","LTCBTC":"0.00097200"
         PriceConversion.allGatheredPriceTickers = {
             entry["symbol"]: float(entry["price"]) for entry in rawlist
         }
-        logging.debug(json.dumps(PriceConversion.allGatheredPriceTickers, indent=4, sort_keys=False))
+        Profiler.debugJSON(PriceConversion.allGatheredPriceTickers)
+
+        # precompute rates of all assets to the requested quote currencies
+        with Profiler.phase("conversion.graph"):
+            PriceConversion.graph=ConversionGraph(PriceConversion.allGatheredPriceTickers,symbolIndex,
+                                                  bridges=PriceConversion.bridges,maxHops=PriceConversion.maxHops,targets=targets)
 
     @staticmethod
-    def _getPriceFromGatheredPriceTickers(symbolPair: str) -> float:
-        # check whether symbol is in gathered tickers
-        if symbolPair in PriceConversion.allGatheredPriceTickers:
-            price:float = float(PriceConversion.allGatheredPriceTickers[symbolPair])
-            logging.debug(f"Found price for {symbolPair} in gathered tickers: {price}")
-            return price
-        else:
-            error=f"Price for {symbolPair} not found in gathered tickers!"
-            logging.debug(error)
-            raise ValueError(error)
+    def getRate(fromCrypto:str, toCrypto:str) -> float | None:
+        """
+        Returns the precomputed rate from one crypto to another, None if not convertible.
+        """
+        return PriceConversion.graph.getRate(fromCrypto,toCrypto)
+
+    @staticmethod
+    def getUnconvertible(toCrypto:str, cryptoNames) -> list[str]:
+        return PriceConversion.graph.getUnconvertible(toCrypto,cryptoNames)
 
     # return price/value for a given crypto name and amount
     # default conversion is to BTC, but can every crypto
-    # if not found, function will try to convert over USDC
+    # if not found, function will try to convert over bridge assets (USDC, USDT by default)
     # can be called from outside
     @staticmethod
     def getPriceForCrypto(fromCrypto:str, fromCryptoAmount:float, toCrypto:str, allowRoute:bool=True) -> float:
-        # try to convert
-        logging.debug(f"--- getPriceForCrypto --- {fromCrypto}{toCrypto}  ---")
-        logging.debug(f"Try to convert {fromCryptoAmount:.8f} {fromCrypto} to {toCrypto}")
-
-        # 1. No conversion needed
-        if fromCrypto==toCrypto:
-            logging.debug(toCrypto+" given, no conversion required.")
-            return fromCryptoAmount
-
-        # 2. Direct Pair: e.g. ETHBTC
-        pair = fromCrypto + toCrypto
-        try:
-            price = PriceConversion._getPriceFromGatheredPriceTickers(pair)
-            value_for_crypto = fromCryptoAmount * price
-            logging.debug(f"Using direct pair {pair}: {value_for_crypto:.8f} {toCrypto}")
-            return value_for_crypto
-        except ValueError:
-            logging.debug(f"Direct pair {pair} not found.")
-
-        # 3. Reverse Pair: e.g. BTCETH
-        reverse_pair = toCrypto + fromCrypto
-        try:
-            price = PriceConversion._getPriceFromGatheredPriceTickers(reverse_pair)
-            value_for_crypto = fromCryptoAmount / price
-            logging.debug(f"Using reverse pair {reverse_pair}: {value_for_crypto:.8f} {toCrypto}")
-            return value_for_crypto
-        except ValueError:
-            logging.debug(f"Reverse pair {reverse_pair} not found.")
-
-        # 4. Fallback: over USDC, if possible
-        route_list = ["USDC", "USDT"]
-        if allowRoute:
-            for route_over in route_list:
-                if fromCrypto != route_over and toCrypto != route_over:
-                    try:
-                        logging.debug(f"Trying to route over {route_over}...")
-                        routed_value = PriceConversion.getPriceForCrypto(fromCrypto, fromCryptoAmount, route_over, False)
-                        value_for_crypto = PriceConversion.getPriceForCrypto(route_over, routed_value, toCrypto, False)
-                        logging.debug(f"{route_over} routed {fromCrypto}->{toCrypto}: {value_for_crypto:.8f} {toCrypto}")
-                        return value_for_crypto
-                    except ValueError:
-                        logging.debug(f"Routing over {route_over} failed for {fromCrypto}->{toCrypto}!")
-
-        # 5. Alles gescheitert -> Debughilfe + Fehler
+        rate=PriceConversion.getRate(fromCrypto,toCrypto)
+        if rate is not None and (allowRoute or len(PriceConversion.graph.getRoute(fromCrypto,toCrypto))<=2):
+            logging.debug(f"Converted {fromCryptoAmount:.8f} {fromCrypto} over {PriceConversion.graph.getRoute(fromCrypto,toCrypto)}: {fromCryptoAmount*rate:.8f} {toCrypto}")
+            return fromCryptoAmount*rate
+
         # mögliche Paare zum Debuggen ausgeben
-        possible_pairs = []
-        for key in PriceConversion.allGatheredPriceTickers:
-            if key.startswith(fromCrypto) or key.endswith(fromCrypto):
-                possible_pairs.append(key)
+        possible_pairs = PriceConversion.symbolIndex.getPairsOf(fromCrypto)
 
         # nach außen klar signalisieren: keine Conversion möglich
         raise ValueError(f"Cannot convert {fromCrypto} to {toCrypto}, possible pairs: {possible_pairs if len(possible_pairs)>0 else 'none'}")
 
 
+def _toFloat(value) -> float:
+    # zero values share one float object, most fields of most cryptos are zero
+    number=float(value)
+    return 0.0 if number==0.0 else number
+
+
 class Crypto:
 
+    # no __dict__ per object, a history holds thousands of sets with hundreds of cryptos
+    __slots__ = (
+        "name", "orderWalletLocked", "orderWalletFree", "orderWalletTotal", "liquidSwapValue",
+        "earnFlexible", "earnLocked", "earnPlan", "paymentDeposit", "paymentWithdraw", "allTotals",
+        "hasFlexiblePossibility", "canUseFlexible", "hasLockedPossibility", "canUseLocked",
+        "monthKlines", "rating"
+    )
+
+    # shared by all cryptos without klines, replaced and never changed in place
+    NO_KLINES: dict = {
+        "symbol": "USDC",
+        "volumes": [],
+        "closes": []
+    }
+
     class ConvertedTotal:
-        def __init__(self, name:str):
-            self.name:str=name
-            self.total:float=0.0
-            self.deposit:float=0.0
+
+        __slots__ = ("name", "total", "deposit")
+
+        def __init__(self, name:str, total:float=0.0, deposit:float=0.0):
+            self.name:str=sys.intern(name)
+            self.total:float=total
+            self.deposit:float=deposit
 
         def set(self, total:float, deposit:float):
             self.total=total
@@ -122,9 +121,9 @@ class Crypto:
             return jsonDict
 
         def fromJSON(self, jsonContent:dict):
-            self.name=jsonContent["name"]
-            self.total=float(jsonContent["total"])
-            self.deposit=float(jsonContent["deposit"])
+            self.name=sys.intern(jsonContent["name"])
+            self.total=_toFloat(jsonContent["total"])
+            self.deposit=_toFloat(jsonContent["deposit"])
 
     def getTotal(self) -> float:
         return self.orderWalletTotal+self.liquidSwapValue+self.earnFlexible+self.earnLocked
@@ -152,27 +151,22 @@ class Crypto:
     def addToPaymentWithdraw(self,toWithdraw:float):
         self.paymentWithdraw+=toWithdraw
 
-    def updateTotalIn(self,toSymbol:str) -> ConvertedTotal:
-        try:
-            logging.debug(f"Updating total {toSymbol} for {self.name}")
-            total:float=PriceConversion.getPriceForCrypto(self.name,self.getTotal(),toSymbol)
+    def updateTotalIn(self,toSymbol:str) -> "Crypto.ConvertedTotal | None":
+        # None when crypto cannot be converted to toSymbol
+        rate=PriceConversion.getRate(self.name,toSymbol)
+        if rate is None:
+            return None
 
-            logging.debug(f"Updating total Deposit in {toSymbol} for {self.name}")
-            deposit:float=PriceConversion.getPriceForCrypto(self.name,self.paymentDeposit,toSymbol)
+        t:Crypto.ConvertedTotal=Crypto.ConvertedTotal(toSymbol)
+        t.set(self.getTotal()*rate,self.paymentDeposit*rate)
+        self.allTotals[t.name]=t
 
-            t:Crypto.ConvertedTotal=Crypto.ConvertedTotal(toSymbol)
-            t.set(total,deposit)
-            self.allTotals.append(t)
-
-            return t
-
-        except ValueError as E:
-            raise E
+        return t
 
     def toJSON(self) -> dict:
         totalList:list = []
         entry:Crypto.ConvertedTotal = None
-        for entry in self.allTotals:
+        for entry in self.allTotals.values():
             totalList.append(entry.toJSON())
 
         jsonDict = {
@@ -193,50 +187,60 @@ class Crypto:
             "earnFlexible": "{:.8f}".format(self.earnFlexible),
             "earnLocked": "{:.8f}".format(self.earnLocked),
             # V7
-            "klines": self.monthKlines
+            "klines": self.monthKlines,
+            # V9
+            "paymentWithdraw": "{:.8f}".format(self.paymentWithdraw)
         }
 
-        logging.debug(json.dumps(jsonDict, indent=4, sort_keys=False))
+        Profiler.debugJSON(jsonDict)
         return jsonDict
 
     def fromJSON(self, jsonContent:dict):
-        self.name=jsonContent["asset"]
-        self.orderWalletFree=float(jsonContent["orderWalletFree"])
-        self.orderWalletLocked=float(jsonContent["orderWalletLocked"])
-        self.orderWalletTotal=float(jsonContent["orderWalletTotal"])
-        self.liquidSwapValue=float(jsonContent["liquidSwapValue"])
+        self.name=sys.intern(jsonContent["asset"])
+        self.orderWalletFree=_toFloat(jsonContent["orderWalletFree"])
+        self.orderWalletLocked=_toFloat(jsonContent["orderWalletLocked"])
+        self.orderWalletTotal=_toFloat(jsonContent["orderWalletTotal"])
+        self.liquidSwapValue=_toFloat(jsonContent["liquidSwapValue"])
         # version 1, migrated in 4 to convertedTotal
         if "savingsWalletFlexible" in jsonContent:
-            self.earnFlexible=float(jsonContent["savingsWalletFlexible"])
+            self.earnFlexible=_toFloat(jsonContent["savingsWalletFlexible"])
         if "totalBTCValue" in jsonContent:
-            totalBTCValue=float(jsonContent["totalBTCValue"])
+            totalBTCValue=_toFloat(jsonContent["totalBTCValue"])
             btcTotal=Crypto.ConvertedTotal("BTC")
             btcTotal.set(totalBTCValue,0.0)
-            self.allTotals.append(btcTotal)
+            self.allTotals[btcTotal.name]=btcTotal
+
+        # version 2
+        if "paymentDeposit" in jsonContent:
+            self.paymentDeposit=_toFloat(jsonContent["paymentDeposit"])
 
         # version 3
         if "earnStaking" in jsonContent:
-            self.earnLocked=float(jsonContent["earnStaking"])
+            self.earnLocked=_toFloat(jsonContent["earnStaking"])
         if "earnPlan" in jsonContent:
-            self.earnPlan=float(jsonContent["earnPlan"])
+            self.earnPlan=_toFloat(jsonContent["earnPlan"])
         # version 4
         if "convertedTotal" in jsonContent:
             clist:list=jsonContent["convertedTotal"]
             for entry in clist:
                 c=Crypto.ConvertedTotal(entry["name"])
                 c.fromJSON(entry)
-                self.allTotals.append(c)
+                # first entry wins, as with the former list
+                self.allTotals.setdefault(c.name,c)
         # version 5
         if "earnFlexible" in jsonContent:
-            self.earnFlexible=float(jsonContent["earnFlexible"])
+            self.earnFlexible=_toFloat(jsonContent["earnFlexible"])
         if "earnLocked" in jsonContent:
-            self.earnLocked=float(jsonContent["earnLocked"])
+            self.earnLocked=_toFloat(jsonContent["earnLocked"])
         # version 6
         if "growth" in jsonContent:
             self.rating = str(jsonContent["growth"])
         # version 7
         if "klines" in jsonContent:
             self.monthKlines=jsonContent["klines"]
+        # version 9
+        if "paymentWithdraw" in jsonContent:
+            self.paymentWithdraw=_toFloat(jsonContent["paymentWithdraw"])
 
     def getConvertedTotalByName(self, totalSymbol: str) -> "Crypto.ConvertedTotal | None":
         """
@@ -245,14 +249,10 @@ class Crypto:
         :param totalSymbol: the symbol of the crypto to find the total for
         :return: the Crypto.ConvertedTotal object for the given crypto symbol, or None if not found
         """
-        for entry in self.allTotals:
-            if entry.name == totalSymbol:
-                return entry
-        return None
+        return self.allTotals.get(totalSymbol)
 
-    def __init__(self, setName:str, setSpotClient:SpotClient):
-        self.name=setName
-        self.spotClient=setSpotClient
+    def __init__(self, setName:str):
+        self.name:str=sys.intern(setName)
 
         self.orderWalletLocked:float=0.0
         self.orderWalletFree:float=0.0
@@ -267,7 +267,7 @@ class Crypto:
         self.paymentWithdraw:float = 0.0
 
         # dict for all totals in different currencies
-        self.allTotals:list[Crypto.ConvertedTotal] = []
+        self.allTotals:dict[str, Crypto.ConvertedTotal] = {}
 
         # set whether crypto has a earn flexible or locked possibility
         self.hasFlexiblePossibility:bool = False
@@ -276,11 +276,7 @@ class Crypto:
         self.canUseLocked:bool = False
 
         # monthly klines for volume and price calculations
-        self.monthKlines:dict = {
-            "symbol": "USDC",
-            "volumes": [],
-            "closes": []
-        }
+        self.monthKlines:dict = Crypto.NO_KLINES
 
         # rating
         self.rating: str = "Rating not yet calculated"
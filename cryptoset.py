@@ -3,35 +3,30 @@
 # Author: mhl5k
 
 from datetime import datetime
-import json
 import logging
 import uuid
 
-from binance.spot import Spot as SpotClient
 from crypto import Crypto
+from profiler import Profiler
+from valuation import ValuationEngine
 
 
 class CryptoSet:
 
+    __slots__ = ("time", "timestamp", "allCryptos", "uuid", "totalBTC", "totalUSDC", "allTotals")
+
     class CryptoSetTotal:
 
+        __slots__ = ("name", "total", "deposit")
+
         def __init__(self, currencyName:str):
             self.name:str=currencyName
             self.total:float=0.0
             self.deposit:float=0.0
 
-        def updateTotals(self,allCryptos:dict):
-            # update all cryptos totals
-            c:Crypto = None
-            for c in allCryptos.values():
-                try:
-                    logging.debug(f"Updating crypto {c.name}")
-                    currentTotal=c.updateTotalIn(self.name)
-                    self.total+=currentTotal.total
-                    self.deposit+=currentTotal.deposit
-                except ValueError as E:
-                    logging.error(f"Error updating crypto {c.name}: {E}")
-
+        def set(self, total:float, deposit:float):
+            self.total=total
+            self.deposit=deposit
             logging.debug(f"{self.name} Total: {self.total:.8f}, Total-Deposit: {self.deposit:.8f}")
 
         def toJSON(self) -> dict:
@@ -42,7 +37,7 @@ class CryptoSet:
                 "deposit": "{:.8f}".format(self.deposit),
             }
 
-            logging.debug(json.dumps(jsonDict, indent=4, sort_keys=False))
+            Profiler.debugJSON(jsonDict)
             return jsonDict
 
         def fromJSON(self, jsonContent:dict):
@@ -54,18 +49,33 @@ class CryptoSet:
         if name in self.allCryptos:
             return self.allCryptos[name]
         else:
-            newCrypto=Crypto(setName=name,setSpotClient=self.spotClient)
+            newCrypto=Crypto(setName=name)
             self.allCryptos[name]=newCrypto
             return newCrypto
 
+    def getTotalByName(self, name:str) -> "CryptoSet.CryptoSetTotal":
+        if name not in self.allTotals:
+            raise ValueError(f"No total in {name}")
+        return self.allTotals[name]
+
+    def getOrCreateTotalByName(self, name:str) -> "CryptoSet.CryptoSetTotal":
+        if name not in self.allTotals:
+            self.allTotals[name]=CryptoSet.CryptoSetTotal(name)
+        return self.allTotals[name]
+
     def sortByName(self):
         # sort the dict
         self.allCryptos = dict(sorted(self.allCryptos.items(), key=lambda x: x[0]))
 
-    def updateTotalsOfSet(self):
+    def updateTotalsOfSet(self, currencies:list[str]|None=None):
+        """
+        Values all cryptos in BTC, USDC and the given further currencies with one pass.
+        """
         print("Updating all crypto values to BTC and FIAT...")
-        self.totalBTC.updateTotals(self.allCryptos)
-        self.totalUSDC.updateTotals(self.allCryptos)
+        with Profiler.phase("conversion.totals"):
+            engine=ValuationEngine(["BTC","USDC"]+(currencies or []))
+            for name, (total, deposit) in engine.valueCryptos(self.allCryptos).items():
+                self.getOrCreateTotalByName(name).set(total,deposit)
 
     def toJSON(self) -> dict:
         cryptoList:list = []
@@ -78,13 +88,10 @@ class CryptoSet:
             "timestamp": "%s" % (self.timestamp),
             "time": "%s" % (self.time),
             "crypto": cryptoList,
-            "totals": {
-                "BTC": self.totalBTC.toJSON(),
-                "USDC": self.totalUSDC.toJSON()
-            }
+            "totals": {name: total.toJSON() for name, total in self.allTotals.items()}
         }
 
-        logging.debug(json.dumps(jsonDict, indent=4, sort_keys=False))
+        Profiler.debugJSON(jsonDict)
         return jsonDict
 
     def fromJSON(self, jsonContent:dict):
@@ -97,7 +104,7 @@ class CryptoSet:
         cryptoDict=jsonContent["crypto"]
         for cryptoContent in cryptoDict:
             asset=cryptoContent["asset"]
-            newCrypto=Crypto(setName=asset,setSpotClient=self.spotClient)
+            newCrypto=Crypto(setName=asset)
             newCrypto.fromJSON(cryptoContent)
             self.allCryptos[asset]=newCrypto
         # v1
@@ -105,18 +112,20 @@ class CryptoSet:
             self.totalBTC.total=float(jsonContent["totalBTC"])
         # v3
         if "totals" in jsonContent:
-            if "BTC" in jsonContent["totals"]:
-                self.totalBTC.fromJSON(jsonContent["totals"]["BTC"])
-            if "USDT" in jsonContent["totals"]:
-                self.totalUSDC.fromJSON(jsonContent["totals"]["USDT"])
-            # v4
-            if "USDC" in jsonContent["totals"]:
-                self.totalUSDC.fromJSON(jsonContent["totals"]["USDC"])
-
-    def __init__(self, setSpotClient:SpotClient):
-        # binance client object
-        self.spotClient=setSpotClient
-
+            totals:dict=jsonContent["totals"]
+            if "BTC" in totals:
+                self.totalBTC.fromJSON(totals["BTC"])
+            # v4, before the USDC total was stored as USDT
+            usdcName="USDT" if "USDC" not in totals else "USDC"
+            if usdcName in totals:
+                self.totalUSDC.fromJSON(totals[usdcName])
+                self.totalUSDC.name="USDC"
+            # v5, further currencies, USDT as well when it is not the former USDC total
+            for name, totalContent in totals.items():
+                if name not in ("BTC", "USDC", usdcName):
+                    self.getOrCreateTotalByName(name).fromJSON(totalContent)
+
+    def __init__(self):
         currentdatetime = datetime.now()
         self.time:str=str(currentdatetime)
         self.timestamp:float=currentdatetime.timestamp()
@@ -130,3 +139,4 @@ class CryptoSet:
         # totals in different currencies
         self.totalBTC=CryptoSet.CryptoSetTotal("BTC")
         self.totalUSDC=CryptoSet.CryptoSetTotal("USDC")
+        self.allTotals:dict[str, CryptoSet.CryptoSetTotal]={"BTC": self.totalBTC, "USDC": self.totalUSDC}
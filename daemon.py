@@ -0,0 +1,106 @@
+# class to keep binanceCheck running and gather new datasets on a schedule
+# License: MIT
+# Author: mhl5k
+
+from datetime import datetime
+import logging
+import random
+import signal
+import threading
+
+from accounts import AccountGroup
+from profiler import Profiler
+
+
+class CollectorDaemon:
+    """
+    Keeps the data sets with their loaded index and the spot client sessions in memory
+    and gathers a new set whenever the last one is older than the gather interval,
+    plus a random jitter. Each gathered set is saved at once. SIGINT and SIGTERM stop
+    the daemon after the current gathering, a second signal stops it immediately.
+    """
+
+    # seconds to wait after a failed gathering of an account, at most its gather interval
+    RETRY_DELAY: int = 300
+
+    def _handleSignal(self, signum, frame):
+        if self.stopEvent.is_set():
+            raise KeyboardInterrupt()
+        print(f"\nReceived {signal.Signals(signum).name}, stopping after the current gathering...")
+        self.stopEvent.set()
+
+    def getSecondsToNextGather(self) -> float:
+        # the account whose last set is the oldest one is due first, a failed account not before its retry
+        allDue:list[float]=[]
+        for name, dataSet in self.accountGroup.allDataSets.items():
+            lastTimestamp=dataSet.timeIndex.getLast().timestamp if len(dataSet.timeIndex)>0 else 0
+            allDue.append(max(lastTimestamp+dataSet.gatherInterval,self.allRetryAt.get(name,0.0)))
+        seconds=max(min(allDue)-datetime.now().timestamp(),0.0)
+        return seconds+random.uniform(0,self.jitter)
+
+    def _showGathered(self, lastUUIDs:dict[str, str]):
+        for name, dataSet in self.accountGroup.allDataSets.items():
+            if len(dataSet.timeIndex)==0 or dataSet.timeIndex.getLast().uuid==lastUUIDs.get(name):
+                continue
+            last=dataSet.getCryptoSets([dataSet.timeIndex.getLast()])[0]
+            print("Gathered %s%s - %.8f BTC - %.2f USDC" % (f"{name}: " if name!="" else "",last.time,last.totalBTC.total,last.totalUSDC.total))
+
+    def _setRetries(self, failedNames:set[str]):
+        # failed accounts are gathered again after the retry delay, at most their gather interval
+        now=datetime.now().timestamp()
+        for name, dataSet in self.accountGroup.allDataSets.items():
+            if name in failedNames:
+                retryDelay=min(CollectorDaemon.RETRY_DELAY,dataSet.gatherInterval) if dataSet.gatherInterval>0 else CollectorDaemon.RETRY_DELAY
+                self.allRetryAt[name]=now+retryDelay
+            else:
+                self.allRetryAt.pop(name,None)
+
+    def _gatherAndSave(self):
+        lastUUIDs={name: dataSet.timeIndex.getLast().uuid for name, dataSet in self.accountGroup.allDataSets.items() if len(dataSet.timeIndex)>0}
+        allErrors=self.accountGroup.gatherNewDataSets(sequential=self.sequential)
+        self._setRetries(set(allErrors.keys()))
+        if self.save:
+            self.accountGroup.saveData()
+        self._showGathered(lastUUIDs)
+
+        # one profile per gathering, the profiler would grow with every call otherwise
+        if self.profileFilename is not None:
+            Profiler.appendJSON(self.profileFilename)
+        Profiler.reset()
+
+    def run(self):
+        signal.signal(signal.SIGINT, self._handleSignal)
+        signal.signal(signal.SIGTERM, self._handleSignal)
+
+        print("Collector daemon started, press Ctrl+C to stop")
+        while not self.stopEvent.is_set():
+            seconds=self.getSecondsToNextGather()
+            print("Next gathering at %s" % (datetime.fromtimestamp(datetime.now().timestamp()+seconds).strftime("%Y-%m-%d %H:%M:%S")))
+            if self.stopEvent.wait(seconds):
+                break
+
+            try:
+                self._gatherAndSave()
+            except Exception as E:
+                # e.g. network errors, the daemon keeps running and tries again
+                logging.exception(E)
+                print("Error: %s" % E)
+                self._setRetries(set(self.accountGroup.allDataSets.keys()))
+
+        print("Collector daemon stopped")
+
+    def __init__(self, accountGroup:AccountGroup, jitter:float=0.0, sequential:bool=False, save:bool=True, profileFilename:str|None=None):
+        self.accountGroup:AccountGroup=accountGroup
+
+        # max. seconds added to each scheduled gathering, so runs do not hit the API at the same second
+        self.jitter:float=jitter
+
+        self.sequential:bool=sequential
+        self.save:bool=save
+        self.profileFilename:str|None=profileFilename
+
+        # timestamp per failed account, when it is gathered again
+        self.allRetryAt:dict[str, float]={}
+
+        # set by SIGINT/SIGTERM, wakes up the waiting daemon
+        self.stopEvent=threading.Event()
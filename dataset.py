@@ -3,16 +3,33 @@
 # Author: mhl5k
 
 from datetime import datetime
-import json
 import logging
+import uuid
+
+import numpy as np
 
 from binance.spot import Spot as SpotClient
 from binance.error import ClientError
 from mhl5k.settings import Settings
 from mhl5k.colors import Colors
-from mhl5k.files import Files
+from conversiongraph import ConversionGraph
 from crypto import Crypto, PriceConversion
 from cryptoset import CryptoSet
+from gatherengine import GatherEngine
+from ratelimiter import RateLimitedClient
+from responsecache import ResponseCache, CachedClient
+from earncatalog import EarnProductCatalog
+from klinestore import KlineStore
+from klinerating import KlineRatingEngine
+from paymentledger import PaymentLedger
+from pricehistory import PriceHistory
+from revaluation import RevaluationEngine
+from symbolindex import SymbolIndex
+from profiler import Profiler
+from storage import createStorage, JsonStorage, SnapshotRef
+from history import HistoryMatrix
+from analytics import HistoryAnalytics
+from timeindex import SnapshotTimeIndex
 
 
 def printSection(sec: str):
@@ -22,143 +39,262 @@ def printSection(sec: str):
     print(sep)
 
 
+def showValue(starttext:str, growth:HistoryMatrix.Growth, column:int|None=None, headerTitle=""):
+    NewerValue=growth.newer if column is None else growth.newer[column]
+    OlderValue=growth.older if column is None else growth.older[column]
+    diff=growth.diff if column is None else growth.diff[column]
+    perc=growth.perc if column is None else growth.perc[column]
+    percPerDay=growth.percPerDay if column is None else growth.percPerDay[column]
+
+    color=Colors.getColorByGLTZero(diff)
+
+    daystext="%6d %9.4f%%" % (growth.days,percPerDay)
+
+    # header when requested
+    if headerTitle!="":
+        print("\n%-13s %17s %17s %17s %10s %6s %10s" % (headerTitle,"Newer","Older","Diff","Percent","Days","%/day"))
+
+    # print values
+    print("%-13s %17.8f %17.8f %s%17.8f %9.4f%% %s%s" % (starttext,NewerValue,OlderValue,color,diff,perc,daystext,Colors.CRESET))
+
+
+def showGrowthRow(starttext:str, value:float, allGrowths:list[HistoryMatrix.Growth], column:int|None=None, headerTitle="", allTitles:list[str]|None=None):
+    # one percent column per growth, e.g. per horizon
+    allTitles=allTitles or []
+    if headerTitle!="":
+        print("\n%-13s %17s" % (headerTitle,"Newer")+"".join(" %11s" % (title) for title in allTitles))
+
+    cells:list[str]=[]
+    for growth in allGrowths:
+        newer=growth.newer if column is None else growth.newer[column]
+        older=growth.older if column is None else growth.older[column]
+        perc=growth.perc if column is None else growth.perc[column]
+        if np.isnan(newer) or np.isnan(older):
+            cells.append(" %11s" % ("n/a"))
+        else:
+            cells.append(" %s%10.4f%%%s" % (Colors.getColorByGLTZero(newer-older),perc,Colors.CRESET))
+    print("%-13s %17.8f%s" % (starttext,value,"".join(cells)))
+
+
 class BinanceDataSet:
 
-    def __init__(self, settings:Settings):
-        # set spot client
-        self.spotClient = SpotClient(settings.current["apiKey"], settings.current["apiSecret"])
+    def __init__(self, settings:Settings, bypassCache:bool=False, account:str=""):
+        # name of the account, "" when only one account is configured
+        self.account:str = account
+
+        # set spot client, all calls are paced by the request weight limiter
+        self.rateLimiter = RateLimitedClient(SpotClient(settings.current["apiKey"], settings.current["apiSecret"], show_limit_usage=True))
+
+        # slow changing endpoints are answered from the response cache
+        self.responseCache = ResponseCache(ttls=settings.current.get("cacheTTL"), maxEntries=int(settings.current.get("cacheMaxEntries", 2000)), account=account)
+        self.spotClient = CachedClient(self.rateLimiter, self.responseCache, bypass=bypassCache)
+
+        # closed monthly candles are kept on disk, only new candles are fetched
+        self.klineStore = KlineStore(account=account)
+
+        # deposits and withdrawals, only new time windows are fetched
+        self.ledger = PaymentLedger(account=account, backfillDays=int(settings.current.get("ledgerBackfillDays", 365)))
 
-        # list to hold all cryptosets of different times
+        # daily closes of the pairs, for the re-valuation of stored sets
+        self.priceHistory = PriceHistory(account=account)
+
+        # available pairs from "tickers" or "exchangeInfo", quotes for klines in order of preference
+        self.symbolIndexSource:str = settings.current.get("symbolIndexSource", "tickers")
+        self.klineQuotes:list[str] = settings.current.get("klineQuotes", ["USDC", "BTC"])
+
+        # months of the kline rating and percent changes of its trends
+        self.klineRating = KlineRatingEngine(horizons=settings.current.get("ratingMonths"), thresholds=settings.current.get("ratingThresholds"), account=account)
+
+        # further currencies the totals are valued in, besides BTC and USDC
+        self.totalCurrencies:list[str] = settings.current.get("totalCurrencies", [])
+
+        # bridge assets and max. nr. of pairs for price conversion routes
+        PriceConversion.bridges = settings.current.get("conversionBridges", PriceConversion.bridges)
+        PriceConversion.maxHops = int(settings.current.get("conversionMaxHops", PriceConversion.maxHops))
+
+        # nr. of parallel requests while gathering
+        self.gatherWorkers:int = int(settings.current.get("gatherWorkers", 4))
+
+        # min. seconds between two gathered sets
+        self.gatherInterval:int = int(settings.current.get("gatherInterval", 3600))
+
+        # index of all stored and gathered sets, sorted by timestamp
+        self.timeIndex:SnapshotTimeIndex = SnapshotTimeIndex()
+
+        # list to hold all cryptosets which are built, only the ones a command needs
         self.cryptoSetList:list = []
 
+        # gathered sets which are not yet in the storage
+        self.unsavedSets:list[CryptoSet] = []
+
+        # "json" rewrites database.json on every save, "jsonl" appends new sets to database.jsonl,
+        # the logs store sets between two complete ones as changes when a keyframe interval is set
+        self.storage = createStorage(settings.current.get("storage", "json"), keyframeInterval=int(settings.current.get("deltaKeyframeInterval", 0)), account=account)
+
+    # Gathering data from binance, fetch functions
+    # --------------------------------------------
+    # All _fetch functions only talk to the API and return the raw data,
+    # they may run in parallel. Adding to the CryptoSet is done afterwards
+    # in a fixed order.
+
+    def _fetchAllPages(self, function, **kwargs) -> list:
+        # fetch all pages of a paged endpoint with rows/total
+        rows:list = []
+        count=1
+        maxcount=1
+        while count<=maxcount:
+            page=function(current=count,size=100,**kwargs)
+            logging.debug(page)
+            amount:int=int(page["total"])
+            # roundup amount/100
+            maxcount = (amount + 99) // 100
+            rows.extend(page["rows"])
+            count+=1
+        return rows
+
+    def _fetchLockedPositions(self) -> list:
+        return self._fetchAllPages(self.spotClient.get_locked_product_position)
+
+    def _fetchFlexiblePositions(self) -> list:
+        return self._fetchAllPages(self.spotClient.get_flexible_product_position)
+
+    def _fetchPlans(self) -> list:
+        allDetails:list = []
+        plans=self.spotClient.get_list_of_plans(planType="PORTFOLIO")
+        logging.debug(plans)
+        for s in plans["plans"]:
+            planID=s["planId"]
+            params={"planId": planID}
+            planDetails=self.spotClient.query_holding_details_of_the_plan(**params)
+            # print(planDetails)
+            allDetails.extend(planDetails["details"])
+        return allDetails
+
+    def _fetchMonthKlines(self, name:str, symbol:str) -> list:
+        try:
+            return self.klineStore.update(self.spotClient, f"{name}{symbol}")
+        except ClientError as E:
+            logging.debug(f"ClientError: {E}")
+        return []
+
     # Gathering data from binance, setup
     # ----------------------------------
-    def gatherNewDataSet(self):
+    def gatherNewDataSet(self, sequential:bool=False, tickers:list|None=None):
+        """
+        Gathers a new set when the last one is older than an hour. Tickers may be given
+        to share one price snapshot between accounts, otherwise they are fetched.
+        """
+        with Profiler.phase("gather"):
+            self._gatherNewDataSet(sequential,tickers)
+
+    def _gatherNewDataSet(self, sequential:bool, tickers:list|None):
+        self.rateLimiter.resetUsage()
+
         # check whether API works, otherwise throw an early exception
         try:
-            account=self.spotClient.account()
-            logging.debug(json.dumps(account, indent=4, sort_keys=False))
+            with Profiler.phase("gather.account"):
+                account=self.spotClient.account()
+            Profiler.debugJSON(account)
         except ClientError as E:
             raise E
 
         # check whether a new dataset should be gathered
-        lastTimestamp=0
-        entrySet:CryptoSet
-        for entrySet in self.cryptoSetList:
-            entrySetTimestamp=entrySet.timestamp
-            if entrySetTimestamp>lastTimestamp:
-                lastTimestamp=entrySetTimestamp
-            logging.debug("Found entry timestamp %f" %(entrySetTimestamp))
+        lastTimestamp=self.timeIndex.getLast().timestamp if len(self.timeIndex)>0 else 0
+        logging.debug("Found last entry timestamp %f" %(lastTimestamp))
 
         currentTimestamp=datetime.now().timestamp()
-        datasetTimeDifference:int=3600
         calcedDiff=currentTimestamp-lastTimestamp
-        if calcedDiff<datasetTimeDifference:
-            print("Last dataset is not older than %d secs (just %ds). Not gathering a new one." % (datasetTimeDifference, calcedDiff))
+        if calcedDiff<self.gatherInterval:
+            print("Last dataset is not older than %d secs (just %ds). Not gathering a new one." % (self.gatherInterval, calcedDiff))
             return
 
         # Start gathering a new dataset from binance
         # ------------------------------------------
 
         # create new CryptoSet and add to list
-        newCryptoSet=CryptoSet(setSpotClient=self.spotClient)
+        newCryptoSet=CryptoSet()
         self.cryptoSetList.append(newCryptoSet)
+        self.unsavedSets.append(newCryptoSet)
+        self.timeIndex.add(SnapshotRef(newCryptoSet.timestamp,"%s" % (newCryptoSet.uuid),cryptoSet=newCryptoSet))
+
+        engine=GatherEngine(maxWorkers=self.gatherWorkers, sequential=sequential)
+        print("Gathering with %s..." % ("1 worker (sequential)" if sequential else f"{self.gatherWorkers} workers"))
+
+        # do not calc LD values, will be done in savings later
+        spotBalances:list = []
+        for accountAsset in account["balances"]:
+            name:str=accountAsset["asset"]
+            free=float(accountAsset["free"])
+            locked=float(accountAsset["locked"])
+            if free+locked>0.0 and not name.startswith("LD"):
+                spotBalances.append((name,free,locked))
+
+        # First stage, all independent requests
+        # -------------------------------------
+        if tickers is None:
+            engine.addTask("tickers", self.spotClient.ticker_price)
+        engine.addTask("flexibleCatalog", self._fetchAllPages, self.spotClient.get_simple_earn_flexible_product_list)
+        engine.addTask("lockedCatalog", self._fetchAllPages, self.spotClient.get_simple_earn_locked_product_list)
+        engine.addTask("locked", self._fetchLockedPositions)
+        engine.addTask("flexible", self._fetchFlexiblePositions)
+        engine.addTask("plans", self._fetchPlans)
+        self.ledger.addSyncTasks(engine, self.spotClient)
+        if self.symbolIndexSource=="exchangeInfo":
+            engine.addTask("exchangeInfo", self.spotClient.exchange_info)
+        with Profiler.phase("gather.requests1"):
+            results=engine.run()
+        if tickers is not None:
+            results["tickers"]=tickers
+        self.ledger.applySyncResults(results)
 
         # Gather all price tickers
         # ------------------------
         print("Gathering Assets and price tickers...")
-        PriceConversion.init(accountData=account,spotClient=self.spotClient)
+        if self.symbolIndexSource=="exchangeInfo":
+            symbolIndex=SymbolIndex.fromExchangeInfo(results["exchangeInfo"])
+        else:
+            symbolIndex=SymbolIndex.fromTickers(results["tickers"],[entry["asset"] for entry in account["balances"]])
+        PriceConversion.init(accountData=account,priceTickers=results["tickers"],symbolIndex=symbolIndex,targets=["BTC","USDC"]+self.totalCurrencies)
+
+        # Earn product catalogs, indexed by asset
+        earnCatalog=EarnProductCatalog(flexibleRows=results["flexibleCatalog"],lockedRows=results["lockedCatalog"])
 
         # Account & Order Wallet Assets
         # -----------------------------
         print("Gathering Spot/Order Assets...")
+        for name, free, locked in spotBalances:
+            crypto=newCryptoSet.getCryptoByName(name)
+            crypto.addToWalletAndOrderValue(toAddFree=free,toAddLocked=locked)
 
-        for accountAsset in account["balances"]:
-            name:str=accountAsset["asset"]
-            free=float(accountAsset["free"])
-            locked=float(accountAsset["locked"])
-            # do not calc LD values, will be done in savings later
-            amount=free+locked
-            if amount>0.0 and not name.startswith("LD"):
-                crypto=newCryptoSet.getCryptoByName(name)
-                crypto.addToWalletAndOrderValue(toAddFree=free,toAddLocked=locked)
-
-                # check whether flexible is available
-                flexibleProductList=self.spotClient.get_simple_earn_flexible_product_list(asset=name,size=20)
-                logging.debug(flexibleProductList)
-                soldOut=0
-                for s in flexibleProductList["rows"]:
-                    soldOut += 1 if s["isSoldOut"]==True else 0
-                    if free >= float(s["minPurchaseAmount"]):
-                        crypto.canUseFlexible=True
-
-                hasFlexibleCount=int(flexibleProductList["total"])
-                crypto.hasFlexiblePossibility=hasFlexibleCount>0 and soldOut<hasFlexibleCount
-                logging.debug(f" {name} hasFlexibleCount: {hasFlexibleCount}, soldOut: {soldOut}, hasFlexiblePossibility: {crypto.hasFlexiblePossibility}, minPurchaseReached: {crypto.canUseFlexible}")
+            # check whether flexible is available
+            earnCatalog.updateFlexiblePossibility(crypto,freeAmount=free)
 
         # Savings
         # -------
         print("Gathering Earn Locked...")
-        count=1
-        maxcount=1
-        while count<=maxcount:
-            locked = self.spotClient.get_locked_product_position(current=count,size=100)
-            logging.debug(locked)
-            amount:int=int(locked["total"])
-            # roundup amount/100
-            maxcount = (amount + 99) // 100
-            for s in locked["rows"]:
-                # print(s)
-                name=s["asset"]
-                crypto=newCryptoSet.getCryptoByName(name)
-                crypto.addToLocked(float(s["amount"]))
-
-            count+=1
+        for s in results["locked"]:
+            # print(s)
+            name=s["asset"]
+            crypto=newCryptoSet.getCryptoByName(name)
+            crypto.addToLocked(float(s["amount"]))
 
         print("Gathering Earn Flexible...")
-        count=1
-        maxcount=1
-        while count<=maxcount:
-            flexible=self.spotClient.get_flexible_product_position(current=count,size=100)
-            logging.debug(flexible)
-            amount:int=int(flexible["total"])
-            # roundup amount/100
-            maxcount = (amount + 99) // 100
-            for s in flexible["rows"]:
-                # print(s)
-                name=s["asset"]
-                crypto=newCryptoSet.getCryptoByName(name)
-                valueInFlexible=float(s["totalAmount"])
-                crypto.addToFlexible(valueInFlexible)
-
-                # check whether locked is possible to mark it
-                lockedProductList=self.spotClient.get_simple_earn_locked_product_list(asset=name,size=20)
-                logging.debug(lockedProductList)
-                soldOut=0
-                for s in lockedProductList["rows"]:
-                    soldOut += 1 if s["detail"]["isSoldOut"]==True else 0
-                    if valueInFlexible >= float(s["quota"]["minimum"]):
-                        crypto.canUseLocked=True
-
-                hasLockedCount=int(lockedProductList["total"])
-                crypto.hasLockedPossibility=hasLockedCount>0 and soldOut<hasLockedCount
-                logging.debug(f" {name} hasLockedCount: {hasLockedCount}, soldOut: {soldOut}, hasLockedPossibility: {crypto.hasLockedPossibility}, minPurchaseReached: {crypto.canUseLocked}")
+        for s in results["flexible"]:
+            # print(s)
+            name=s["asset"]
+            crypto=newCryptoSet.getCryptoByName(name)
+            valueInFlexible=float(s["totalAmount"])
+            crypto.addToFlexible(valueInFlexible)
 
-            count+=1
+            # check whether locked is possible to mark it
+            earnCatalog.updateLockedPossibility(crypto,flexibleAmount=valueInFlexible)
 
         print("Gathering Plans...")
-        plans=self.spotClient.get_list_of_plans(planType="PORTFOLIO")
-        logging.debug(plans)
-        for s in plans["plans"]:
-            planID=s["planId"]
-            params={"planId": planID}
-            planDetails=self.spotClient.query_holding_details_of_the_plan(**params)
-            # print(planDetails)
-            for assetDetail in planDetails["details"]:
-                # print(assetDetail)
-                name=assetDetail["targetAsset"]
-                crypto=newCryptoSet.getCryptoByName(name)
-                crypto.addToPlan(float(assetDetail["purchasedAmount"]))
+        for assetDetail in results["plans"]:
+            # print(assetDetail)
+            name=assetDetail["targetAsset"]
+            crypto=newCryptoSet.getCryptoByName(name)
+            crypto.addToPlan(float(assetDetail["purchasedAmount"]))
 
         # Liquidity Pool values
         # ---------------------
@@ -178,72 +314,48 @@ class BinanceDataSet:
         #             crypto.addToLiquidityValue(swapValue)
         #               logging.debug("%s - %s - %.8f" % (poolName, swapAsset, swapValue))
 
-        # gather deposit fiat history and add to set if it is in that month
-        # --------------------------------------------------------------------
-        print("Gathering FIAT Buy/Payment Deposits...")
-        DEPOSIT_BUY=0
-        # WITHDRAW_SELL=1
-        fiatHistory=self.spotClient.fiat_payment_history(transactionType=DEPOSIT_BUY)
-        logging.debug(json.dumps(fiatHistory, indent=4, sort_keys=False))
-        if "data" in fiatHistory:
-            for data in fiatHistory["data"]:
-                logging.debug(json.dumps(data, indent=4, sort_keys=False))
-                # get timestamp of fiat payment
-                timestamp=int(data["updateTime"])/1000  # milliseconds to seconds
-                paymentTimestamp = datetime.fromtimestamp(timestamp).timestamp()
-
-                # timestamp between current and last time
-                if lastTimestamp <= paymentTimestamp <= newCryptoSet.timestamp:
-                    # get crypto from set
-                    cryptoName=data["cryptoCurrency"]
-                    crypto:Crypto=newCryptoSet.getCryptoByName(cryptoName)
-                    amount=float(data["obtainAmount"])
-                    crypto.addToPaymentDeposit(toDeposit=amount)
-                    logging.debug("FIAT Buy/Payment found %s %s %.8f" % (cryptoName,paymentTimestamp,amount))
-
-        # gather deposit crypto history and add to set if it is in that month
+        # deposits and withdrawals since the last set, from the ledger
         # --------------------------------------------------------------------
-        print("Gathering Crypto Deposits...")
-        cryptoDepositHistory=self.spotClient.deposit_history()
-        logging.debug(json.dumps(cryptoDepositHistory, indent=4, sort_keys=False))
-        for data in cryptoDepositHistory:
-            logging.debug(json.dumps(data, indent=4, sort_keys=False))
-            # get timestamp of fiat payment
-            timestamp=int(data["insertTime"])/1000  # milliseconds to seconds
-            paymentTimestamp = datetime.fromtimestamp(timestamp).timestamp()
-
-            # add only to this set when month is same
-            logging.debug(f"Timestamps: last: {lastTimestamp} - payment: {paymentTimestamp} - new: {newCryptoSet.timestamp}")
-            if lastTimestamp <= paymentTimestamp <= newCryptoSet.timestamp:
-                # get crypto from set
-                cryptoName=data["coin"]
-                crypto:Crypto=newCryptoSet.getCryptoByName(cryptoName)
-                amount=float(data["amount"])
-                crypto.addToPaymentDeposit(toDeposit=amount)
-                logging.debug("Deposit found %s %s %.8f" % (cryptoName,paymentTimestamp,amount))
+        print("Gathering Deposits and Withdrawals...")
+        self._addPayments(newCryptoSet,lastTimestamp)
+
+        # Second stage, requests which need the assets of the first stage
+        # ---------------------------------------------------------------
+        klineQuotes:dict[str, str|None] = {}
+        for name in newCryptoSet.allCryptos:
+            # quote is decided by the symbol index, no request for missing pairs
+            klineQuotes[name]=symbolIndex.pickQuote(name,self.klineQuotes)
+            if klineQuotes[name] is not None:
+                engine.addTask(f"klines.{name}", self._fetchMonthKlines, name, klineQuotes[name])
+            else:
+                logging.debug(f"No kline pair for {name} with {self.klineQuotes}")
+        with Profiler.phase("gather.requests2"):
+            results=engine.run()
 
         print("Gathering kline values...")
         for crypto in newCryptoSet.allCryptos.values():
-            try:
-                crypto.monthKlines["symbol"]="USDC"
-                klines = []
-                try:
-                    klines=self.spotClient.klines(symbol=f"{crypto.name}{crypto.monthKlines["symbol"]}", interval="1M", limit=14)
-                except ClientError:
-                    crypto.monthKlines["symbol"]="BTC"
-                    klines=self.spotClient.klines(symbol=f"{crypto.name}{crypto.monthKlines["symbol"]}", interval="1M", limit=14)
-
-                # Do not drop last candle, maybe it is incomplete (an issue at beginning of month)
-                # klines=klines[:-1]
-                crypto.monthKlines["closes"] = [float(k[4]) for k in klines]   # close an Index 4
-                crypto.monthKlines["volumes"] = [float(k[5]) for k in klines]   # volume an Index 5
-
-            except ClientError as E:
-                logging.debug(f"ClientError: {E}")
+            quote=klineQuotes[crypto.name]
+            if quote is None:
+                continue
+            candles=results[f"klines.{crypto.name}"]
+
+            # Do not drop last candle, maybe it is incomplete (an issue at beginning of month)
+            # candles=candles[:-1]
+            crypto.monthKlines = {
+                "symbol": quote,
+                "volumes": [c[KlineStore.VOLUME] for c in candles],
+                "closes": [c[KlineStore.CLOSE] for c in candles]
+            }
 
         # calculate total BTC of set after gathering all cryptos
         # ------------------------------------------------------
-        newCryptoSet.updateTotalsOfSet()
+        newCryptoSet.updateTotalsOfSet(self.totalCurrencies)
+
+        self.rateLimiter.printUsage()
+        self.responseCache.printUsage()
+        self.responseCache.save()
+        self.klineStore.save()
+        self.ledger.save()
 
     # Snapshots
     def snapshots(self):
@@ -259,241 +371,298 @@ class BinanceDataSet:
 
             print("Time: %d - %s - BTC: %s" % (timestamp, date, btcValue))
 
-    def _getCryptoSetByDate(self,timestampToFind) -> CryptoSet:
-        # get item of cryptoset which its date is lower and closest to given date
-        item:CryptoSet=None
-        # find the closest date which is lower or equal than the given date
-        last:CryptoSet=None
-        for item in self.cryptoSetList:
-            if item.timestamp <= timestampToFind:
-                last=item
-            else:
-                return last
-
-    def analyzeGrowthAndShow(self,compareNrOfDays:int):
-        printSection("Analyze datasets")
-
-        # sort cryptoset list by date
-        self.cryptoSetList.sort(key=lambda x: x.timestamp, reverse=False)
-
+    def getCryptoSets(self, refs:list[SnapshotRef]) -> list[CryptoSet]:
+        """
+        Returns the sets of the given index entries, sets which are not built yet are read from the storage.
+        """
+        missing=[ref for ref in refs if ref.cryptoSet is None]
+        if len(missing)>0:
+            with Profiler.phase("load.sets"):
+                for ref, entry in zip(missing, self.storage.iterSelected(missing)):
+                    ref.cryptoSet=self._buildCryptoSet(ref,entry)
+                    self.cryptoSetList.append(ref.cryptoSet)
+        return [ref.cryptoSet for ref in refs]
+
+    def iterCryptoSets(self, refs:list[SnapshotRef]):
+        """
+        Yields the sets of the given index entries, sets which are not built yet are
+        built one after another and not kept, e.g. for the whole history.
+        """
+        storedEntries=self.storage.iterSelected([ref for ref in refs if ref.cryptoSet is None])
+        for ref in refs:
+            yield ref.cryptoSet if ref.cryptoSet is not None else self._buildCryptoSet(ref,next(storedEntries))
+
+    def _buildCryptoSet(self, ref:SnapshotRef, entry:dict) -> CryptoSet:
+        cryptoSet=self._createCryptoSetFromJSON(entry)
+
+        # payments since the set before, when the ledger has been synced for that time
+        before=self.timeIndex.getBefore(ref.timestamp)
+        startTimestamp=before.timestamp if before is not None else 0.0
+        if self.ledger.covers(startTimestamp,ref.timestamp):
+            # the ledger replaces the stored payments, e.g. of sets gathered before the ledger
+            for crypto in cryptoSet.allCryptos.values():
+                crypto.paymentDeposit=0.0
+                crypto.paymentWithdraw=0.0
+            self._addPayments(cryptoSet,startTimestamp)
+        return cryptoSet
+
+    def _addPayments(self, cryptoSet:CryptoSet, startTimestamp:float):
+        # sums of the ledger after startTimestamp up to the set
+        for name, amount in self.ledger.getAmounts(PaymentLedger.DEPOSIT,startTimestamp,cryptoSet.timestamp).items():
+            cryptoSet.getCryptoByName(name).addToPaymentDeposit(toDeposit=amount)
+            logging.debug("Deposit found %s %.8f" % (name,amount))
+        for name, amount in self.ledger.getAmounts(PaymentLedger.WITHDRAW,startTimestamp,cryptoSet.timestamp).items():
+            cryptoSet.getCryptoByName(name).addToPaymentWithdraw(toWithdraw=amount)
+            logging.debug("Withdraw found %s %.8f" % (name,amount))
+
+    def getCryptoSetsBetween(self, startTimestamp:float, endTimestamp:float) -> list[CryptoSet]:
+        return self.getCryptoSets(self.timeIndex.getRange(startTimestamp,endTimestamp))
+
+    def analyzeGrowthAndShow(self,compareNrOfDays:list[int]):
+        with Profiler.phase("analyze"):
+            self._analyzeGrowthAndShow(compareNrOfDays)
+
+    def getCompareSets(self, compareNrOfDays:list[int]) -> tuple[CryptoSet, list[CryptoSet], CryptoSet]:
+        """
+        Returns first set, the before set of each nr. of days and last set. Before is the set
+        nr. of days before the last one or the one before the last set when nr. of days is 0.
+        """
         # get first and last set
-        first:CryptoSet=self.cryptoSetList[0]
-        last:CryptoSet=self.cryptoSetList[-1] if len(self.cryptoSetList)>1 else first
-        before:CryptoSet=self.cryptoSetList[-2] if len(self.cryptoSetList)>1 else last
+        first:SnapshotRef=self.timeIndex.getFirst()
+        last:SnapshotRef=self.timeIndex.getLast()
+        previous:SnapshotRef=self.timeIndex[-2] if len(self.timeIndex)>1 else last
 
         # get timestamp of last gathered set
         lastTimestamp = last.timestamp
 
-        # when compareNrOfDays is set, use it
-        if (compareNrOfDays>0):
-            beforeTimestamp = lastTimestamp - compareNrOfDays*24*60*60
-            # get set with this timestamp
-            before = self._getCryptoSetByDate(beforeTimestamp)
+        # sets of all days before the last one with one lookup, 0 days is the set before
+        allBefore=self.timeIndex.getNearestBeforeAll([lastTimestamp - days*24*60*60 for days in compareNrOfDays])
+        allBefore=[previous if days<=0 else before for days, before in zip(compareNrOfDays,allBefore)]
 
         # if before is None, set it to first
-        before = first if before is None else before
-
-        # analyze
-        print("First:  %s - %.8f - %s" % (first.time,first.totalBTC.total,first.uuid))
-        print("Before: %s - %.8f - %s" % (before.time,before.totalBTC.total,before.uuid))
-        print("Last:   %s - %.8f - %s" % (last.time,last.totalBTC.total,last.uuid))
-
-        def showValue(starttext:str, NewerValue, OlderValue, days:int=0, headerTitle=""):
-            diff=NewerValue-OlderValue
-            perc=0.0
-            if (OlderValue>0):
-                perc=NewerValue/OlderValue*100-100
+        allBefore=[first if before is None else before for before in allBefore]
 
-            color=Colors.getColorByGLTZero(diff)
+        # only these sets are built
+        allSets=self.getCryptoSets([first,last]+allBefore)
+        return allSets[0], allSets[2:], allSets[1]
 
-            daystext=""
-            days=1 if days < 1 else days
+    def _analyzeGrowthAndShow(self,compareNrOfDays:list[int]):
+        printSection("Analyze datasets")
 
-            percPerDay=perc/days
-            daystext="%6d %9.4f%%" % (days,percPerDay)
+        first, allBefore, last = self.getCompareSets(compareNrOfDays)
 
-            # header when requested
-            if headerTitle!="":
-                print("\n%-13s %17s %17s %17s %10s %6s %10s" % (headerTitle,"Newer","Older","Diff","Percent","Days","%/day"))
+        # analyze
+        print("First:  %s - %.8f - %s" % (first.time,first.totalBTC.total,first.uuid))
+        for days, before in zip(compareNrOfDays, allBefore):
+            print("%-8s%s - %.8f - %s" % ("%dd:" % (days) if len(allBefore)>1 and days>0 else "Before:",before.time,before.totalBTC.total,before.uuid))
+        print("Last:   %s - %.8f - %s" % (last.time,last.totalBTC.total,last.uuid))
 
-            # print values
-            print("%-13s %17.8f %17.8f %s%17.8f %9.4f%% %s%s" % (starttext,NewerValue,OlderValue,color,diff,perc,daystext,Colors.CRESET))
+        # all loaded sets as columns, growth is calculated for all assets at once
+        with Profiler.phase("analyze.history"):
+            history=HistoryMatrix(self.cryptoSetList)
+
+        def showHorizons(setNewer:CryptoSet, allOlder:list[CryptoSet]):
+            # one column per nr. of days, the history is built only once for all of them
+            newer=history.getIndexOfSet(setNewer)
+            allOlderIndexes=[history.getIndexOfSet(setOlder) for setOlder in allOlder]
+            allTitles=["%dd" % (days) if days>0 else "before" for days in compareNrOfDays]
+
+            total=history.getTotal()
+            valuesUSDC=history.allConverted["USDC"]
+            growthTotal=[history.compareAssets(newer,older,total) for older in allOlderIndexes]
+            growthUSDC=[history.compareAssets(newer,older,valuesUSDC) for older in allOlderIndexes]
+
+            for name in sorted(setNewer.allCryptos):
+                column=history.assetIndex[name]
+                showGrowthRow("Total",total[newer,column],growthTotal,column,headerTitle=name,allTitles=allTitles)
+                showGrowthRow("USDC Value",valuesUSDC[newer,column],growthUSDC,column)
+
+            headerTitle=" "
+            for currency in HistoryMatrix.CURRENCIES:
+                for withoutDeposit in (False, True):
+                    allGrowths=[history.compareSetTotals(newer,older,currency,withoutDeposit=withoutDeposit) for older in allOlderIndexes]
+                    showGrowthRow("∑ %s %s" % (currency,"-Depo" if withoutDeposit else "all"),allGrowths[0].newer,allGrowths,headerTitle=headerTitle,allTitles=allTitles)
+                    headerTitle=""
 
         def showDiff(setNewer:CryptoSet, setOlder:CryptoSet):
-            # days between these sets
-            days:int=(setNewer.timestamp-setOlder.timestamp)/3600/24
+            newer=history.getIndexOfSet(setNewer)
+            older=history.getIndexOfSet(setOlder)
+
+            # growth of all assets between both sets
+            fields=history.allFields
+            total=history.getTotal()
+            growthTotal=history.compareAssets(newer,older,total)
+            growthTotalPlan=history.compareAssets(newer,older,total-fields["earnPlan"])
+            growthOf={field: history.compareAssets(newer,older,fields[field]) for field in HistoryMatrix.FIELDS}
+            # deposits and withdraws are not calculated per day
+            growthOf["paymentDeposit"]=history.compareAssets(newer,older,fields["paymentDeposit"],days=0)
+            growthOf["paymentWithdraw"]=history.compareAssets(newer,older,fields["paymentWithdraw"],days=0)
+            growthUSDC=history.compareAssets(newer,older,history.allConverted["USDC"])
+
+            def showField(starttext:str, field:str, column:int):
+                growth=growthOf[field]
+                if growth.newer[column]>0.0 or growth.older[column]>0.0:
+                    showValue(starttext,growth,column)
 
             # sort setNewer by name
             setNewer.sortByName()
 
-            # show difference between both
-            crypto:Crypto
-            for crypto in setNewer.allCryptos.values():
-                zeroCrypto=Crypto(setName=crypto,setSpotClient=self.spotClient)
+            # rating of all cryptos at once, from the klines
+            with Profiler.phase("analyze.rating"):
+                self.klineRating.rateAll(list(setNewer.allCryptos.values()))
+                self.klineRating.save()
 
-                cryptoOlder=zeroCrypto
-                if crypto.name in setOlder.allCryptos:
-                    cryptoOlder:Crypto=setOlder.allCryptos[crypto.name]
-
-                cryptoNewer=zeroCrypto
-                if crypto.name in setNewer.allCryptos:
-                    cryptoNewer:Crypto=setNewer.allCryptos[crypto.name]
+            # show difference between both
+            cryptoNewer:Crypto
+            for cryptoNewer in setNewer.allCryptos.values():
+                column=history.assetIndex[cryptoNewer.name]
 
-                showValue("Total",cryptoNewer.getTotal(),cryptoOlder.getTotal(),days,headerTitle=crypto.name)
-                showValue("Total-Plan",cryptoNewer.getTotal()-cryptoNewer.earnPlan,cryptoOlder.getTotal()-cryptoOlder.earnPlan,days)
-                showValue("Spot+Order",cryptoNewer.orderWalletTotal,cryptoOlder.orderWalletTotal,days)
+                showValue("Total",growthTotal,column,headerTitle=cryptoNewer.name)
+                showValue("Total-Plan",growthTotalPlan,column)
+                showValue("Spot+Order",growthOf["orderWalletTotal"],column)
 
-                if cryptoNewer.orderWalletLocked>0.0 or cryptoOlder.orderWalletLocked>0.0:
-                    showValue("Ord-Locked",cryptoNewer.orderWalletLocked,cryptoOlder.orderWalletLocked,days)
+                showField("Ord-Locked","orderWalletLocked",column)
 
-                if cryptoNewer.earnFlexible>0.0 or cryptoOlder.earnFlexible>0.0:
-                    showValue("Earn-Flexible",cryptoNewer.earnFlexible,cryptoOlder.earnFlexible,days)
+                showField("Earn-Flexible","earnFlexible",column)
                 if cryptoNewer.hasFlexiblePossibility and cryptoNewer.canUseFlexible:
                     print("%sEarn-Flexible is available, but not used%s" % (Colors.CYELLOW,Colors.CRESET))
 
-                if cryptoNewer.earnLocked>0.0 or cryptoOlder.earnLocked>0.0:
-                    showValue("Earn-Locked",cryptoNewer.earnLocked,cryptoOlder.earnLocked,days)
+                showField("Earn-Locked","earnLocked",column)
                 if cryptoNewer.hasLockedPossibility and cryptoNewer.canUseLocked:
                     print("%sEarn-Locked is available, but not used%s" % (Colors.CYELLOW,Colors.CRESET))
 
-                if cryptoNewer.liquidSwapValue>0.0 or cryptoOlder.liquidSwapValue>0.0:
-                    showValue("Liquid",cryptoNewer.liquidSwapValue,cryptoOlder.liquidSwapValue,days)
-
-                if cryptoNewer.earnPlan>0.0 or cryptoOlder.earnPlan>0.0:
-                    showValue("Plan",cryptoNewer.earnPlan,cryptoOlder.earnPlan,days)
-
-                if cryptoNewer.paymentDeposit>0.0 or cryptoOlder.paymentDeposit>0.0:
-                    showValue("Deposit",cryptoNewer.paymentDeposit,cryptoOlder.paymentDeposit)
-                if cryptoNewer.paymentWithdraw>0.0 or cryptoOlder.paymentWithdraw>0.0:
-                    showValue("Withdraw",cryptoNewer.paymentWithdraw,cryptoOlder.paymentWithdraw)
+                showField("Liquid","liquidSwapValue",column)
+                showField("Plan","earnPlan",column)
+                showField("Deposit","paymentDeposit",column)
+                showField("Withdraw","paymentWithdraw",column)
 
                 # show growth info of USDC value
-                olderUSDC = cryptoOlder.getConvertedTotalByName("USDC")
-                newerUSDC = cryptoNewer.getConvertedTotalByName("USDC")
-
-                if olderUSDC is not None and newerUSDC is not None:
-                    showValue("USDC Value",newerUSDC.total,olderUSDC.total,days)
+                if not np.isnan(growthUSDC.newer[column]) and not np.isnan(growthUSDC.older[column]):
+                    showValue("USDC Value",growthUSDC,column)
                 else:
                     print(f"{Colors.CYELLOW}USDC Value not available for growth calculation{Colors.CRESET}")
 
                 # show rating
-                # ----------------
-                cryptoNewer.rating = "There is not enough data to calculate growth"
-
-                # if enough kline data is available
-                if len(cryptoNewer.monthKlines["closes"]) <=1 or len(cryptoNewer.monthKlines["volumes"]) <=1:
-                    cryptoNewer.rating = f"{Colors.CYELLOW}Not enough kline data to calculate growth{Colors.CRESET}"
-                else:
-                    closes = cryptoNewer.monthKlines["closes"]
-                    volumes = cryptoNewer.monthKlines["volumes"]
-                    ratingSymbol = cryptoNewer.monthKlines["symbol"]
-
-                    def _formatNumberWithSuffix(value: float) -> str:
-                        if abs(value) >= 1_000_000:
-                            return f"{value / 1_000_000:.2f}M"
-                        elif abs(value) >= 1_000:
-                            return f"{value / 1_000:.2f}K"
-                        else:
-                            return f"{value:.2f}"
-
-                    def _trend_pct(series: list[float], months: int) -> float | None:
-                        """Prozentänderung über 'months' zwischen letztem und Wert vor months."""
-                        if len(series) <= months:
-                            return None
-                        last = series[-1]
-                        prev = series[-1 - months]
-                        if prev == 0:
-                            return None
-                        return (last - prev) / prev * 100
-
-                    def _trend_and_keep(pct: float | None) -> tuple[str, str, str]:
-                        if pct is None:
-                            return "❓", "REVIEW", Colors.CYELLOW
-                        if pct >= 20:
-                            return "⬆️ ⬆️ ", "KEEP", Colors.CGREEN
-                        if pct >= 5:
-                            return "⬆️ ", "KEEP", Colors.CGREEN
-                        if pct <= -20:
-                            return "⬇️ ⬇️ ", "DROP", Colors.CRED
-                        if pct <= -5:
-                            return "⬇️ ", "REVIEW", Colors.CYELLOW
-                        # default sideway right
-                        return "➡️ ", "REVIEW", Colors.CYELLOW
-
-                    months = 6
-                    # check whether enough data
-                    if len(closes) < months+1:
-                        months = len(closes) - 1
-
-                    price_pct = _trend_pct(closes, months)
-                    vol_pct = _trend_pct(volumes, months)
-
-                    price_trend, price_keep, price_color = _trend_and_keep(price_pct)
-                    vol_trend, vol_keep, vol_color = _trend_and_keep(vol_pct)
-
-                    price_part = "n/a"
-                    if price_pct is not None:
-                        last_price = closes[-1]
-                        prev_price = closes[-1 - months]
-                        price_part = f"{price_color}{price_trend} {price_pct:+.1f}% ({prev_price} -> {last_price} {ratingSymbol}){Colors.CRESET}"
-
-                    vol_part = "n/a"
-                    if vol_pct is not None:
-                        last_vol = volumes[-1]
-                        prev_vol = volumes[-1 - months]
-                        vol_part = f"{vol_color}{vol_trend} {vol_pct:+.1f}% ({_formatNumberWithSuffix(prev_vol)} -> {_formatNumberWithSuffix(last_vol)} {ratingSymbol}){Colors.CRESET}"
-
-                    flag = "🟡 REVIEW"
-                    flag_color = Colors.CYELLOW
-                    if price_keep == "KEEP" and vol_keep == "KEEP":
-                        flag = "🟢 KEEP"
-                        flag_color = Colors.CGREEN
-                    if price_keep == "DROP" or vol_keep == "DROP":
-                        flag = "🔴 DROP"
-                        flag_color = Colors.CRED
-
-                    # store in crypto set
-                    cryptoNewer.rating = (
-                        f"{flag_color}{flag}{Colors.CRESET} | "
-                        f"Price {months}M: {price_part} | "
-                        f"Vol {months}M: {vol_part}"
-                    )
-
-                # show growth string
                 print(cryptoNewer.rating)
 
-            showValue("∑ BTC all",setNewer.totalBTC.total,setOlder.totalBTC.total,days,headerTitle=" ")
-            n=setNewer.totalBTC.total-setNewer.totalBTC.deposit
-            o=setOlder.totalBTC.total-setOlder.totalBTC.deposit
-            showValue("∑ BTC -Depo",n,o,days)
+            showValue("∑ BTC all",history.compareSetTotals(newer,older,"BTC"),headerTitle=" ")
+            showValue("∑ BTC -Depo",history.compareSetTotals(newer,older,"BTC",withoutDeposit=True))
 
-            showValue("∑ USDC all",setNewer.totalUSDC.total,setOlder.totalUSDC.total,days)
-            n=setNewer.totalUSDC.total-setNewer.totalUSDC.deposit
-            o=setOlder.totalUSDC.total-setOlder.totalUSDC.deposit
-            showValue("∑ USDC -Depo",n,o,days)
+            showValue("∑ USDC all",history.compareSetTotals(newer,older,"USDC"))
+            showValue("∑ USDC -Depo",history.compareSetTotals(newer,older,"USDC",withoutDeposit=True))
 
         # differenc growth between last and first
         # printSection(f"Last to first... {last.time} to {first.time}")
         # showDiff(last,first)
 
-        # differenc growth between last and before
-        printSection(f"Last to before... {last.time} to {before.time}")
-        showDiff(last,before)
+        # differenc growth between last and before, with several nr. of days one column each
+        if len(allBefore)==1:
+            printSection(f"Last to before... {last.time} to {allBefore[0].time}")
+            showDiff(last,allBefore[0])
+        else:
+            printSection(f"Last to {', '.join('%d days' % (days) for days in compareNrOfDays)} before... {last.time}")
+            showHorizons(last,allBefore)
+
+    def addGatheredSets(self, cryptoSets:list[CryptoSet]):
+        # sets gathered by another process, saved with the next saveData
+        for cryptoSet in cryptoSets:
+            self.cryptoSetList.append(cryptoSet)
+            self.unsavedSets.append(cryptoSet)
+            self.timeIndex.add(SnapshotRef(cryptoSet.timestamp,"%s" % (cryptoSet.uuid),cryptoSet=cryptoSet))
+
+    def showAnalytics(self, windowDays:float):
+        printSection(f"Analytics of {len(self.timeIndex)} datasets")
+        if len(self.timeIndex)==0:
+            return
+        with Profiler.phase("analytics"):
+            # the whole history, sets are not kept after their values are in the matrix
+            with Profiler.phase("analytics.history"):
+                history=HistoryMatrix(self.iterCryptoSets(self.timeIndex.allRefs))
+            analytics=HistoryAnalytics(history,windowDays)
+        analytics.show()
+
+    def revalueStoredSets(self, startTimestamp:float, endTimestamp:float, sequential:bool=False):
+        """
+        Re-prices the stored sets between both timestamps in BTC, USDC and the totalCurrencies
+        with the daily closes of the price history and the conversion routes of now.
+        """
+        refs=self.timeIndex.getRange(startTimestamp,endTimestamp)
+        printSection(f"Re-valuation of {len(refs)} datasets")
+        if len(refs)==0:
+            return
 
-    def fromJSON(self,jsonContent):
+        # all assets of the sets, read without building the sets
+        with Profiler.phase("revalue.assets"):
+            assets=sorted({crypto["asset"] for entry in self.storage.iterSelected(refs) for crypto in entry["crypto"]})
+
+        # pairs and routes of now, e.g. after changing conversionBridges
+        print("Gathering price tickers...")
+        tickers=self.spotClient.ticker_price()
+        if self.symbolIndexSource=="exchangeInfo":
+            symbolIndex=SymbolIndex.fromExchangeInfo(self.spotClient.exchange_info())
+        else:
+            symbolIndex=SymbolIndex.fromTickers(tickers,assets)
+        graph=ConversionGraph({entry["symbol"]: float(entry["price"]) for entry in tickers},symbolIndex,
+                              bridges=PriceConversion.bridges,maxHops=PriceConversion.maxHops)
+        engine=RevaluationEngine(self.priceHistory,graph,symbolIndex,["BTC","USDC"]+self.totalCurrencies,assets)
+
+        # daily prices of all pairs from the first day of the sets on, only missing days are fetched
+        symbols=engine.getSymbols()
+        print("Gathering daily prices of %d pairs..." % (len(symbols)))
+        with Profiler.phase("revalue.prices"):
+            gatherEngine=GatherEngine(maxWorkers=self.gatherWorkers, sequential=sequential)
+            self.priceHistory.addFetchTasks(gatherEngine,self.spotClient,symbols,int(refs[0].timestamp*1000)-PriceHistory.DAY_MS,int(refs[-1].timestamp*1000))
+            self.priceHistory.applyFetchResults(gatherEngine.run())
+            self.priceHistory.save()
+        self.rateLimiter.printUsage()
+
+        allMissing:list[int]=[]
+
+        def iterRevalued():
+            # sets are re-priced chunk by chunk and not kept
+            for start in range(0,len(refs),RevaluationEngine.CHUNK_SIZE):
+                chunk=refs[start:start+RevaluationEngine.CHUNK_SIZE]
+                cryptoSets=list(self.iterCryptoSets(chunk))
+                with Profiler.phase("revalue.sets"):
+                    allMissing.append(engine.revalue(cryptoSets))
+                for ref, cryptoSet in zip(chunk,cryptoSets):
+                    # v1 sets have no uuid, they keep the one of their index entry
+                    cryptoSet.uuid=ref.uuid
+                    yield cryptoSet.toJSON()
+
+        print("Re-valuing and saving datasets...")
+        with Profiler.phase("revalue.save"):
+            self.storage.update(refs,iterRevalued())
+
+        # the positions of the sets in the storage have changed
+        self.timeIndex=SnapshotTimeIndex(self.storage.loadIndex())
+        self.cryptoSetList=[]
+        print("Re-valued %d datasets, %d converted totals without a price were kept" % (len(refs),sum(allMissing)))
+
+    def _createCryptoSetFromJSON(self,entry:dict) -> CryptoSet:
+        newCryptoSet=CryptoSet()
+        newCryptoSet.fromJSON(entry)
+        return newCryptoSet
+
+    def _addCryptoSetsFromJSON(self,jsonList:list):
         entry:dict
-        for entry in jsonContent["binanceDataSet"]:
-            newCryptoSet=CryptoSet(setSpotClient=self.spotClient)
-            newCryptoSet.fromJSON(entry)
+        refs:list[SnapshotRef]=[]
+        for entry in jsonList:
+            newCryptoSet=self._createCryptoSetFromJSON(entry)
             self.cryptoSetList.append(newCryptoSet)
+            refs.append(SnapshotRef(newCryptoSet.timestamp,"%s" % (newCryptoSet.uuid),cryptoSet=newCryptoSet))
+        self.timeIndex.addAll(refs)
 
-        print("Found %d datasets" % (len(self.cryptoSetList)))
+    def fromJSON(self,jsonContent):
+        self._addCryptoSetsFromJSON(jsonContent["binanceDataSet"])
+
+        print("Found %d datasets" % (len(self.timeIndex)))
 
     def toJSON(self) -> dict:
         jsonList:list=[]
         entry:CryptoSet
 
-        for entry in self.cryptoSetList:
+        for entry in self.getCryptoSets(self.timeIndex.allRefs):
             jsonList.append(entry.toJSON())
 
         jsonDict = {
@@ -505,20 +674,77 @@ class BinanceDataSet:
 
     def loadData(self):
         print("Loading data...")
-        jsonContent:dict=dict()
-        if Files.databaseExists():
-            with open(Files.getDatabaseFilenameWithPath(), "r", encoding="utf8") as infile:
-                jsonContent=json.load(infile)
-                logging.debug(jsonContent)
-                infile.close()
+        if self.storage.exists():
+            # only the index is read, sets are built when a command needs them
+            with Profiler.phase("load.index"):
+                self.timeIndex=SnapshotTimeIndex(self.storage.loadIndex())
 
-            self.fromJSON(jsonContent)
+            print("Found %d datasets" % (len(self.timeIndex)))
 
     def saveData(self):
         print("Saving data...")
-        # print JSON for database
-        jsonContent=self.toJSON()
+        with Profiler.phase("save"):
+            self.storage.save(self)
+        self.unsavedSets=[]
 
-        with open(Files.getDatabaseFilenameWithPath(), "w", encoding="utf8") as outfile:
-            json.dump(jsonContent, outfile, indent=4, sort_keys=False)
-            outfile.close()
+    def compactData(self):
+        if not hasattr(self.storage, "compact"):
+            print(f"Storage {self.storage.name} does not need a compaction.")
+            return
+        print("Compacting data...")
+        count=self.storage.compact()
+        print("Compacted to %d datasets" % (count))
+
+    def importJSONDatabase(self):
+        # one-time import of database.json into the append-only log or sqlite database
+        if not hasattr(self.storage, "append"):
+            raise ValueError(f"Import is not possible into storage {self.storage.name}, please change settings")
+        jsonStorage=JsonStorage(account=self.account)
+        if not jsonStorage.exists():
+            raise ValueError(f"{jsonStorage.getFilename()} not found")
+
+        print(f"Importing {jsonStorage.getFilename()}...")
+        knownUUIDs={ref.uuid for ref in self.timeIndex}
+        importedEntries:list[dict]=[]
+        for entry in jsonStorage.load():
+            # entries are copied as they are, sets without uuid get one like in CryptoSet
+            if "uuid" not in entry:
+                entry["uuid"]="%s" % (uuid.uuid4())
+            if entry["uuid"] not in knownUUIDs:
+                # a set stored twice in database.json is imported once
+                knownUUIDs.add(entry["uuid"])
+                importedEntries.append(entry)
+
+        self.storage.append(importedEntries)
+        self.timeIndex=SnapshotTimeIndex(self.storage.loadIndex())
+        print("Imported %d datasets" % (len(importedEntries)))
+        self.compactData()
+
+    def exportJSONDatabase(self):
+        # write all sets of the configured storage into database.json, e.g. from the binary format
+        jsonStorage=JsonStorage(account=self.account)
+        if self.storage.name==jsonStorage.name:
+            raise ValueError("Storage is already json, nothing to export")
+
+        print(f"Exporting to {jsonStorage.getFilename()}...")
+        jsonStorage.rewrite(self.storage.iterSelected(self.timeIndex.allRefs))
+        print("Exported %d datasets" % (len(self.timeIndex)))
+
+    def showAssetHistory(self, asset:str, currency:str="USDC"):
+        printSection(f"History of {asset}")
+        # sqlite reads only the rows of the asset, other storages use the loaded sets
+        if hasattr(self.storage, "loadAssetHistory"):
+            history=self.storage.loadAssetHistory(asset,currency)
+        else:
+            history=[]
+            # sets are read one after another and not kept
+            for jsonEntry in self.storage.iterSelected(self.timeIndex.allRefs):
+                entry=self._createCryptoSetFromJSON(jsonEntry)
+                if asset in entry.allCryptos:
+                    crypto:Crypto=entry.allCryptos[asset]
+                    converted=crypto.getConvertedTotalByName(currency)
+                    history.append((entry.timestamp,entry.time,crypto.getTotal(),converted.total if converted is not None else None))
+
+        print("%-26s %17s %17s" % ("Time","Total",currency))
+        for timestamp, time, total, convertedTotal in history:
+            print("%-26s %17.8f %17s" % (time,total,"%.8f" % convertedTotal if convertedTotal is not None else "n/a"))
@@ -0,0 +1,69 @@
+# class to index the Simple Earn product catalogs by asset
+# License: MIT
+# Author: mhl5k
+
+import logging
+
+from crypto import Crypto
+
+
+class EarnProductCatalog:
+
+    class ProductInfo:
+        def __init__(self):
+            self.count:int=0
+            self.soldOut:int=0
+            # lowest min purchase amount of all products of the asset
+            self.minPurchaseAmount:float=float("inf")
+
+        def add(self, isSoldOut:bool, minPurchaseAmount:float):
+            self.count+=1
+            self.soldOut+=1 if isSoldOut else 0
+            self.minPurchaseAmount=min(self.minPurchaseAmount,minPurchaseAmount)
+
+        def isAvailable(self) -> bool:
+            return self.count>0 and self.soldOut<self.count
+
+        def canUse(self, amount:float) -> bool:
+            return amount>=self.minPurchaseAmount
+
+    def addFlexibleProducts(self, rows:list):
+        for s in rows:
+            info=self.allFlexible.setdefault(s["asset"],EarnProductCatalog.ProductInfo())
+            info.add(s["isSoldOut"]==True,float(s["minPurchaseAmount"]))
+
+    def addLockedProducts(self, rows:list):
+        for s in rows:
+            info=self.allLocked.setdefault(s["detail"]["asset"],EarnProductCatalog.ProductInfo())
+            info.add(s["detail"]["isSoldOut"]==True,float(s["quota"]["minimum"]))
+
+    def getFlexible(self, asset:str) -> "EarnProductCatalog.ProductInfo | None":
+        return self.allFlexible.get(asset)
+
+    def getLocked(self, asset:str) -> "EarnProductCatalog.ProductInfo | None":
+        return self.allLocked.get(asset)
+
+    def updateFlexiblePossibility(self, crypto:Crypto, freeAmount:float):
+        info=self.getFlexible(crypto.name)
+        if info is None:
+            return
+        crypto.hasFlexiblePossibility=info.isAvailable()
+        crypto.canUseFlexible=crypto.canUseFlexible or info.canUse(freeAmount)
+        logging.debug(f" {crypto.name} hasFlexibleCount: {info.count}, soldOut: {info.soldOut}, hasFlexiblePossibility: {crypto.hasFlexiblePossibility}, minPurchaseReached: {crypto.canUseFlexible}")
+
+    def updateLockedPossibility(self, crypto:Crypto, flexibleAmount:float):
+        info=self.getLocked(crypto.name)
+        if info is None:
+            return
+        crypto.hasLockedPossibility=info.isAvailable()
+        crypto.canUseLocked=crypto.canUseLocked or info.canUse(flexibleAmount)
+        logging.debug(f" {crypto.name} hasLockedCount: {info.count}, soldOut: {info.soldOut}, hasLockedPossibility: {crypto.hasLockedPossibility}, minPurchaseReached: {crypto.canUseLocked}")
+
+    def __init__(self, flexibleRows:list, lockedRows:list):
+        # product infos keyed by asset
+        self.allFlexible:dict[str, EarnProductCatalog.ProductInfo]={}
+        self.allLocked:dict[str, EarnProductCatalog.ProductInfo]={}
+
+        self.addFlexibleProducts(flexibleRows)
+        self.addLockedProducts(lockedRows)
+        logging.debug(f"Earn catalog: {len(self.allFlexible)} flexible and {len(self.allLocked)} locked assets")
@@ -0,0 +1,69 @@
+# class to run independent gather tasks with a bounded worker pool
+# License: MIT
+# Author: mhl5k
+
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import time
+
+
+class GatherEngine:
+
+    class Task:
+        def __init__(self, name:str, function, args:tuple, kwargs:dict):
+            self.name:str=name
+            self.function=function
+            self.args:tuple=args
+            self.kwargs:dict=kwargs
+
+        def run(self):
+            startTime=time.perf_counter()
+            result=self.function(*self.args, **self.kwargs)
+            logging.debug(f"Gather task {self.name} done in {time.perf_counter()-startTime:.3f}s")
+            return result
+
+    def addTask(self, name:str, function, *args, **kwargs):
+        """
+        Adds a task to the engine. Tasks must not depend on each other,
+        their results are merged by the caller after run().
+
+        :param name: unique name of the task, used as key in the result dict
+        :param function: function to call, usually a SpotClient method
+        """
+        if name in self.allTasks:
+            raise ValueError(f"Gather task {name} already added")
+        self.allTasks[name]=GatherEngine.Task(name,function,args,kwargs)
+
+    def run(self) -> dict:
+        """
+        Runs all added tasks and returns their results.
+
+        :return: dict of task name to result, in the order the tasks were added
+        """
+        tasks:list[GatherEngine.Task]=list(self.allTasks.values())
+        self.allTasks={}
+
+        results:dict={}
+        if self.sequential or self.maxWorkers<=1 or len(tasks)<=1:
+            for task in tasks:
+                results[task.name]=task.run()
+            return results
+
+        logging.debug(f"Running {len(tasks)} gather tasks with {self.maxWorkers} workers")
+        with ThreadPoolExecutor(max_workers=self.maxWorkers) as executor:
+            futures=[(task.name, executor.submit(task.run)) for task in tasks]
+            # collect in order of adding, first error is raised after all tasks have been finished
+            for name, future in futures:
+                results[name]=future.result()
+
+        return results
+
+    def __init__(self, maxWorkers:int=4, sequential:bool=False):
+        # max nr. of parallel running tasks
+        self.maxWorkers:int=maxWorkers
+
+        # run all tasks one after another in the calling thread
+        self.sequential:bool=sequential
+
+        # all tasks to run, keyed by name
+        self.allTasks:dict[str, GatherEngine.Task]={}
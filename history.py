@@ -0,0 +1,151 @@
+# class to hold all loaded CryptoSets as columns for vectorized analysis
+# License: MIT
+# Author: mhl5k
+
+from operator import attrgetter
+
+import numpy as np
+
+from cryptoset import CryptoSet
+
+
+class HistoryMatrix:
+
+    # balance fields of Crypto, each one becomes a snapshot x asset matrix
+    FIELDS: list[str] = [
+        "orderWalletFree", "orderWalletLocked", "orderWalletTotal", "liquidSwapValue",
+        "earnFlexible", "earnLocked", "earnPlan", "paymentDeposit", "paymentWithdraw"
+    ]
+
+    # currencies of the converted totals
+    CURRENCIES: list[str] = ["BTC", "USDC"]
+
+    class Growth:
+        """
+        Growth between two values or two rows of values, all members are numpy arrays or floats.
+        """
+        def __init__(self, newer, older, days:float):
+            self.newer=np.asarray(newer, dtype=np.float64)
+            self.older=np.asarray(older, dtype=np.float64)
+            self.diff=self.newer-self.older
+            # percent only when older value is greater than zero
+            with np.errstate(divide="ignore", invalid="ignore"):
+                self.perc=np.where(self.older>0, self.newer/self.older*100-100, 0.0)
+            self.days:int=int(max(days,1))
+            self.percPerDay=self.perc/max(days,1)
+
+    def getTotal(self) -> np.ndarray:
+        # same as Crypto.getTotal for every snapshot and asset
+        return self.allFields["orderWalletTotal"]+self.allFields["liquidSwapValue"]+self.allFields["earnFlexible"]+self.allFields["earnLocked"]
+
+    def getDays(self, newer:int, older:int) -> float:
+        return (self.timestamps[newer]-self.timestamps[older])/3600/24
+
+    def compareAssets(self, newer:int, older:int, values:np.ndarray, days:float|None=None) -> "HistoryMatrix.Growth":
+        """
+        Growth of all assets between two snapshot rows of a snapshot x asset matrix.
+        """
+        if days is None:
+            days=self.getDays(newer,older)
+        return HistoryMatrix.Growth(values[newer],values[older],days)
+
+    def compareSetTotals(self, newer:int, older:int, currency:str, withoutDeposit:bool=False) -> "HistoryMatrix.Growth":
+        values=self.allSetTotals[currency]
+        if withoutDeposit:
+            values=values-self.allSetDeposits[currency]
+        return HistoryMatrix.Growth(values[newer],values[older],self.getDays(newer,older))
+
+    def getNetFlows(self, currency:str) -> np.ndarray:
+        # deposits minus withdrawals of every snapshot and asset in currency, 0 when unknown
+        return np.nan_to_num(self.allConvertedDeposits[currency])-self.allConvertedWithdrawals[currency]
+
+    def getSetNetFlows(self, currency:str) -> np.ndarray:
+        return self.allSetDeposits[currency]-self.allSetWithdrawals[currency]
+
+    def _convertWithdrawals(self, currency:str) -> np.ndarray:
+        """
+        Withdrawals of every snapshot and asset at the rate of its converted total, the last known
+        rate of the asset when nothing is left after the withdrawal, 0 when no rate is known.
+        """
+        total=self.getTotal()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rates=np.where(total>0,self.allConverted[currency]/total,np.nan)
+        known=np.isfinite(rates)
+        rows=np.arange(len(rates))[:,None]
+        lastKnown=np.maximum.accumulate(np.where(known,rows,0),axis=0)
+        rates=rates[lastKnown,np.arange(rates.shape[1])]
+        withdrawals=self.allFields["paymentWithdraw"]
+        return np.where((withdrawals!=0) & np.isfinite(rates),withdrawals*rates,0.0)
+
+    def getIndexOfSet(self, cryptoSet:CryptoSet) -> int:
+        return self.allSetIndexes["%s" % (cryptoSet.uuid)]
+
+    def __init__(self, cryptoSets):
+        """
+        cryptoSets may be a list or any other iterable, e.g. sets which are built one after
+        another from the storage. Each set is read once and not kept.
+        """
+        fields=HistoryMatrix.FIELDS
+        currencies=HistoryMatrix.CURRENCIES
+        getFields=attrgetter(*fields)
+
+        timestamps:list[float]=[]
+        self.allSetIndexes:dict[str, int]={}
+        setTotals:dict[str, list[float]]={c: [] for c in currencies}
+        setDeposits:dict[str, list[float]]={c: [] for c in currencies}
+
+        # per set: columns in order of first appearance, fields and converted totals/deposits of its cryptos
+        firstColumns:dict[str, int]={}
+        allRows:list[tuple[np.ndarray, np.ndarray, np.ndarray]]=[]
+        for row, cryptoSet in enumerate(cryptoSets):
+            timestamps.append(cryptoSet.timestamp)
+            self.allSetIndexes["%s" % (cryptoSet.uuid)]=row
+            for currency in currencies:
+                total=cryptoSet.getTotalByName(currency)
+                setTotals[currency].append(total.total)
+                setDeposits[currency].append(total.deposit)
+
+            cryptos=list(cryptoSet.allCryptos.values())
+            columns=np.array([firstColumns.setdefault(c.name,len(firstColumns)) for c in cryptos], dtype=np.intp)
+            values=np.array([getFields(c) for c in cryptos], dtype=np.float64).reshape(len(cryptos),len(fields))
+            converted=np.full((len(cryptos),2*len(currencies)), np.nan)
+            for i, crypto in enumerate(cryptos):
+                for j, currency in enumerate(currencies):
+                    convertedTotal=crypto.allTotals.get(currency)
+                    if convertedTotal is not None:
+                        converted[i,2*j]=convertedTotal.total
+                        converted[i,2*j+1]=convertedTotal.deposit
+            allRows.append((columns, values, converted))
+
+        # snapshots in order of the given sets
+        self.timestamps:np.ndarray=np.array(timestamps, dtype=np.float64)
+
+        # all assets of all snapshots, sorted by name
+        self.assets:list[str]=sorted(firstColumns)
+        self.assetIndex:dict[str, int]={name: i for i, name in enumerate(self.assets)}
+        sortedColumns=np.array([self.assetIndex[name] for name in firstColumns], dtype=np.intp)
+
+        shape=(len(allRows),len(self.assets))
+        self.present:np.ndarray=np.zeros(shape, dtype=bool)
+        self.allFields:dict[str, np.ndarray]={field: np.zeros(shape) for field in fields}
+
+        # converted totals, NaN when not available for a snapshot and asset
+        self.allConverted:dict[str, np.ndarray]={c: np.full(shape, np.nan) for c in currencies}
+        self.allConvertedDeposits:dict[str, np.ndarray]={c: np.full(shape, np.nan) for c in currencies}
+
+        # set totals per snapshot
+        self.allSetTotals:dict[str, np.ndarray]={c: np.array(setTotals[c], dtype=np.float64) for c in currencies}
+        self.allSetDeposits:dict[str, np.ndarray]={c: np.array(setDeposits[c], dtype=np.float64) for c in currencies}
+
+        for row, (columns, values, converted) in enumerate(allRows):
+            columns=sortedColumns[columns]
+            self.present[row,columns]=True
+            for i, field in enumerate(fields):
+                self.allFields[field][row,columns]=values[:,i]
+            for j, currency in enumerate(currencies):
+                self.allConverted[currency][row,columns]=converted[:,2*j]
+                self.allConvertedDeposits[currency][row,columns]=converted[:,2*j+1]
+
+        # withdrawals are not converted when gathered, only their amounts are stored
+        self.allConvertedWithdrawals:dict[str, np.ndarray]={c: self._convertWithdrawals(c) for c in currencies}
+        self.allSetWithdrawals:dict[str, np.ndarray]={c: self.allConvertedWithdrawals[c].sum(axis=1) for c in currencies}
@@ -0,0 +1,114 @@
+# class to store the monthly klines of all stored sets once per pair and month
+# License: MIT
+# Author: mhl5k
+
+from datetime import datetime, timezone
+import logging
+
+
+class KlineArchive:
+    """
+    Stored sets keep only a reference to their klines (klinesRef): the quote symbol,
+    the month of the last candle and the nr. of candles. The last candle is still open
+    when a set is gathered and stays in the set, all closed candles are the same in
+    every set and are stored once per pair and month.
+    """
+
+    @staticmethod
+    def getMonth(timestamp:float) -> str:
+        # binance candles start at the UTC month
+        return datetime.fromtimestamp(timestamp, tz=timezone.utc).strftime("%Y-%m")
+
+    @staticmethod
+    def getMonths(lastMonth:str, count:int) -> list[str]:
+        """
+        Returns count months up to lastMonth, oldest first.
+        """
+        year, month=int(lastMonth[:4]), int(lastMonth[5:7])
+        first=year*12+month-1-(count-1)
+        return ["%04d-%02d" % (m//12, m%12+1) for m in range(first, first+count)]
+
+    def reference(self, entry:dict) -> dict:
+        """
+        Returns a stored set with klinesRef instead of klines, closed candles are added to the archive.
+        """
+        if "crypto" not in entry or "timestamp" not in entry:
+            return entry
+        month=KlineArchive.getMonth(float(entry["timestamp"]))
+        referenced=dict(entry)
+        referenced["crypto"]=[self.referenceCrypto(crypto,month) for crypto in entry["crypto"]]
+        return referenced
+
+    def referenceCrypto(self, crypto:dict, month:str) -> dict:
+        klines=crypto.get("klines")
+        if not isinstance(klines, dict) or list(klines.keys())!=["symbol", "volumes", "closes"]:
+            return crypto
+        volumes, closes=klines["volumes"], klines["closes"]
+        if len(closes)==0 or len(volumes)!=len(closes):
+            return crypto
+
+        pair=crypto["asset"]+klines["symbol"]
+        months=KlineArchive.getMonths(month,len(closes))
+        stored=self.allMonths.get(pair,{})
+        for m, volume, close in zip(months[:-1],volumes,closes):
+            # e.g. gathered at the turn of a month, these klines stay in the set
+            if m in stored and stored[m]!=[volume, close]:
+                logging.debug(f"Klines of {pair} {m} differ from archive, kept in set")
+                return crypto
+
+        for m, volume, close in zip(months[:-1],volumes,closes):
+            if m not in stored:
+                stored[m]=[volume, close]
+                self.newMonths.append((pair, m, volume, close))
+        if len(stored)>0:
+            self.allMonths[pair]=stored
+
+        ref={"symbol": klines["symbol"], "month": month, "count": len(closes), "open": [volumes[-1], closes[-1]]}
+        return {("klinesRef" if key=="klines" else key): (ref if key=="klines" else value) for key, value in crypto.items()}
+
+    def resolve(self, entry:dict) -> dict:
+        """
+        Returns a stored set with klines like Crypto.toJSON writes them.
+        """
+        if not any("klinesRef" in crypto for crypto in entry.get("crypto",[])):
+            return entry
+        resolved=dict(entry)
+        resolved["crypto"]=[self.resolveCrypto(crypto) for crypto in entry["crypto"]]
+        return resolved
+
+    def resolveCrypto(self, crypto:dict) -> dict:
+        ref=crypto.get("klinesRef")
+        if ref is None:
+            return crypto
+
+        pair=crypto["asset"]+ref["symbol"]
+        stored=self.allMonths.get(pair,{})
+        volumes:list[float]=[]
+        closes:list[float]=[]
+        for m in KlineArchive.getMonths(ref["month"],ref["count"])[:-1]:
+            if m not in stored:
+                raise ValueError(f"Klines of {pair} {m} are missing in the kline archive")
+            volumes.append(stored[m][0])
+            closes.append(stored[m][1])
+        volumes.append(ref["open"][0])
+        closes.append(ref["open"][1])
+
+        klines={"symbol": ref["symbol"], "volumes": volumes, "closes": closes}
+        return {("klines" if key=="klinesRef" else key): (klines if key=="klinesRef" else value) for key, value in crypto.items()}
+
+    def toJSON(self) -> dict:
+        jsonDict = {
+            "version": 1,
+            "months": self.allMonths
+        }
+        return jsonDict
+
+    def fromJSON(self, jsonContent:dict):
+        self.allMonths=jsonContent["months"]
+
+    def __init__(self):
+        # [volume, close] per pair and month, e.g. allMonths["ETHUSDC"]["2025-03"]
+        self.allMonths:dict[str, dict[str, list[float]]]={}
+
+        # months added since loading, (pair, month, volume, close)
+        self.newMonths:list[tuple]=[]
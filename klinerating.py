@@ -0,0 +1,206 @@
+# class to rate assets by the trend of their monthly klines
+# License: MIT
+# Author: mhl5k
+
+import hashlib
+import json
+import logging
+import struct
+
+import numpy as np
+
+from mhl5k.colors import Colors
+from mhl5k.files import Files
+from crypto import Crypto
+
+
+class KlineRatingEngine:
+    """
+    Rates assets by the trend of their monthly closes and volumes over each horizon (months):
+    KEEP when price and volume rise on all horizons, DROP when one of them falls strongly,
+    REVIEW otherwise. All assets to rate are scored at once from a closes and a volumes
+    matrix (asset x month, aligned at the last month). The latest rating of each asset and
+    symbol is kept in ratings.json with a digest of its klines, so unchanged klines are not
+    rated again, also not in the next run. Ratings of other settings are dropped on load.
+    """
+
+    NOT_ENOUGH_DATA: str = f"{Colors.CYELLOW}Not enough kline data to calculate growth{Colors.CRESET}"
+
+    # trend from the percent change, in order of the checks: arrows, keep level
+    KEEP: int = 0
+    REVIEW: int = 1
+    DROP: int = 2
+    TRENDS: list[tuple[str, int]] = [("⬆️ ⬆️ ", KEEP), ("⬆️ ", KEEP), ("⬇️ ⬇️ ", DROP), ("⬇️ ", REVIEW), ("➡️ ", REVIEW), ("❓", REVIEW)]
+    COLORS: list[str] = [Colors.CGREEN, Colors.CYELLOW, Colors.CRED]
+    FLAGS: list[str] = ["🟢 KEEP", "🟡 REVIEW", "🔴 DROP"]
+
+    @staticmethod
+    def formatNumberWithSuffix(value:float) -> str:
+        if abs(value) >= 1_000_000:
+            return f"{value / 1_000_000:.2f}M"
+        elif abs(value) >= 1_000:
+            return f"{value / 1_000:.2f}K"
+        else:
+            return f"{value:.2f}"
+
+    @staticmethod
+    def _getKey(crypto:Crypto) -> str:
+        return f"{crypto.name}/{crypto.monthKlines['symbol']}"
+
+    @staticmethod
+    def _getDigest(crypto:Crypto) -> str:
+        # changes with every new month and with the closes and volumes of the open one
+        closes=crypto.monthKlines["closes"]
+        volumes=crypto.monthKlines["volumes"]
+        return hashlib.sha1(struct.pack(f"<II{len(closes)}d{len(volumes)}d",len(closes),len(volumes),*closes,*volumes)).hexdigest()
+
+    @staticmethod
+    def _toMatrix(allSeries:list[list[float]]) -> tuple[np.ndarray, np.ndarray]:
+        # one row per asset, aligned at the last month, NaN before the first month
+        lengths=np.array([len(series) for series in allSeries])
+        matrix=np.full((len(allSeries),max(lengths.max(),1)),np.nan)
+        for row, series in enumerate(allSeries):
+            if len(series)>0:
+                matrix[row,-len(series):]=series
+        return matrix, lengths
+
+    @staticmethod
+    def _getTrendPct(matrix:np.ndarray, lengths:np.ndarray, months:np.ndarray) -> np.ndarray:
+        """
+        Percent change of each row between the last month and months before, NaN when not available.
+        """
+        rows=np.arange(len(matrix))
+        hasPrevious=lengths>months
+        previous=matrix[rows,np.maximum(matrix.shape[1]-1-months,0)]
+        last=matrix[:,-1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(hasPrevious & (previous!=0),(last-previous)/previous*100,np.nan)
+
+    def _getTrends(self, pct:np.ndarray) -> np.ndarray:
+        # index into TRENDS, the thresholds are checked in the same order
+        t=self.thresholds
+        return np.select([np.isnan(pct), pct>=t["strongUp"], pct>=t["up"], pct<=t["strongDown"], pct<=t["down"]],
+                         [5, 0, 1, 2, 3], default=4)
+
+    def _rate(self, cryptos:list[Crypto]) -> list[str]:
+        allCloses=[c.monthKlines["closes"] for c in cryptos]
+        allVolumes=[c.monthKlines["volumes"] for c in cryptos]
+        closes, closeLengths=KlineRatingEngine._toMatrix(allCloses)
+        volumes, volumeLengths=KlineRatingEngine._toMatrix(allVolumes)
+
+        # per horizon: months per asset, limited by its closes, and the trends of price and volume
+        allHorizons:list[tuple[list, list, list, list, list]]=[]
+        levels=np.array([level for arrows, level in KlineRatingEngine.TRENDS])
+        keep=np.full(len(cryptos),KlineRatingEngine.KEEP)
+        for horizon in self.horizons:
+            months=np.minimum(horizon,closeLengths-1)
+            pricePct=KlineRatingEngine._getTrendPct(closes,closeLengths,months)
+            volumePct=KlineRatingEngine._getTrendPct(volumes,volumeLengths,months)
+            priceTrends=self._getTrends(pricePct)
+            volumeTrends=self._getTrends(volumePct)
+            allHorizons.append((months.tolist(),pricePct.tolist(),volumePct.tolist(),priceTrends.tolist(),volumeTrends.tolist()))
+
+            # KEEP only when all trends keep, DROP when one drops
+            keep=np.maximum(keep,np.maximum(levels[priceTrends],levels[volumeTrends]))
+
+        def formatPart(trend:int, pct:float, series:list[float], months:int, formatValue, symbol:str) -> str:
+            # NaN when not available
+            if pct!=pct:
+                return "n/a"
+            arrows, level=KlineRatingEngine.TRENDS[trend]
+            return f"{KlineRatingEngine.COLORS[level]}{arrows} {pct:+.1f}% ({formatValue(series[-1-months])} -> {formatValue(series[-1])} {symbol}){Colors.CRESET}"
+
+        # formatted from lists, numpy scalars are slow to format
+        ratings:list[str]=[]
+        for row, (crypto, level) in enumerate(zip(cryptos,keep.tolist())):
+            symbol=crypto.monthKlines["symbol"]
+            parts=[f"{KlineRatingEngine.COLORS[level]}{KlineRatingEngine.FLAGS[level]}{Colors.CRESET}"]
+            for months, pricePct, volumePct, priceTrends, volumeTrends in allHorizons:
+                m=months[row]
+                parts.append(f"Price {m}M: {formatPart(priceTrends[row],pricePct[row],allCloses[row],m,str,symbol)}")
+                parts.append(f"Vol {m}M: {formatPart(volumeTrends[row],volumePct[row],allVolumes[row],m,KlineRatingEngine.formatNumberWithSuffix,symbol)}")
+            ratings.append(" | ".join(parts))
+        return ratings
+
+    def rateAll(self, cryptos:list[Crypto]) -> dict[str, str]:
+        """
+        Sets and returns the rating of all cryptos by name, only cryptos with changed klines are rated.
+        """
+        allRated:dict[str, str]={}
+        toRate:list[Crypto]=[]
+        allKeys:list[tuple[str, str]]=[]
+        for crypto in cryptos:
+            klines=crypto.monthKlines
+            if len(klines["closes"])<=1 or len(klines["volumes"])<=1:
+                allRated[crypto.name]=KlineRatingEngine.NOT_ENOUGH_DATA
+                continue
+            key=KlineRatingEngine._getKey(crypto)
+            digest=KlineRatingEngine._getDigest(crypto)
+            cached=self.allRatings.get(key)
+            if cached is None or cached[0]!=digest:
+                toRate.append(crypto)
+                allKeys.append((key,digest))
+            else:
+                allRated[crypto.name]=cached[1]
+
+        if len(toRate)>0:
+            # replaces the rating of older klines
+            for crypto, (key, digest), rating in zip(toRate,allKeys,self._rate(toRate)):
+                self.allRatings[key]=[digest, rating]
+                allRated[crypto.name]=rating
+            self.changed=True
+
+        for crypto in cryptos:
+            crypto.rating=allRated[crypto.name]
+        return allRated
+
+    def getFilename(self) -> str:
+        return Files.getRatingsFilenameWithPath(self.account)
+
+    def exists(self) -> bool:
+        return Files.ratingsExists(self.account)
+
+    def _getSettings(self) -> dict:
+        return {"horizons": list(self.horizons), "thresholds": dict(sorted(self.thresholds.items()))}
+
+    def load(self):
+        if not self.exists():
+            return
+        with open(self.getFilename(), "r", encoding="utf8") as infile:
+            jsonContent=json.load(infile)
+            infile.close()
+
+        # ratings of other horizons or thresholds are rated again
+        if jsonContent.get("settings")==self._getSettings():
+            self.allRatings=jsonContent.get("ratings",{})
+        logging.debug(f"Loaded ratings of {len(self.allRatings)} assets")
+
+    def save(self):
+        if not self.changed:
+            return
+        jsonContent={
+            "version": 1,
+            "settings": self._getSettings(),
+            "ratings": self.allRatings
+        }
+        with open(self.getFilename(), "w", encoding="utf8") as outfile:
+            json.dump(jsonContent, outfile, separators=(",", ":"))
+            outfile.close()
+        self.changed=False
+
+    def __init__(self, horizons:list[int]|None=None, thresholds:dict[str, float]|None=None, account:str=""):
+        # months to compare the last month with
+        self.horizons:tuple[int, ...]=tuple(horizons or [6])
+
+        # percent changes of a strong or normal up and down trend
+        self.thresholds:dict[str, float]={"strongUp": 20, "up": 5, "down": -5, "strongDown": -20}
+        self.thresholds.update(thresholds or {})
+
+        # one file per account, like the klines of the account
+        self.account:str=account
+
+        # per asset and symbol, e.g. "ETH/USDC": [digest of the klines, rating]
+        self.allRatings:dict[str, list[str]]={}
+        self.changed:bool=False
+
+        self.load()
@@ -0,0 +1,113 @@
+# class to keep monthly klines on disk and fetch only new candles
+# License: MIT
+# Author: mhl5k
+
+import json
+import logging
+import threading
+import time
+
+from mhl5k.files import Files
+
+
+class KlineStore:
+
+    INTERVAL: str = "1M"
+
+    # nr. of candles returned for the rating
+    LIMIT: int = 14
+
+    # nr. of candles kept per symbol
+    MAX_CANDLES: int = 60
+
+    # stored candle: [openTime, close, volume, closeTime, fetchTime], times in ms
+    OPEN_TIME=0
+    CLOSE=1
+    VOLUME=2
+    CLOSE_TIME=3
+    FETCH_TIME=4
+
+    @staticmethod
+    def isFinal(candle:list) -> bool:
+        # only a candle fetched after its close time has its final close and volume,
+        # candles stored without fetch time are fetched again
+        return len(candle)>KlineStore.FETCH_TIME and candle[KlineStore.FETCH_TIME]>candle[KlineStore.CLOSE_TIME]
+
+    def update(self, spotClient, symbol:str) -> list[list]:
+        """
+        Fetches all candles from the first candle of the symbol which was still open
+        when it was stored, including the still open current candle, and returns the
+        latest LIMIT candles.
+        Raises ClientError when the symbol does not exist.
+
+        :param spotClient: client to fetch the klines with
+        :param symbol: trading pair, e.g. ETHUSDC
+        :return: list of candles [openTime, close, volume, closeTime, fetchTime], oldest first
+        """
+        now=time.time()*1000
+        with self.lock:
+            candles=list(self.allCandles.get(symbol,[]))
+
+        # keep final candles up to the first one which was still open when it was stored, final candles never change
+        closed:list[list]=[]
+        for c in candles:
+            if not KlineStore.isFinal(c):
+                break
+            closed.append(c)
+        if len(candles)==0:
+            klines=spotClient.klines(symbol=symbol, interval=KlineStore.INTERVAL, limit=KlineStore.LIMIT)
+        elif len(closed)<len(candles):
+            # refetch the candles stored while open, e.g. a month gathered in its middle
+            klines=spotClient.klines(symbol=symbol, interval=KlineStore.INTERVAL, startTime=candles[len(closed)][KlineStore.OPEN_TIME], limit=KlineStore.MAX_CANDLES)
+        else:
+            klines=spotClient.klines(symbol=symbol, interval=KlineStore.INTERVAL, startTime=closed[-1][KlineStore.CLOSE_TIME]+1, limit=KlineStore.MAX_CANDLES)
+        logging.debug(f"Fetched {len(klines)} new candles for {symbol}, {len(closed)} final candles stored")
+
+        # open time at index 0, close at index 4, volume at index 5, close time at index 6
+        fetched=[[int(k[0]), float(k[4]), float(k[5]), int(k[6]), int(now)] for k in klines]
+        if len(fetched)>0:
+            closed=[c for c in closed if c[KlineStore.OPEN_TIME]<fetched[0][KlineStore.OPEN_TIME]]
+        candles=(closed+fetched)[-KlineStore.MAX_CANDLES:]
+
+        with self.lock:
+            self.allCandles[symbol]=candles
+            self.changed=True
+
+        return candles[-KlineStore.LIMIT:]
+
+    def load(self):
+        if not Files.klineStoreExists(self.account):
+            return
+        with open(Files.getKlineStoreFilenameWithPath(self.account), "r", encoding="utf8") as infile:
+            jsonContent=json.load(infile)
+            infile.close()
+
+        self.allCandles=jsonContent.get("candles",{})
+        logging.debug(f"Loaded klines of {len(self.allCandles)} symbols")
+
+    def save(self):
+        with self.lock:
+            if not self.changed:
+                return
+            jsonContent={
+                "version": 2,
+                "interval": KlineStore.INTERVAL,
+                "candles": self.allCandles
+            }
+            self.changed=False
+
+        with open(Files.getKlineStoreFilenameWithPath(self.account), "w", encoding="utf8") as outfile:
+            json.dump(jsonContent, outfile)
+            outfile.close()
+
+    def __init__(self, account:str=""):
+        # one file per account, accounts are gathered in parallel processes
+        self.account:str=account
+
+        # candles per symbol, oldest first
+        self.allCandles:dict[str, list[list]]={}
+
+        self.lock=threading.Lock()
+        self.changed:bool=False
+
+        self.load()
@@ -5,7 +5,7 @@ import os
 import sys
 from pathlib import Path
 
-__version__ = "0.12"
+__version__ = "0.16"
 
 
 class Files:
@@ -13,12 +13,55 @@ class Files:
     def getScriptPath() -> str:
         return os.path.dirname(os.path.realpath(sys.argv[0]))
 
+    def getAccountFilename(filename:str, account:str="") -> str:
+        # e.g. database-main.json, without account the filename stays as it is
+        if account=="":
+            return filename
+        base, dot, extension = filename.rpartition(".")
+        return f"{base}-{account}{dot}{extension}"
+
     def getSettingsFilenameWithPath() -> str:
         filename = "settings.json"
         return Files.getScriptPath()+"/"+filename
 
-    def getDatabaseFilenameWithPath() -> str:
-        filename = "database.json"
+    def getDatabaseFilenameWithPath(account:str="") -> str:
+        filename = Files.getAccountFilename("database.json",account)
+        return Files.getScriptPath()+"/"+filename
+
+    def getDatabaseLogFilenameWithPath(account:str="") -> str:
+        filename = Files.getAccountFilename("database.jsonl",account)
+        return Files.getScriptPath()+"/"+filename
+
+    def getDatabaseSqliteFilenameWithPath(account:str="") -> str:
+        filename = Files.getAccountFilename("database.sqlite",account)
+        return Files.getScriptPath()+"/"+filename
+
+    def getDatabaseBinaryFilenameWithPath(account:str="") -> str:
+        filename = Files.getAccountFilename("database.bin",account)
+        return Files.getScriptPath()+"/"+filename
+
+    def getCacheFilenameWithPath(account:str="") -> str:
+        filename = Files.getAccountFilename("cache.json",account)
+        return Files.getScriptPath()+"/"+filename
+
+    def getKlineStoreFilenameWithPath(account:str="") -> str:
+        filename = Files.getAccountFilename("klines.json",account)
+        return Files.getScriptPath()+"/"+filename
+
+    def getRatingsFilenameWithPath(account:str="") -> str:
+        filename = Files.getAccountFilename("ratings.json",account)
+        return Files.getScriptPath()+"/"+filename
+
+    def getLedgerFilenameWithPath(account:str="") -> str:
+        filename = Files.getAccountFilename("ledger.json",account)
+        return Files.getScriptPath()+"/"+filename
+
+    def getPriceHistoryFilenameWithPath(account:str="") -> str:
+        filename = Files.getAccountFilename("prices.json",account)
+        return Files.getScriptPath()+"/"+filename
+
+    def getProfileFilenameWithPath() -> str:
+        filename = "profile.jsonl"
         return Files.getScriptPath()+"/"+filename
 
     def getLoggingFilenameWithPath(extension:str="") -> str:
@@ -28,14 +71,42 @@ class Files:
     def settingsExists() -> bool:
         return Path(Files.getSettingsFilenameWithPath()).is_file()
 
-    def databaseExists() -> bool:
-        return Path(Files.getDatabaseFilenameWithPath()).is_file()
+    def databaseExists(account:str="") -> bool:
+        return Path(Files.getDatabaseFilenameWithPath(account)).is_file()
+
+    def databaseLogExists(account:str="") -> bool:
+        return Path(Files.getDatabaseLogFilenameWithPath(account)).is_file()
+
+    def databaseSqliteExists(account:str="") -> bool:
+        return Path(Files.getDatabaseSqliteFilenameWithPath(account)).is_file()
+
+    def databaseBinaryExists(account:str="") -> bool:
+        return Path(Files.getDatabaseBinaryFilenameWithPath(account)).is_file()
+
+    def cacheExists(account:str="") -> bool:
+        return Path(Files.getCacheFilenameWithPath(account)).is_file()
+
+    def klineStoreExists(account:str="") -> bool:
+        return Path(Files.getKlineStoreFilenameWithPath(account)).is_file()
+
+    def ratingsExists(account:str="") -> bool:
+        return Path(Files.getRatingsFilenameWithPath(account)).is_file()
+
+    def ledgerExists(account:str="") -> bool:
+        return Path(Files.getLedgerFilenameWithPath(account)).is_file()
+
+    def priceHistoryExists(account:str="") -> bool:
+        return Path(Files.getPriceHistoryFilenameWithPath(account)).is_file()
 
 # Test function for module  
 def _test():
     # tests
     filepath=Files.getScriptPath()
     assert filepath != ""
+    assert Files.getAccountFilename("database.json","main") == "database-main.json"
+    assert Files.getAccountFilename("database.json") == "database.json"
+    assert Files.getPriceHistoryFilenameWithPath("main").endswith("/prices-main.json")
+    assert Files.getRatingsFilenameWithPath("main").endswith("/ratings-main.json")
     
     # end
     print(__file__+" "+__version__+": All module tests did run fine.")
@@ -15,7 +15,8 @@ class Settings:
     defaults = {
         "version": "1",
         "apiKey": "insert-your-api-key",
-        "apiSecret": "insert-your-secret-key"
+        "apiSecret": "insert-your-secret-key",
+        "gatherWorkers": 4
     }
 
     def initializeNewSettingsJSONFile(self):
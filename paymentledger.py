@@ -0,0 +1,295 @@
+# class to keep all deposits and withdrawals of an account in a local ledger
+# License: MIT
+# Author: mhl5k
+
+from bisect import bisect_right
+from datetime import datetime, timezone
+from itertools import accumulate
+import json
+import logging
+import time
+
+from mhl5k.files import Files
+from gatherengine import GatherEngine
+
+
+class PaymentLedger:
+    """
+    Deposits and withdrawals of all sources in ledger.json. Each source is synced
+    from its cursor (end of the last synced range) up to now, and back to the first
+    day of the backfill when it has been extended. The API answers at most WINDOW_DAYS
+    per request, so a range is split into windows which are requested concurrently.
+    The payments of a set are the sums between the set before and the set, read from
+    an index of sorted times and running sums per kind and asset.
+    """
+
+    DEPOSIT: str = "deposit"
+    WITHDRAW: str = "withdraw"
+
+    # source name: kind of its payments
+    SOURCES: dict[str, str] = {
+        "deposits": DEPOSIT,
+        "fiatBuys": DEPOSIT,
+        "withdraws": WITHDRAW,
+    }
+
+    # max. time range of one history request
+    WINDOW_DAYS: int = 90
+
+    # the last day is synced again, e.g. deposits which show up after their insert time
+    OVERLAP_DAYS: int = 1
+
+    # max. rows of one page
+    PAGE_SIZE: int = 1000
+    FIAT_PAGE_SIZE: int = 500
+
+    # withdrawals which did not leave the account: cancelled, rejected, failure
+    FAILED_WITHDRAW_STATUS: list[int] = [1, 3, 5]
+
+    DAY_MS: int = 24*3600*1000
+
+    # Fetching, one window of one source
+    # ----------------------------------
+
+    def _fetchDeposits(self, client, startTime:int, endTime:int) -> dict:
+        payments:dict={}
+        offset=0
+        while True:
+            rows=client.deposit_history(startTime=startTime, endTime=endTime, offset=offset, limit=PaymentLedger.PAGE_SIZE)
+            for row in rows:
+                key="%s" % (row.get("id",f"{row.get('txId')}-{row['coin']}-{row['insertTime']}"))
+                payments[key]=[int(row["insertTime"])/1000, row["coin"], float(row["amount"])]
+            if len(rows)<PaymentLedger.PAGE_SIZE:
+                return payments
+            offset+=len(rows)
+
+    def _fetchWithdraws(self, client, startTime:int, endTime:int) -> dict:
+        payments:dict={}
+        offset=0
+        while True:
+            rows=client.withdraw_history(startTime=startTime, endTime=endTime, offset=offset, limit=PaymentLedger.PAGE_SIZE)
+            for row in rows:
+                if int(row.get("status",6)) in PaymentLedger.FAILED_WITHDRAW_STATUS:
+                    continue
+                # applyTime is UTC, e.g. "2025-03-01 12:00:00"
+                applyTime=datetime.strptime(row["applyTime"],"%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc).timestamp()
+                # the fee leaves the account as well
+                payments["%s" % (row["id"])]=[applyTime, row["coin"], float(row["amount"])+float(row.get("transactionFee",0.0))]
+            if len(rows)<PaymentLedger.PAGE_SIZE:
+                return payments
+            offset+=len(rows)
+
+    def _fetchFiatBuys(self, client, startTime:int, endTime:int) -> dict:
+        DEPOSIT_BUY=0
+        payments:dict={}
+        page=1
+        while True:
+            history=client.fiat_payment_history(transactionType=DEPOSIT_BUY, beginTime=startTime, endTime=endTime, page=page, rows=PaymentLedger.FIAT_PAGE_SIZE)
+            rows=history.get("data",[])
+            for row in rows:
+                key="%s" % (row.get("orderNo",f"{row['cryptoCurrency']}-{row['updateTime']}"))
+                payments[key]=[int(row["updateTime"])/1000, row["cryptoCurrency"], float(row["obtainAmount"])]
+            if len(rows)<PaymentLedger.FIAT_PAGE_SIZE:
+                return payments
+            page+=1
+
+    # Syncing
+    # -------
+
+    def _getWindows(self, startTime:int, endTime:int) -> list[tuple[int, int]]:
+        windowMs=PaymentLedger.WINDOW_DAYS*PaymentLedger.DAY_MS
+        return [(start, min(start+windowMs-1,endTime)) for start in range(startTime,endTime,windowMs)]
+
+    def addSyncTasks(self, engine:GatherEngine, client):
+        """
+        Adds one task per missing window and source, the results are merged by applySyncResults.
+        """
+        allFetch={"deposits": self._fetchDeposits, "fiatBuys": self._fetchFiatBuys, "withdraws": self._fetchWithdraws}
+        now=int(time.time()*1000)
+        firstDay=now-self.backfillDays*PaymentLedger.DAY_MS
+
+        self.syncRanges={}
+        for name in PaymentLedger.SOURCES:
+            source=self.allSources.get(name)
+            if source is None:
+                ranges=[(firstDay, now)]
+            else:
+                # the backfill may have been extended since the last sync
+                ranges=[(max(source["cursor"]-PaymentLedger.OVERLAP_DAYS*PaymentLedger.DAY_MS,source["start"]), now)]
+                if firstDay<source["start"]:
+                    ranges.insert(0,(firstDay, source["start"]))
+            self.syncRanges[name]=(min(firstDay,source["start"]) if source is not None else firstDay, now)
+
+            for rangeStart, rangeEnd in ranges:
+                for windowStart, windowEnd in self._getWindows(rangeStart,rangeEnd):
+                    engine.addTask(f"ledger.{name}.{windowStart}", allFetch[name], client, windowStart, windowEnd)
+
+    def applySyncResults(self, results:dict):
+        for name, (start, cursor) in self.syncRanges.items():
+            source=self.allSources.setdefault(name,{"start": start, "cursor": cursor, "payments": {}})
+            for key, result in results.items():
+                if key.startswith(f"ledger.{name}."):
+                    # payments are keyed by id, so overlapping windows replace them
+                    source["payments"].update(result)
+            source["start"]=start
+            source["cursor"]=cursor
+        self.syncRanges={}
+        self.changed=True
+        self._buildIndex()
+
+    # Queries
+    # -------
+
+    def _buildIndex(self):
+        # sorted times and running sums per kind and asset, a leading 0 for bisect
+        allPayments:dict[str, dict[str, list]]={PaymentLedger.DEPOSIT: {}, PaymentLedger.WITHDRAW: {}}
+        for name, source in self.allSources.items():
+            kind=PaymentLedger.SOURCES[name]
+            for paymentTime, asset, amount in source["payments"].values():
+                allPayments[kind].setdefault(asset,[]).append((paymentTime, amount))
+
+        self.allIndexes={}
+        for kind, assets in allPayments.items():
+            self.allIndexes[kind]={}
+            for asset, payments in assets.items():
+                payments.sort()
+                self.allIndexes[kind][asset]=([t for t, a in payments], [0.0]+list(accumulate(a for t, a in payments)))
+
+    def covers(self, startTimestamp:float, endTimestamp:float) -> bool:
+        # whether all sources are synced for the whole range
+        if len(self.allSources)<len(PaymentLedger.SOURCES):
+            return False
+        return all(s["start"]/1000<=startTimestamp and endTimestamp<=s["cursor"]/1000 for s in self.allSources.values())
+
+    def getAmounts(self, kind:str, startTimestamp:float, endTimestamp:float) -> dict[str, float]:
+        """
+        Returns the sum of the payments of kind after startTimestamp up to endTimestamp per asset.
+        """
+        amounts:dict[str, float]={}
+        for asset, (times, sums) in self.allIndexes.get(kind,{}).items():
+            amount=sums[bisect_right(times,endTimestamp)]-sums[bisect_right(times,startTimestamp)]
+            if amount!=0.0:
+                amounts[asset]=amount
+        return amounts
+
+    # File
+    # ----
+
+    def load(self):
+        if not Files.ledgerExists(self.account):
+            return
+        with open(Files.getLedgerFilenameWithPath(self.account), "r", encoding="utf8") as infile:
+            jsonContent=json.load(infile)
+            infile.close()
+
+        self.allSources=jsonContent.get("sources",{})
+        self._buildIndex()
+        logging.debug(f"Loaded ledger with {sum(len(s['payments']) for s in self.allSources.values())} payments")
+
+    def save(self):
+        if not self.changed:
+            return
+        jsonContent={
+            "version": 1,
+            "sources": self.allSources
+        }
+        with open(Files.getLedgerFilenameWithPath(self.account), "w", encoding="utf8") as outfile:
+            json.dump(jsonContent, outfile)
+            outfile.close()
+        self.changed=False
+
+    def __init__(self, account:str="", backfillDays:int=365):
+        self.account:str=account
+
+        # days before now the ledger starts with
+        self.backfillDays:int=backfillDays
+
+        # per source: start and cursor in ms, payments by id as [timestamp, asset, amount]
+        self.allSources:dict[str, dict]={}
+
+        # per kind and asset: (sorted times, running sums)
+        self.allIndexes:dict[str, dict[str, tuple[list[float], list[float]]]]={}
+
+        # (start, cursor) of the sources while syncing
+        self.syncRanges:dict[str, tuple[int, int]]={}
+        self.changed:bool=False
+
+        self.load()
+
+
+# Test function for module
+def _test():
+    DAY=PaymentLedger.DAY_MS
+
+    # windows of WINDOW_DAYS without gaps, the last one ends at the end of the range
+    windows=PaymentLedger(account="_test")._getWindows(0,200*DAY)
+    assert windows==[(0, 90*DAY-1), (90*DAY, 180*DAY-1), (180*DAY, 200*DAY)]
+    assert PaymentLedger(account="_test")._getWindows(5*DAY,5*DAY)==[]
+
+    class Client:
+        # payments 10, 20 and 30 days ago, each history answers only the payments of the requested window
+        def __init__(self, now:int):
+            self.allDeposits=[{"id": 1, "coin": "ETH", "amount": "1.0", "insertTime": now-30*DAY},
+                              {"id": 2, "coin": "ETH", "amount": "2.0", "insertTime": now-20*DAY}]
+            self.allWithdraws=[{"id": 3, "coin": "ETH", "amount": "0.5", "transactionFee": "0.1", "status": 6, "applyTime": now-20*DAY},
+                               {"id": 4, "coin": "ETH", "amount": "9.0", "status": 1, "applyTime": now-10*DAY}]
+            self.allFiatBuys=[{"orderNo": "o1", "cryptoCurrency": "BTC", "obtainAmount": "0.25", "updateTime": now-10*DAY}]
+            self.allRequests:list[tuple[str, int, int]]=[]
+
+        def deposit_history(self, startTime:int, endTime:int, offset:int, limit:int) -> list:
+            self.allRequests.append(("deposits", startTime, endTime))
+            return [row for row in self.allDeposits if startTime<=row["insertTime"]<=endTime]
+
+        def withdraw_history(self, startTime:int, endTime:int, offset:int, limit:int) -> list:
+            self.allRequests.append(("withdraws", startTime, endTime))
+            toText=lambda ms: datetime.fromtimestamp(ms/1000,timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+            return [{**row, "applyTime": toText(row["applyTime"])} for row in self.allWithdraws if startTime<=row["applyTime"]<=endTime]
+
+        def fiat_payment_history(self, transactionType:int, beginTime:int, endTime:int, page:int, rows:int) -> dict:
+            self.allRequests.append(("fiatBuys", beginTime, endTime))
+            return {"data": [row for row in self.allFiatBuys if beginTime<=row["updateTime"]<=endTime]}
+
+    # whole seconds, the withdrawals are answered with their time as text
+    now=int(time.time())*1000
+    client=Client(now)
+    ledger=PaymentLedger(account="_test", backfillDays=100)
+    engine=GatherEngine(sequential=True)
+    ledger.addSyncTasks(engine,client)
+    ledger.applySyncResults(engine.run())
+    assert len(client.allRequests)==2*len(PaymentLedger.SOURCES)
+
+    # the payment at the time of the set belongs to it, the one at the time of the set before does not
+    setBefore=(now-30*DAY)/1000
+    setTime=(now-20*DAY)/1000
+    assert ledger.getAmounts(PaymentLedger.DEPOSIT,setBefore,setTime)=={"ETH": 2.0}
+    assert ledger.getAmounts(PaymentLedger.DEPOSIT,setBefore-1,setTime-1)=={"ETH": 1.0}
+    # fees leave the account as well, failed withdrawals do not
+    assert ledger.getAmounts(PaymentLedger.WITHDRAW,setBefore,now/1000)=={"ETH": 0.6}
+    assert ledger.getAmounts(PaymentLedger.DEPOSIT,setTime,now/1000)=={"BTC": 0.25}
+
+    # synced from the first day of the backfill up to now
+    firstDay=ledger.allSources["deposits"]["start"]/1000
+    assert abs(firstDay-(now-100*DAY)/1000)<60
+    assert ledger.covers(firstDay,now/1000)
+    assert not ledger.covers(firstDay-1,now/1000)
+    del ledger.allSources["fiatBuys"]
+    assert not ledger.covers(firstDay,now/1000)
+
+    # an extended backfill only fetches the days before the start, and again the days since the cursor
+    start=now-100*DAY
+    cursor=now-5*DAY
+    ledger.allSources={name: {"start": start, "cursor": cursor, "payments": {}} for name in PaymentLedger.SOURCES}
+    ledger.backfillDays=250
+    ledger.addSyncTasks(engine,client)
+    ranges=[task.args[1:] for task in engine.allTasks.values() if task.name.startswith("ledger.deposits.")]
+    assert len(ranges)==3
+    assert ranges[0][0]==ledger.syncRanges["deposits"][0] and abs(ranges[0][0]-(now-250*DAY))<60*1000
+    assert ranges[1]==(ranges[0][0]+90*DAY, start)
+    assert ranges[2][0]==cursor-PaymentLedger.OVERLAP_DAYS*DAY and ranges[2][1]>=now
+
+    # end
+    print(__file__+": All module tests did run fine.")
+
+# when file ist started directly
+if __name__ == '__main__':
+    _test()
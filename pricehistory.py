@@ -0,0 +1,154 @@
+# class to keep the daily prices of trading pairs on disk for the re-valuation of old sets
+# License: MIT
+# Author: mhl5k
+
+import json
+import logging
+
+from binance.error import ClientError
+import numpy as np
+
+from mhl5k.files import Files
+from gatherengine import GatherEngine
+
+
+class PriceHistory:
+    """
+    Daily closes per trading pair in prices.json, fetched in bulk from the daily klines.
+    Each pair keeps the synced range, only the days before its start and after its
+    cursor are fetched. The price of a pair at a time is the close of the daily candle
+    of that time, looked up for many times at once.
+    """
+
+    INTERVAL: str = "1d"
+    DAY_MS: int = 24*3600*1000
+
+    # max. candles of one klines request
+    LIMIT: int = 1000
+
+    # stored candle: [openTime, close], time in ms
+    OPEN_TIME=0
+    CLOSE=1
+
+    # error code of a symbol which does not exist
+    INVALID_SYMBOL: int = -1121
+
+    # Fetching
+    # --------
+
+    def _fetchCandles(self, client, symbol:str, startTime:int, endTime:int) -> list[list]:
+        try:
+            klines=client.klines(symbol=symbol, interval=PriceHistory.INTERVAL, startTime=startTime, endTime=endTime, limit=PriceHistory.LIMIT)
+        except ClientError as E:
+            # other errors, e.g. a rate limit still hit after all retries, must not mark the range as synced
+            if E.error_code!=PriceHistory.INVALID_SYMBOL:
+                raise E
+            # e.g. a pair which has not been traded at that time
+            logging.debug(f"ClientError: {E}")
+            return []
+        # open time at index 0, close at index 4
+        return [[int(k[0]), float(k[4])] for k in klines]
+
+    def addFetchTasks(self, engine:GatherEngine, client, symbols:list[str], startTime:int, endTime:int):
+        """
+        Adds one task per missing window of LIMIT days and pair, the results are merged by applyFetchResults.
+        """
+        windowMs=PriceHistory.LIMIT*PriceHistory.DAY_MS
+        self.fetchRanges={}
+        for symbol in symbols:
+            pair=self.allPairs.get(symbol)
+            if pair is None:
+                ranges=[(startTime, endTime)]
+                self.fetchRanges[symbol]=(startTime, endTime)
+            else:
+                ranges=[(startTime, pair["start"])] if startTime<pair["start"] else []
+                # the candle at the cursor may have been open when it was fetched
+                if endTime>pair["cursor"]:
+                    ranges.append((pair["cursor"]-PriceHistory.DAY_MS, endTime))
+                if len(ranges)==0:
+                    continue
+                self.fetchRanges[symbol]=(min(startTime,pair["start"]), max(endTime,pair["cursor"]))
+
+            for rangeStart, rangeEnd in ranges:
+                for windowStart in range(rangeStart,rangeEnd,windowMs):
+                    engine.addTask(f"prices.{symbol}.{windowStart}", self._fetchCandles, client, symbol, windowStart, min(windowStart+windowMs-1,rangeEnd))
+
+    def applyFetchResults(self, results:dict):
+        for symbol, (start, cursor) in self.fetchRanges.items():
+            pair=self.allPairs.setdefault(symbol,{"start": start, "cursor": cursor, "candles": []})
+            # candles are keyed by open time, overlapping windows replace them
+            candles={candle[PriceHistory.OPEN_TIME]: candle for candle in pair["candles"]}
+            for key, result in results.items():
+                if key.startswith(f"prices.{symbol}."):
+                    candles.update({candle[PriceHistory.OPEN_TIME]: candle for candle in result})
+            pair["candles"]=[candles[openTime] for openTime in sorted(candles)]
+            pair["start"]=start
+            pair["cursor"]=cursor
+            self.allArrays.pop(symbol,None)
+        if len(self.fetchRanges)>0:
+            self.changed=True
+        self.fetchRanges={}
+
+    # Queries
+    # -------
+
+    def getPrices(self, symbol:str, timestamps:np.ndarray) -> np.ndarray:
+        """
+        Returns the close of the daily candle of each timestamp, NaN where the pair has no candle.
+        """
+        if symbol not in self.allArrays:
+            candles=np.array(self.allPairs.get(symbol,{}).get("candles",[]),dtype=np.float64).reshape(-1,2)
+            self.allArrays[symbol]=(candles[:,PriceHistory.OPEN_TIME],candles[:,PriceHistory.CLOSE])
+        openTimes, closes=self.allArrays[symbol]
+
+        times=np.asarray(timestamps,dtype=np.float64)*1000
+        if len(openTimes)==0:
+            return np.full(len(times),np.nan)
+        positions=np.searchsorted(openTimes,times,side="right")-1
+        found=positions>=0
+        positions=np.maximum(positions,0)
+        # no candle of that day, e.g. before the pair was listed
+        found&=times<openTimes[positions]+PriceHistory.DAY_MS
+        return np.where(found,closes[positions],np.nan)
+
+    # File
+    # ----
+
+    def load(self):
+        if not Files.priceHistoryExists(self.account):
+            return
+        with open(Files.getPriceHistoryFilenameWithPath(self.account), "r", encoding="utf8") as infile:
+            jsonContent=json.load(infile)
+            infile.close()
+
+        self.allPairs=jsonContent.get("pairs",{})
+        logging.debug(f"Loaded daily prices of {len(self.allPairs)} pairs")
+
+    def save(self):
+        if not self.changed:
+            return
+        jsonContent={
+            "version": 1,
+            "interval": PriceHistory.INTERVAL,
+            "pairs": self.allPairs
+        }
+        with open(Files.getPriceHistoryFilenameWithPath(self.account), "w", encoding="utf8") as outfile:
+            json.dump(jsonContent, outfile, separators=(",", ":"))
+            outfile.close()
+        self.changed=False
+
+    def __init__(self, account:str=""):
+        # one file per account, accounts are gathered in parallel processes
+        self.account:str=account
+
+        # per pair: start and cursor in ms, candles [openTime, close] sorted by open time
+        self.allPairs:dict[str, dict]={}
+
+        # per pair: open times and closes for the lookups, built when needed
+        self.allArrays:dict[str, tuple[np.ndarray, np.ndarray]]={}
+
+        # (start, cursor) of the pairs while fetching
+        self.fetchRanges:dict[str, tuple[int, int]]={}
+        self.changed:bool=False
+
+        self.load()
@@ -0,0 +1,104 @@
+# class to measure phases and API calls of a run
+# License: MIT
+# Author: mhl5k
+
+from contextlib import contextmanager
+from datetime import datetime
+import json
+import logging
+import math
+import threading
+import time
+
+
+class Profiler:
+
+    # wall time per phase in seconds, phases may be nested
+    allPhases:dict[str, float] = {}
+
+    # latencies in seconds and weight per endpoint
+    allCalls:dict[str, dict] = {}
+
+    lock = threading.Lock()
+
+    @staticmethod
+    def reset():
+        with Profiler.lock:
+            Profiler.allPhases={}
+            Profiler.allCalls={}
+
+    @staticmethod
+    @contextmanager
+    def phase(name:str):
+        startTime=time.perf_counter()
+        try:
+            yield
+        finally:
+            duration=time.perf_counter()-startTime
+            with Profiler.lock:
+                Profiler.allPhases[name]=Profiler.allPhases.get(name,0.0)+duration
+
+    @staticmethod
+    def recordCall(endpoint:str, seconds:float, weight:int):
+        with Profiler.lock:
+            call=Profiler.allCalls.setdefault(endpoint,{"latencies": [], "weight": 0})
+            call["latencies"].append(seconds)
+            call["weight"]+=weight
+
+    @staticmethod
+    def debugJSON(content):
+        # serializing large payloads is expensive, only do it when debug logging is enabled
+        if not logging.getLogger().isEnabledFor(logging.DEBUG):
+            return
+        with Profiler.phase("debug.json"):
+            logging.debug(json.dumps(content, indent=4, sort_keys=False))
+
+    @staticmethod
+    def _percentile(sortedValues:list[float], percent:float) -> float:
+        # nearest rank
+        if len(sortedValues)==0:
+            return 0.0
+        rank=max(1,math.ceil(percent/100*len(sortedValues)))
+        return sortedValues[rank-1]
+
+    @staticmethod
+    def getSummary() -> dict:
+        with Profiler.lock:
+            endpoints:dict={}
+            for endpoint, call in Profiler.allCalls.items():
+                latencies=sorted(call["latencies"])
+                endpoints[endpoint]={
+                    "calls": len(latencies),
+                    "weight": call["weight"],
+                    "total": sum(latencies),
+                    "p50": Profiler._percentile(latencies,50),
+                    "p90": Profiler._percentile(latencies,90),
+                    "p99": Profiler._percentile(latencies,99),
+                    "max": latencies[-1] if len(latencies)>0 else 0.0
+                }
+
+            return {
+                "time": str(datetime.now()),
+                "phases": dict(Profiler.allPhases),
+                "endpoints": endpoints
+            }
+
+    @staticmethod
+    def printSummary():
+        summary=Profiler.getSummary()
+
+        print("\n%-38s %9s" % ("Phase","Seconds"))
+        for name, seconds in summary["phases"].items():
+            print("%-38s %9.3f" % (name,seconds))
+
+        if len(summary["endpoints"])>0:
+            print("\n%-38s %5s %6s %8s %8s %8s %8s" % ("Endpoint","Calls","Weight","Total","p50","p90","p99"))
+            for endpoint, e in sorted(summary["endpoints"].items(), key=lambda x: -x[1]["total"]):
+                print("%-38s %5d %6d %8.3f %8.3f %8.3f %8.3f" % (endpoint,e["calls"],e["weight"],e["total"],e["p50"],e["p90"],e["p99"]))
+
+    @staticmethod
+    def appendJSON(filename:str):
+        # one summary per line for trend tracking
+        with open(filename, "a", encoding="utf8") as outfile:
+            outfile.write(json.dumps(Profiler.getSummary())+"\n")
+            outfile.close()
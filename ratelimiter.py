@@ -0,0 +1,190 @@
+# class to keep all SpotClient calls below the binance request weight limits
+# License: MIT
+# Author: mhl5k
+
+import logging
+import threading
+import time
+
+from binance.spot import Spot as SpotClient
+from binance.error import ClientError
+from profiler import Profiler
+
+
+class RateLimitedClient:
+
+    # request weight (IP) of all used endpoints, unknown endpoints count as 1
+    WEIGHTS: dict[str, int] = {
+        "account": 20,
+        "ticker_price": 4,
+        "klines": 2,
+        "exchange_info": 20,
+        "account_snapshot": 2400,
+        "get_simple_earn_flexible_product_list": 150,
+        "get_simple_earn_locked_product_list": 150,
+        "get_flexible_product_position": 150,
+        "get_locked_product_position": 150,
+        "get_list_of_plans": 1,
+        "query_holding_details_of_the_plan": 1,
+        "fiat_payment_history": 1,
+        "deposit_history": 1,
+        "withdraw_history": 1,
+    }
+
+    # /api and /sapi endpoints are counted in different buckets by binance
+    SAPI_ENDPOINTS: set[str] = {
+        "account_snapshot",
+        "get_simple_earn_flexible_product_list",
+        "get_simple_earn_locked_product_list",
+        "get_flexible_product_position",
+        "get_locked_product_position",
+        "get_list_of_plans",
+        "query_holding_details_of_the_plan",
+        "fiat_payment_history",
+        "deposit_history",
+        "withdraw_history",
+    }
+
+    # weight limit per minute and response header with the used weight
+    LIMITS: dict[str, int] = {"api": 6000, "sapi": 12000}
+    HEADERS: dict[str, str] = {"api": "x-mbx-used-weight-1m", "sapi": "x-sapi-used-ip-weight-1m"}
+
+    class Bucket:
+        def __init__(self, limit:int):
+            self.limit:int=limit
+            self.windowStart:float=0.0
+            self.usedWeight:int=0
+            # set after a 429/418 response, no calls until then
+            self.blockedUntil:float=0.0
+
+        def rollWindow(self, now:float):
+            # binance resets the weight at every full minute
+            windowStart=now-now%60
+            if windowStart>self.windowStart:
+                self.windowStart=windowStart
+                self.usedWeight=0
+
+    def _getBucketName(self, endpoint:str) -> str:
+        return "sapi" if endpoint in RateLimitedClient.SAPI_ENDPOINTS else "api"
+
+    def _acquire(self, bucketName:str, weight:int):
+        bucket:RateLimitedClient.Bucket=self.allBuckets[bucketName]
+        budget=int(bucket.limit*self.safetyFactor)
+        with self.condition:
+            while True:
+                now=time.time()
+                bucket.rollWindow(now)
+                if now<bucket.blockedUntil:
+                    waitTime=bucket.blockedUntil-now
+                # a single call heavier than the budget is allowed in an empty window
+                elif bucket.usedWeight+weight<=budget or bucket.usedWeight==0:
+                    bucket.usedWeight+=weight
+                    return
+                else:
+                    waitTime=bucket.windowStart+60-now
+                logging.debug(f"Weight {bucket.usedWeight}+{weight} of {budget} ({bucketName}) reached, waiting {waitTime:.1f}s")
+                self.waitedSeconds+=waitTime
+                self.condition.wait(timeout=waitTime)
+
+    def _updateFromLimitUsage(self, bucketName:str, limitUsage:dict):
+        # server side used weight includes calls of other processes with the same IP
+        header=RateLimitedClient.HEADERS[bucketName]
+        if header not in limitUsage:
+            return
+        bucket:RateLimitedClient.Bucket=self.allBuckets[bucketName]
+        with self.condition:
+            bucket.rollWindow(time.time())
+            bucket.usedWeight=max(bucket.usedWeight,int(limitUsage[header]))
+
+    def _getRetryAfter(self, E:ClientError) -> float:
+        retryAfter=60.0
+        if E.header is not None and "Retry-After" in E.header:
+            retryAfter=float(E.header["Retry-After"])
+        return retryAfter
+
+    def _call(self, endpoint:str, function, *args, **kwargs):
+        bucketName=self._getBucketName(endpoint)
+        weight=RateLimitedClient.WEIGHTS.get(endpoint,1)
+
+        retry=0
+        while True:
+            self._acquire(bucketName,weight)
+            with self.condition:
+                usage=self.allUsage.setdefault(endpoint,{"calls": 0, "weight": 0})
+                usage["calls"]+=1
+                usage["weight"]+=weight
+
+            startTime=time.perf_counter()
+            try:
+                response=function(*args, **kwargs)
+            except ClientError as E:
+                # 429 too many requests, 418 IP banned after ignoring 429
+                if E.status_code not in (429, 418) or retry>=self.maxRetries:
+                    raise E
+                retry+=1
+                retryAfter=self._getRetryAfter(E)
+                if retryAfter>self.maxRetryWait:
+                    raise E
+                logging.warning(f"{endpoint}: HTTP {E.status_code}, retry {retry}/{self.maxRetries} in {retryAfter:.0f}s")
+                with self.condition:
+                    # block all other calls of this bucket until retry time
+                    bucket:RateLimitedClient.Bucket=self.allBuckets[bucketName]
+                    bucket.blockedUntil=max(bucket.blockedUntil,time.time()+retryAfter)
+                continue
+
+            Profiler.recordCall(endpoint,time.perf_counter()-startTime,weight)
+
+            if isinstance(response, dict) and "limit_usage" in response and "data" in response:
+                self._updateFromLimitUsage(bucketName,response["limit_usage"])
+                response=response["data"]
+            return response
+
+    def __getattr__(self, name:str):
+        # only called for attributes not found in the limiter itself
+        if name=="spotClient":
+            raise AttributeError(name)
+        attribute=getattr(self.spotClient, name)
+        if not callable(attribute):
+            return attribute
+
+        def limitedCall(*args, **kwargs):
+            return self._call(name, attribute, *args, **kwargs)
+        return limitedCall
+
+    def resetUsage(self):
+        with self.condition:
+            self.allUsage={}
+            self.waitedSeconds=0.0
+
+    def getUsedWeight(self) -> int:
+        with self.condition:
+            return sum(u["weight"] for u in self.allUsage.values())
+
+    def printUsage(self):
+        with self.condition:
+            calls=sum(u["calls"] for u in self.allUsage.values())
+            weight=sum(u["weight"] for u in self.allUsage.values())
+            print("Used request weight: %d in %d calls, waited %.1fs for limits" % (weight,calls,self.waitedSeconds))
+            for endpoint, usage in sorted(self.allUsage.items(), key=lambda x: -x[1]["weight"]):
+                logging.debug(f"Weight {endpoint}: {usage['weight']} in {usage['calls']} calls")
+
+    def __init__(self, spotClient:SpotClient, safetyFactor:float=0.9, maxRetries:int=3, maxRetryWait:float=300.0):
+        # wrapped binance client, should be created with show_limit_usage=True
+        self.spotClient=spotClient
+
+        # use only this part of the limit, leaves room for other tools on the same IP
+        self.safetyFactor:float=safetyFactor
+
+        # retries on 429/418 and max seconds to wait for a retry
+        self.maxRetries:int=maxRetries
+        self.maxRetryWait:float=maxRetryWait
+
+        # used weight per minute window, shared by all worker threads
+        self.condition=threading.Condition()
+        self.allBuckets:dict[str, RateLimitedClient.Bucket]={
+            name: RateLimitedClient.Bucket(limit) for name, limit in RateLimitedClient.LIMITS.items()
+        }
+
+        # usage report per endpoint since last reset
+        self.allUsage:dict[str, dict]={}
+        self.waitedSeconds:float=0.0
@@ -0,0 +1,145 @@
+# class to cache responses of slow changing binance endpoints on disk
+# License: MIT
+# Author: mhl5k
+
+from collections import OrderedDict
+import json
+import logging
+import threading
+import time
+
+from mhl5k.files import Files
+
+
+class ResponseCache:
+
+    # default time to live in seconds per cached endpoint, other endpoints are never cached
+    TTLS: dict[str, int] = {
+        "get_simple_earn_flexible_product_list": 6*3600,
+        "get_simple_earn_locked_product_list": 6*3600,
+        "get_list_of_plans": 6*3600,
+        "exchange_info": 24*3600,
+    }
+
+    @staticmethod
+    def getKey(endpoint:str, args:tuple, kwargs:dict) -> str:
+        return endpoint+json.dumps([args, kwargs], sort_keys=True)
+
+    def isCached(self, endpoint:str) -> bool:
+        return self.allTTLs.get(endpoint,0)>0
+
+    def get(self, key:str, endpoint:str):
+        """
+        Returns the cached response or None when not cached or expired.
+        """
+        with self.lock:
+            entry=self.allEntries.get(key)
+            if entry is None or time.time()-entry["time"]>self.allTTLs[endpoint]:
+                self.misses+=1
+                return None
+            # mark as recently used
+            self.allEntries.move_to_end(key)
+            self.hits+=1
+            return entry["response"]
+
+    def put(self, key:str, response):
+        with self.lock:
+            self.allEntries[key]={"time": time.time(), "response": response}
+            self.allEntries.move_to_end(key)
+            # remove least recently used entries
+            while len(self.allEntries)>self.maxEntries:
+                self.allEntries.popitem(last=False)
+            self.changed=True
+
+    def clear(self):
+        with self.lock:
+            self.allEntries.clear()
+            self.changed=True
+
+    def load(self):
+        if not Files.cacheExists(self.account):
+            return
+        try:
+            with open(Files.getCacheFilenameWithPath(self.account), "r", encoding="utf8") as infile:
+                jsonContent=json.load(infile)
+                infile.close()
+        except ValueError as E:
+            logging.warning(f"Ignoring broken response cache: {E}")
+            return
+
+        # entries are saved from least to most recently used
+        for entry in jsonContent.get("entries",[]):
+            self.allEntries[entry["key"]]={"time": entry["time"], "response": entry["response"]}
+        logging.debug(f"Loaded {len(self.allEntries)} cached responses")
+
+    def save(self):
+        with self.lock:
+            if not self.changed:
+                return
+            now=time.time()
+            maxTTL=max(self.allTTLs.values(),default=0)
+            jsonContent={
+                "version": 1,
+                "entries": [
+                    {"key": key, "time": entry["time"], "response": entry["response"]}
+                    for key, entry in self.allEntries.items() if now-entry["time"]<=maxTTL
+                ]
+            }
+            self.changed=False
+
+        with open(Files.getCacheFilenameWithPath(self.account), "w", encoding="utf8") as outfile:
+            json.dump(jsonContent, outfile)
+            outfile.close()
+
+    def printUsage(self):
+        print("Response cache: %d hits, %d misses, %d entries" % (self.hits,self.misses,len(self.allEntries)))
+
+    def __init__(self, ttls:dict|None=None, maxEntries:int=2000, account:str=""):
+        # responses are per account, so is the cache file
+        self.account:str=account
+
+        # time to live per endpoint, settings may override single endpoints
+        self.allTTLs:dict[str, int]=dict(ResponseCache.TTLS)
+        if ttls is not None:
+            self.allTTLs.update(ttls)
+
+        # least recently used entry first
+        self.maxEntries:int=maxEntries
+        self.allEntries:OrderedDict[str, dict]=OrderedDict()
+
+        self.lock=threading.Lock()
+        self.changed:bool=False
+        self.hits:int=0
+        self.misses:int=0
+
+        self.load()
+
+
+class CachedClient:
+
+    def __getattr__(self, name:str):
+        # only called for attributes not found in the cached client itself
+        if name in ("spotClient", "cache"):
+            raise AttributeError(name)
+        attribute=getattr(self.spotClient, name)
+        if not callable(attribute) or not self.cache.isCached(name):
+            return attribute
+
+        def cachedCall(*args, **kwargs):
+            key=ResponseCache.getKey(name, args, kwargs)
+            if not self.bypass:
+                response=self.cache.get(key, name)
+                if response is not None:
+                    return response
+            response=attribute(*args, **kwargs)
+            self.cache.put(key, response)
+            return response
+        return cachedCall
+
+    def __init__(self, spotClient, cache:ResponseCache, bypass:bool=False):
+        # wrapped client, usually the RateLimitedClient
+        self.spotClient=spotClient
+        self.cache:ResponseCache=cache
+
+        # do not read from cache, but still refresh it with new responses
+        self.bypass:bool=bypass
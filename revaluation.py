@@ -0,0 +1,115 @@
+# class to re-price stored sets from the daily price history
+# License: MIT
+# Author: mhl5k
+
+import logging
+
+import numpy as np
+
+from crypto import Crypto
+from conversiongraph import ConversionGraph
+from cryptoset import CryptoSet
+from pricehistory import PriceHistory
+from symbolindex import SymbolIndex
+
+
+class RevaluationEngine:
+    """
+    Re-prices the converted totals of stored sets with the daily closes of a PriceHistory.
+    Every asset is converted into each currency over its route of the conversion graph,
+    each step of a route is a trading pair, used as it is or reversed. The prices of all
+    pairs are looked up for all sets of a chunk at once. Assets without a price at the
+    time of a set keep their stored converted total.
+    """
+
+    # sets re-priced at once
+    CHUNK_SIZE: int = 500
+
+    def _getRoute(self, asset:str, currency:str) -> list[tuple[str, bool]] | None:
+        """
+        Returns the pairs of the route from asset to currency as (symbol, reversed), None if not convertible.
+        """
+        assets=self.graph.getRoute(asset,currency)
+        if len(assets)==0:
+            return None
+        route:list[tuple[str, bool]]=[]
+        for fromAsset, toAsset in zip(assets[:-1],assets[1:]):
+            if (fromAsset, toAsset) in self.allSymbols:
+                route.append((self.allSymbols[(fromAsset, toAsset)], False))
+            else:
+                route.append((self.allSymbols[(toAsset, fromAsset)], True))
+        return route
+
+    def getSymbols(self) -> list[str]:
+        # all pairs of all routes, their prices are needed
+        return sorted({symbol for route in self.allRoutes.values() for symbol, isReversed in route})
+
+    def _getRates(self, timestamps:np.ndarray) -> dict[tuple[str, str], np.ndarray]:
+        # rate of every asset and currency at every timestamp, the product of the prices of its route
+        allPrices:dict[str, np.ndarray]={symbol: self.priceHistory.getPrices(symbol,timestamps) for symbol in self.getSymbols()}
+        allRates:dict[tuple[str, str], np.ndarray]={}
+        for key, route in self.allRoutes.items():
+            rates=np.ones(len(timestamps))
+            for symbol, isReversed in route:
+                prices=allPrices[symbol]
+                if isReversed:
+                    with np.errstate(divide="ignore"):
+                        prices=np.where(prices>0,1.0/prices,np.nan)
+                rates=rates*prices
+            allRates[key]=rates
+        return allRates
+
+    def revalue(self, cryptoSets:list[CryptoSet]) -> int:
+        """
+        Sets the converted totals of all cryptos and the set totals of all currencies.
+
+        :return: nr. of converted totals which had no price and were kept
+        """
+        if len(cryptoSets)==0:
+            return 0
+        allRates={key: rates.tolist() for key, rates in self._getRates(np.array([s.timestamp for s in cryptoSets])).items()}
+
+        missing=0
+        for row, cryptoSet in enumerate(cryptoSets):
+            for currency in self.currencies:
+                total=0.0
+                deposit=0.0
+                c:Crypto
+                for c in cryptoSet.allCryptos.values():
+                    rates=allRates.get((c.name, currency))
+                    rate=rates[row] if rates is not None else np.nan
+                    # NaN when there is no price at the time of the set
+                    converted=c.allTotals.get(currency)
+                    if rate==rate:
+                        # without a raw deposit, e.g. sets stored before it, the stored converted deposit is kept
+                        if c.paymentDeposit==0 and converted is not None:
+                            convertedDeposit=converted.deposit
+                        else:
+                            convertedDeposit=c.paymentDeposit*rate
+                        converted=Crypto.ConvertedTotal(currency,c.getTotal()*rate,convertedDeposit)
+                        c.allTotals[currency]=converted
+                    else:
+                        missing+=1
+                    if converted is not None:
+                        total+=converted.total
+                        deposit+=converted.deposit
+                cryptoSet.getOrCreateTotalByName(currency).set(total,deposit)
+        return missing
+
+    def __init__(self, priceHistory:PriceHistory, graph:ConversionGraph, symbolIndex:SymbolIndex, currencies:list[str], assets:list[str]):
+        self.priceHistory:PriceHistory=priceHistory
+        self.graph:ConversionGraph=graph
+        self.currencies:list[str]=list(dict.fromkeys(currencies))
+
+        # symbol per base and quote, e.g. ("ETH", "BTC"): "ETHBTC"
+        self.allSymbols:dict[tuple[str, str], str]={pair: symbol for symbol, pair in symbolIndex.allPairs.items()}
+
+        # route of every convertible asset and currency
+        self.allRoutes:dict[tuple[str, str], list[tuple[str, bool]]]={}
+        for currency in self.currencies:
+            for asset in assets:
+                route=self._getRoute(asset,currency)
+                if route is not None:
+                    self.allRoutes[(asset, currency)]=route
+                else:
+                    logging.debug(f"No route from {asset} to {currency}")
@@ -0,0 +1,509 @@
+# class to convert stored CryptoSets between JSON and a compact binary format
+# License: MIT
+# Author: mhl5k
+
+import json
+import struct
+import uuid
+
+
+class SnapshotCodec:
+    """
+    Binary form of the dict written by CryptoSet.toJSON. A file starts with a header,
+    followed by records of one set each (uint32 length + payload).
+
+    Numbers are 8 decimal fixed point int64 values, the same precision as the "{:.8f}"
+    strings of the JSON format, so a round trip gives the same strings again.
+    Names are stored once per record in a name dictionary and referenced by number.
+    A set which cannot be packed without loss (unknown keys, other number formats)
+    is stored as JSON inside the record. A set stored as changes (SnapshotDelta) is
+    packed with its delta block behind the time.
+    """
+
+    MAGIC: bytes = b"BNCS"
+
+    # version of this binary format and the highest CryptoSet/Crypto JSON versions it knows,
+    # v8 of Crypto is the stored form with klinesRef into the KlineArchive,
+    # format v3 adds records of sets stored as changes, v4 records with a 32 bit field mask
+    FORMAT_VERSION: int = 4
+    SET_SCHEMA: int = 4
+    CRYPTO_SCHEMA: int = 9
+
+    HEADER = struct.Struct("<4sHHH")
+    LENGTH = struct.Struct("<I")
+
+    # record types
+    PACKED: int = 0
+    JSON: int = 1
+    PACKED_DELTA: int = 2
+    # as above, the field mask of each crypto has 32 bits
+    PACKED_WIDE: int = 3
+    PACKED_WIDE_DELTA: int = 4
+
+    # numeric fields of a crypto, bit n of the field mask is set when CRYPTO_FIELDS[n] is present
+    CRYPTO_FIELDS: list[str] = [
+        # v1
+        "orderWalletFree", "orderWalletLocked", "orderWalletTotal", "liquidSwapValue", "totalValue",
+        # v2
+        "paymentDeposit",
+        # v3
+        "earnPlan",
+        # v5
+        "earnFlexible", "earnLocked",
+        # v1, migrated in v4 and v5
+        "savingsWalletFlexible", "totalBTCValue",
+        # v3, migrated in v5
+        "earnStaking"
+    ]
+    CONVERTED_TOTAL: int = 1 << 12  # v4
+    GROWTH: int = 1 << 13  # v6
+    KLINES: int = 1 << 14  # v7
+    KLINES_REF: int = 1 << 15  # v8
+
+    # numeric fields of a crypto in the wide field mask, bit 16+n is set when WIDE_FIELDS[n] is present
+    WIDE_FIELDS: list[str] = [
+        # v9
+        "paymentWithdraw"
+    ]
+
+    # key order of Crypto.toJSON
+    CRYPTO_KEYS: list[str] = [
+        "asset", "orderWalletFree", "orderWalletLocked", "orderWalletTotal", "liquidSwapValue", "totalValue",
+        "paymentDeposit", "earnPlan", "convertedTotal", "earnFlexible", "earnLocked", "klines", "klinesRef",
+        "paymentWithdraw"
+    ]
+
+    INT64_MAX: int = 2**63-1
+
+    class NotPackable(Exception):
+        pass
+
+    # Fixed point numbers
+    # -------------------
+
+    @staticmethod
+    def _toUnits(value) -> int:
+        # only the exact "{:.8f}" form, everything else would change on the way back
+        if not isinstance(value, str) or len(value)<10 or value[-9]!=".":
+            raise SnapshotCodec.NotPackable(value)
+        try:
+            units=int(value[:-9]+value[-8:])
+        except ValueError:
+            raise SnapshotCodec.NotPackable(value)
+        if abs(units)>SnapshotCodec.INT64_MAX or SnapshotCodec._fromUnits(units)!=value:
+            raise SnapshotCodec.NotPackable(value)
+        return units
+
+    @staticmethod
+    def _fromUnits(units:int) -> str:
+        sign="-" if units<0 else ""
+        units=abs(units)
+        return "%s%d.%08d" % (sign,units//100000000,units%100000000)
+
+    # Header
+    # ------
+
+    @staticmethod
+    def encodeHeader() -> bytes:
+        return SnapshotCodec.HEADER.pack(SnapshotCodec.MAGIC,SnapshotCodec.FORMAT_VERSION,SnapshotCodec.SET_SCHEMA,SnapshotCodec.CRYPTO_SCHEMA)
+
+    @staticmethod
+    def decodeHeader(content:bytes) -> tuple[int, int, int]:
+        """
+        Checks the header and returns (format version, set schema, crypto schema).
+        """
+        if len(content)<SnapshotCodec.HEADER.size:
+            raise ValueError("Binary database is too short")
+        magic, formatVersion, setSchema, cryptoSchema=SnapshotCodec.HEADER.unpack_from(content)
+        if magic!=SnapshotCodec.MAGIC:
+            raise ValueError("Not a binary database")
+        if formatVersion>SnapshotCodec.FORMAT_VERSION:
+            raise ValueError(f"Binary database version {formatVersion} is newer than supported version {SnapshotCodec.FORMAT_VERSION}")
+        return formatVersion, setSchema, cryptoSchema
+
+    # Encoding
+    # --------
+
+    @staticmethod
+    def encode(entry:dict) -> bytes:
+        """
+        Returns the record payload of a set, packed when possible.
+        """
+        try:
+            return SnapshotCodec._pack(entry)
+        except (SnapshotCodec.NotPackable, struct.error, ValueError):
+            # e.g. a name longer than 255 bytes
+            return struct.pack("<B",SnapshotCodec.JSON)+json.dumps(entry, separators=(",", ":")).encode("utf8")
+
+    @staticmethod
+    def _pack(entry:dict) -> bytes:
+        if not set(entry.keys())<={"uuid", "timestamp", "time", "crypto", "totals", "totalBTC", "delta"}:
+            raise SnapshotCodec.NotPackable(entry.keys())
+
+        allNames:dict[str, int]={}
+
+        def nameId(name) -> int:
+            if not isinstance(name, str):
+                raise SnapshotCodec.NotPackable(name)
+            if name not in allNames:
+                allNames[name]=len(allNames)
+            return allNames[name]
+
+        parts:list[bytes]=[]
+
+        # uuid and timestamp, both in the form CryptoSet.toJSON writes them
+        if "uuid" in entry:
+            try:
+                uuidBytes=uuid.UUID(entry["uuid"]).bytes
+            except (ValueError, TypeError, AttributeError):
+                raise SnapshotCodec.NotPackable(entry["uuid"])
+            if "%s" % (uuid.UUID(bytes=uuidBytes))!=entry["uuid"]:
+                raise SnapshotCodec.NotPackable(entry["uuid"])
+            parts.append(struct.pack("<B16s",1,uuidBytes))
+        else:
+            parts.append(struct.pack("<B",0))
+
+        try:
+            timestamp=float(entry["timestamp"])
+        except (ValueError, TypeError):
+            raise SnapshotCodec.NotPackable(entry["timestamp"])
+        if not isinstance(entry["timestamp"], str) or "%s" % (timestamp)!=entry["timestamp"] or not isinstance(entry["time"], str):
+            raise SnapshotCodec.NotPackable(entry["timestamp"])
+        time=entry["time"].encode("utf8")
+        parts.append(struct.pack("<dH",timestamp,len(time))+time)
+
+        recordType=SnapshotCodec.PACKED_WIDE
+        if "delta" in entry:
+            recordType=SnapshotCodec.PACKED_WIDE_DELTA
+            parts.append(SnapshotCodec._packDelta(entry["delta"],nameId))
+
+        # v1
+        if "totalBTC" in entry:
+            parts.append(struct.pack("<Bq",1,SnapshotCodec._toUnits(entry["totalBTC"])))
+        else:
+            parts.append(struct.pack("<B",0))
+
+        # v3
+        totals=entry.get("totals")
+        if totals is None:
+            parts.append(struct.pack("<B",0))
+        else:
+            parts.append(struct.pack("<BB",1,len(totals)))
+            for key, total in totals.items():
+                if set(total.keys())!={"name", "total", "deposit"}:
+                    raise SnapshotCodec.NotPackable(total)
+                parts.append(struct.pack("<HHqq",nameId(key),nameId(total["name"]),
+                                         SnapshotCodec._toUnits(total["total"]),SnapshotCodec._toUnits(total["deposit"])))
+
+        parts.append(struct.pack("<H",len(entry["crypto"])))
+        for crypto in entry["crypto"]:
+            parts.append(SnapshotCodec._packCrypto(crypto,nameId))
+
+        # name dictionary in front of the values which refer to it
+        names:list[bytes]=[struct.pack("<BH",recordType,len(allNames))]
+        for name in allNames:
+            encoded=name.encode("utf8")
+            names.append(struct.pack("<B",len(encoded))+encoded)
+        return b"".join(names+parts)
+
+    @staticmethod
+    def _packDelta(delta:dict, nameId) -> bytes:
+        # base uuid, removed assets and the optional order of the assets
+        if not isinstance(delta, dict) or not {"base", "removed"}<=set(delta.keys())<={"base", "removed", "order"}:
+            raise SnapshotCodec.NotPackable(delta)
+        try:
+            baseBytes=uuid.UUID(delta["base"]).bytes
+        except (ValueError, TypeError, AttributeError):
+            raise SnapshotCodec.NotPackable(delta["base"])
+        if "%s" % (uuid.UUID(bytes=baseBytes))!=delta["base"]:
+            raise SnapshotCodec.NotPackable(delta["base"])
+
+        parts:list[bytes]=[baseBytes]
+        for key in ("removed", "order"):
+            if key in delta:
+                ids=[nameId(name) for name in delta[key]]
+                parts.append(struct.pack("<BH%dH" % (len(ids)),1,len(ids),*ids))
+            else:
+                parts.append(struct.pack("<B",0))
+        return b"".join(parts)
+
+    @staticmethod
+    def _packCrypto(crypto:dict, nameId) -> bytes:
+        known=set(SnapshotCodec.CRYPTO_FIELDS)|set(SnapshotCodec.WIDE_FIELDS)|{"asset", "convertedTotal", "growth", "klines", "klinesRef"}
+        if not set(crypto.keys())<=known:
+            raise SnapshotCodec.NotPackable(crypto.keys())
+
+        mask=0
+        values:list[int]=[]
+        for bit, field in enumerate(SnapshotCodec.CRYPTO_FIELDS):
+            if field in crypto:
+                mask|=1 << bit
+                values.append(SnapshotCodec._toUnits(crypto[field]))
+        for bit, field in enumerate(SnapshotCodec.WIDE_FIELDS, start=16):
+            if field in crypto:
+                mask|=1 << bit
+                values.append(SnapshotCodec._toUnits(crypto[field]))
+        if "convertedTotal" in crypto:
+            mask|=SnapshotCodec.CONVERTED_TOTAL
+        if "growth" in crypto:
+            mask|=SnapshotCodec.GROWTH
+        if "klines" in crypto:
+            mask|=SnapshotCodec.KLINES
+        if "klinesRef" in crypto:
+            mask|=SnapshotCodec.KLINES_REF
+
+        parts:list[bytes]=[struct.pack("<HI%dq" % (len(values)),nameId(crypto["asset"]),mask,*values)]
+
+        if "convertedTotal" in crypto:
+            parts.append(struct.pack("<B",len(crypto["convertedTotal"])))
+            for total in crypto["convertedTotal"]:
+                if set(total.keys())!={"name", "total", "deposit"}:
+                    raise SnapshotCodec.NotPackable(total)
+                parts.append(struct.pack("<Hqq",nameId(total["name"]),SnapshotCodec._toUnits(total["total"]),SnapshotCodec._toUnits(total["deposit"])))
+
+        if "growth" in crypto:
+            if not isinstance(crypto["growth"], str):
+                raise SnapshotCodec.NotPackable(crypto["growth"])
+            growth=crypto["growth"].encode("utf8")
+            parts.append(struct.pack("<I",len(growth))+growth)
+
+        if "klines" in crypto:
+            klines=crypto["klines"]
+            if not isinstance(klines, dict) or list(klines.keys())!=["symbol", "volumes", "closes"]:
+                raise SnapshotCodec.NotPackable(klines)
+            parts.append(struct.pack("<H",nameId(klines["symbol"])))
+            for series in (klines["volumes"], klines["closes"]):
+                # floats only, ints would come back as floats
+                if not all(type(value) is float for value in series):
+                    raise SnapshotCodec.NotPackable(series)
+                parts.append(struct.pack("<H%dd" % (len(series)),len(series),*series))
+
+        if "klinesRef" in crypto:
+            ref=crypto["klinesRef"]
+            if not isinstance(ref, dict) or list(ref.keys())!=["symbol", "month", "count", "open"] or type(ref["count"]) is not int:
+                raise SnapshotCodec.NotPackable(ref)
+            # month as nr. of months since year 0
+            month=ref["month"]
+            if not isinstance(month, str) or len(month)!=7 or "%04d-%02d" % (int(month[:4]),int(month[5:]))!=month:
+                raise SnapshotCodec.NotPackable(month)
+            if len(ref["open"])!=2 or not all(type(value) is float for value in ref["open"]):
+                raise SnapshotCodec.NotPackable(ref["open"])
+            parts.append(struct.pack("<HIHdd",nameId(ref["symbol"]),int(month[:4])*12+int(month[5:])-1,ref["count"],*ref["open"]))
+
+        return b"".join(parts)
+
+    # Decoding
+    # --------
+
+    @staticmethod
+    def decodeKey(payload:bytes) -> tuple[float, str | None, bool]:
+        """
+        Returns only (timestamp, uuid, stored as changes) of a record, for building an index.
+        """
+        if payload[0]==SnapshotCodec.JSON:
+            entry=json.loads(payload[1:])
+            return float(entry["timestamp"]), entry.get("uuid"), "delta" in entry
+
+        offset=SnapshotCodec._skipNames(payload)
+        uuidString=None
+        if payload[offset]==1:
+            uuidString="%s" % (uuid.UUID(bytes=bytes(payload[offset+1:offset+17])))
+            offset+=17
+        else:
+            offset+=1
+        timestamp=struct.unpack_from("<d",payload,offset)[0]
+        return timestamp, uuidString, payload[0] in (SnapshotCodec.PACKED_DELTA, SnapshotCodec.PACKED_WIDE_DELTA)
+
+    @staticmethod
+    def _skipNames(payload:bytes) -> int:
+        count=struct.unpack_from("<H",payload,1)[0]
+        offset=3
+        for i in range(count):
+            offset+=1+payload[offset]
+        return offset
+
+    @staticmethod
+    def decode(payload:bytes) -> dict:
+        """
+        Returns the set as dict, equal to the one given to encode.
+        """
+        if payload[0]==SnapshotCodec.JSON:
+            return json.loads(payload[1:])
+
+        fromUnits=SnapshotCodec._fromUnits
+        count=struct.unpack_from("<H",payload,1)[0]
+        offset=3
+        names:list[str]=[]
+        for i in range(count):
+            length=payload[offset]
+            names.append(bytes(payload[offset+1:offset+1+length]).decode("utf8"))
+            offset+=1+length
+
+        entry:dict={}
+        if payload[offset]==1:
+            entry["uuid"]="%s" % (uuid.UUID(bytes=bytes(payload[offset+1:offset+17])))
+            offset+=17
+        else:
+            offset+=1
+
+        timestamp, length=struct.unpack_from("<dH",payload,offset)
+        offset+=10
+        entry["timestamp"]="%s" % (timestamp)
+        entry["time"]=bytes(payload[offset:offset+length]).decode("utf8")
+        offset+=length
+
+        delta:dict|None=None
+        if payload[0] in (SnapshotCodec.PACKED_DELTA, SnapshotCodec.PACKED_WIDE_DELTA):
+            delta={"base": "%s" % (uuid.UUID(bytes=bytes(payload[offset:offset+16])))}
+            offset+=16
+            for key in ("removed", "order"):
+                if payload[offset]==1:
+                    length=struct.unpack_from("<H",payload,offset+1)[0]
+                    delta[key]=[names[i] for i in struct.unpack_from("<%dH" % (length),payload,offset+3)]
+                    offset+=3+2*length
+                else:
+                    offset+=1
+
+        # keys in the order of CryptoSet.toJSON
+        entry["crypto"]=[]
+
+        if payload[offset]==1:
+            entry["totalBTC"]=fromUnits(struct.unpack_from("<q",payload,offset+1)[0])
+            offset+=9
+        else:
+            offset+=1
+
+        totals:dict|None=None
+        if payload[offset]==1:
+            totals={}
+            for i in range(payload[offset+1]):
+                key, name, total, deposit=struct.unpack_from("<HHqq",payload,offset+2+i*20)
+                totals[names[key]]={"name": names[name], "total": fromUnits(total), "deposit": fromUnits(deposit)}
+            offset+=2+len(totals)*20
+        else:
+            offset+=1
+
+        nrOfCryptos=struct.unpack_from("<H",payload,offset)[0]
+        offset+=2
+        for i in range(nrOfCryptos):
+            crypto, offset=SnapshotCodec._decodeCrypto(payload,offset,names,payload[0]>=SnapshotCodec.PACKED_WIDE)
+            entry["crypto"].append(crypto)
+
+        if totals is not None:
+            entry["totals"]=totals
+        if delta is not None:
+            entry["delta"]=delta
+        return entry
+
+    @staticmethod
+    def _decodeCrypto(payload:bytes, offset:int, names:list[str], isWide:bool) -> tuple[dict, int]:
+        fromUnits=SnapshotCodec._fromUnits
+        if isWide:
+            asset, mask=struct.unpack_from("<HI",payload,offset)
+            offset+=6
+        else:
+            asset, mask=struct.unpack_from("<HH",payload,offset)
+            offset+=4
+
+        values:dict={"asset": names[asset]}
+        for bit, field in list(enumerate(SnapshotCodec.CRYPTO_FIELDS))+list(enumerate(SnapshotCodec.WIDE_FIELDS, start=16)):
+            if mask & (1 << bit):
+                values[field]=fromUnits(struct.unpack_from("<q",payload,offset)[0])
+                offset+=8
+
+        if mask & SnapshotCodec.CONVERTED_TOTAL:
+            totals:list[dict]=[]
+            for i in range(payload[offset]):
+                name, total, deposit=struct.unpack_from("<Hqq",payload,offset+1+i*18)
+                totals.append({"name": names[name], "total": fromUnits(total), "deposit": fromUnits(deposit)})
+            offset+=1+len(totals)*18
+            values["convertedTotal"]=totals
+
+        if mask & SnapshotCodec.GROWTH:
+            length=struct.unpack_from("<I",payload,offset)[0]
+            values["growth"]=bytes(payload[offset+4:offset+4+length]).decode("utf8")
+            offset+=4+length
+
+        if mask & SnapshotCodec.KLINES:
+            symbol=struct.unpack_from("<H",payload,offset)[0]
+            offset+=2
+            allSeries:list[list[float]]=[]
+            for i in range(2):
+                length=struct.unpack_from("<H",payload,offset)[0]
+                allSeries.append(list(struct.unpack_from("<%dd" % (length),payload,offset+2)))
+                offset+=2+8*length
+            values["klines"]={"symbol": names[symbol], "volumes": allSeries[0], "closes": allSeries[1]}
+
+        if mask & SnapshotCodec.KLINES_REF:
+            symbol, month, count, volume, close=struct.unpack_from("<HIHdd",payload,offset)
+            offset+=24
+            values["klinesRef"]={"symbol": names[symbol], "month": "%04d-%02d" % (month//12,month%12+1), "count": count, "open": [volume, close]}
+
+        # current fields in the order of Crypto.toJSON, older ones afterwards
+        crypto={key: values.pop(key) for key in SnapshotCodec.CRYPTO_KEYS if key in values}
+        crypto.update(values)
+        return crypto, offset
+
+
+# Test function for module
+def _test():
+    def crypto(asset:str, total:str) -> dict:
+        # key order of Crypto.toJSON
+        return {"asset": asset, "orderWalletFree": total, "orderWalletLocked": "0.00000000", "orderWalletTotal": total,
+                "liquidSwapValue": "0.00000000", "totalValue": total, "paymentDeposit": "0.50000000", "earnPlan": "0.00000000",
+                "convertedTotal": [{"name": "BTC", "total": "-0.12345678", "deposit": "0.00000001"}],
+                "earnFlexible": "0.00000000", "earnLocked": "0.00000000",
+                "klines": {"symbol": "USDC", "volumes": [1.5, 2.25], "closes": [0.1, 0.30000000000000004]},
+                "paymentWithdraw": "0.25000000"}
+
+    entry={"uuid": "7d1c1a8e-7a59-4a4c-9b4b-0a6f3c6f2b11", "timestamp": "1750000000.123456", "time": "2025-06-15 17:06:40.123456",
+           "crypto": [crypto("BTC","1.00000000"), crypto("ETH","12345678.87654321")],
+           "totals": {"BTC": {"name": "BTC", "total": "2.00000000", "deposit": "0.00000000"}}}
+
+    # header
+    assert SnapshotCodec.decodeHeader(SnapshotCodec.encodeHeader())==(SnapshotCodec.FORMAT_VERSION, SnapshotCodec.SET_SCHEMA, SnapshotCodec.CRYPTO_SCHEMA)
+    for content in (b"", b"XXXX"+SnapshotCodec.encodeHeader()[4:]):
+        try:
+            SnapshotCodec.decodeHeader(content)
+            assert False
+        except ValueError:
+            pass
+
+    # packed record, same strings and floats again
+    payload=SnapshotCodec.encode(entry)
+    assert payload[0]!=SnapshotCodec.JSON
+    assert SnapshotCodec.decode(payload)==entry
+    assert SnapshotCodec.decodeKey(payload)==(1750000000.123456, entry["uuid"], False)
+
+    # records of format v3 with a 16 bit field mask, complete and as changes
+    small={"uuid": entry["uuid"], "timestamp": "1750000000.5", "time": "t", "crypto": [{"asset": "ETH", "totalValue": "1.00000000", "paymentDeposit": "0.50000000"}], "totals": {}}
+    payload=bytes.fromhex("00010003455448017d1c1a8e7a594a4c9b4b0a6f3c6f2b1100002060b813da4101007400010001000000300000e1f5050000000080f0fa0200000000")
+    assert SnapshotCodec.decode(payload)==small
+    payload=bytes.fromhex("02010003455448017d1c1a8e7a594a4c9b4b0a6f3c6f2b1100002060b813da410100747d1c1a8e7a594a4c9b4b0a6f3c6f2b11010000000001"
+                          "0001000000300000e1f5050000000080f0fa0200000000")
+    assert SnapshotCodec.decode(payload)==dict(small, delta={"base": entry["uuid"], "removed": []})
+    assert SnapshotCodec.decodeKey(payload)==(1750000000.5, entry["uuid"], True)
+
+    # set stored as changes
+    delta=dict(entry, crypto=[{"asset": "ETH", "totalValue": "1.00000000"}], delta={"base": entry["uuid"], "removed": ["BTC"]})
+    payload=SnapshotCodec.encode(delta)
+    assert SnapshotCodec.decode(payload)==delta
+    assert SnapshotCodec.decodeKey(payload)[2]
+
+    # sets which cannot be packed without loss are kept as JSON
+    for unpackable in (dict(entry, unknownKey=1), dict(entry, crypto=[dict(crypto("BTC","1.00000000"), earnPlan="1.5")])):
+        payload=SnapshotCodec.encode(unpackable)
+        assert payload[0]==SnapshotCodec.JSON
+        assert SnapshotCodec.decode(payload)==unpackable
+
+    # v1 set without uuid
+    v1={"timestamp": "1600000000.5", "time": "2020-09-13 12:26:40.500000", "crypto": [], "totalBTC": "0.00000000"}
+    assert SnapshotCodec.decode(SnapshotCodec.encode(v1))==v1
+    assert SnapshotCodec.decodeKey(SnapshotCodec.encode(v1))[1] is None
+
+    # end
+    print(__file__+": All module tests did run fine.")
+
+# when file ist started directly
+if __name__ == '__main__':
+    _test()
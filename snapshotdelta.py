@@ -0,0 +1,122 @@
+# class to store a CryptoSet as the changes to the set stored before it
+# License: MIT
+# Author: mhl5k
+
+
+class SnapshotDelta:
+    """
+    Between two sets most cryptos keep their amounts, only converted totals and the open
+    kline change. A delta set keeps all keys of the set, but only the changed cryptos with
+    their changed keys, and under "delta":
+    - base: uuid of the set before, which the changes apply to
+    - removed: assets which are not in the set anymore
+    - order: order of the assets, only when it is not the order of the rebuilt list
+    """
+
+    @staticmethod
+    def isDelta(entry:dict) -> bool:
+        return "delta" in entry
+
+    @staticmethod
+    def _getRebuiltOrder(previousAssets:list[str], removed:set, changedAssets:list[str]) -> list[str]:
+        # former order without removed assets, new assets at the end
+        kept=[asset for asset in previousAssets if asset not in removed]
+        known=set(kept)
+        return kept+[asset for asset in changedAssets if asset not in known]
+
+    @staticmethod
+    def encode(entry:dict, previous:dict) -> dict:
+        """
+        Returns the changes of entry to previous, both in the form of CryptoSet.toJSON.
+        """
+        previousCryptos={crypto["asset"]: crypto for crypto in previous["crypto"]}
+        assets=[crypto["asset"] for crypto in entry["crypto"]]
+
+        changed:list[dict]=[]
+        for crypto in entry["crypto"]:
+            old=previousCryptos.get(crypto["asset"])
+            if old is None:
+                changed.append(crypto)
+                continue
+            change={key: value for key, value in crypto.items() if key=="asset" or key not in old or old[key]!=value}
+            removedKeys=[key for key in old if key not in crypto]
+            if len(removedKeys)>0:
+                change["removedKeys"]=removedKeys
+            if len(change)>1:
+                changed.append(change)
+
+        removed=set(previousCryptos.keys())-set(assets)
+        delta:dict={"base": previous.get("uuid"), "removed": [asset for asset in previousCryptos if asset in removed]}
+        if SnapshotDelta._getRebuiltOrder(list(previousCryptos.keys()),removed,[c["asset"] for c in changed])!=assets:
+            delta["order"]=assets
+
+        encoded={key: (changed if key=="crypto" else value) for key, value in entry.items()}
+        encoded["delta"]=delta
+        return encoded
+
+    @staticmethod
+    def decode(encoded:dict, previous:dict|None) -> dict:
+        """
+        Returns the complete set, previous must be the set the delta was built from.
+        Unchanged cryptos are shared with previous.
+        """
+        delta=encoded["delta"]
+        if previous is None or previous.get("uuid")!=delta["base"]:
+            raise ValueError(f"Set {encoded.get('uuid')} is stored as changes to {delta['base']}, which was not found before it")
+
+        removed=set(delta["removed"])
+        cryptos:dict[str, dict]={crypto["asset"]: crypto for crypto in previous["crypto"] if crypto["asset"] not in removed}
+        for change in encoded["crypto"]:
+            asset=change["asset"]
+            if asset not in cryptos:
+                cryptos[asset]=change
+                continue
+            crypto=dict(cryptos[asset])
+            crypto.update({key: value for key, value in change.items() if key!="removedKeys"})
+            for key in change.get("removedKeys",[]):
+                crypto.pop(key,None)
+            cryptos[asset]=crypto
+
+        order=delta.get("order",list(cryptos.keys()))
+        cryptoList=[cryptos[asset] for asset in order]
+        return {key: (cryptoList if key=="crypto" else value) for key, value in encoded.items() if key!="delta"}
+
+
+# Test function for module
+def _test():
+    def crypto(asset:str, total:str, **more) -> dict:
+        return {"asset": asset, "orderWalletTotal": total, "totalValue": total, **more}
+
+    previous={"uuid": "a", "timestamp": "1.0", "time": "t1", "crypto": [crypto("BTC","1.0"), crypto("ETH","2.0",earnPlan="0.5"), crypto("BNB","3.0")], "totals": {}}
+
+    # changed, unchanged, removed and new cryptos, a removed key
+    entry={"uuid": "b", "timestamp": "2.0", "time": "t2", "crypto": [crypto("BTC","1.5"), crypto("ETH","2.0"), crypto("SOL","4.0")], "totals": {}}
+    encoded=SnapshotDelta.encode(entry,previous)
+    assert SnapshotDelta.isDelta(encoded) and not SnapshotDelta.isDelta(entry)
+    assert [c["asset"] for c in encoded["crypto"]]==["BTC", "ETH", "SOL"]
+    assert encoded["delta"]["removed"]==["BNB"] and "order" not in encoded["delta"]
+    assert SnapshotDelta.decode(encoded,previous)==entry
+
+    # other order of the assets
+    entry["crypto"]=list(reversed(entry["crypto"]))
+    encoded=SnapshotDelta.encode(entry,previous)
+    assert encoded["delta"]["order"]==["SOL", "ETH", "BTC"]
+    assert SnapshotDelta.decode(encoded,previous)==entry
+
+    # a chain, each set stored as changes to the set before
+    third={"uuid": "c", "timestamp": "3.0", "time": "t3", "crypto": [crypto("SOL","5.0")], "totals": {}}
+    assert SnapshotDelta.decode(SnapshotDelta.encode(third,entry),SnapshotDelta.decode(encoded,previous))==third
+
+    # only the set it was built from can be the base
+    try:
+        SnapshotDelta.decode(encoded,third)
+        assert False
+    except ValueError:
+        pass
+
+    # end
+    print(__file__+": All module tests did run fine.")
+
+# when file ist started directly
+if __name__ == '__main__':
+    _test()
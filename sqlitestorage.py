@@ -0,0 +1,301 @@
+# class to load and save all CryptoSets in a SQLite database
+# License: MIT
+# Author: mhl5k
+
+import json
+import logging
+import sqlite3
+
+from mhl5k.files import Files
+from cryptoset import CryptoSet
+from klinearchive import KlineArchive
+from storage import SnapshotRef
+
+
+class SqliteStorage:
+    """
+    Normalized tables for sets, assets and converted totals (database.sqlite),
+    indexed on timestamp and asset, so other tools can query it directly.
+    """
+
+    name:str = "sqlite"
+
+    # sets per query, sqlite limits the nr. of parameters
+    BATCH_SIZE: int = 500
+
+    # numeric asset columns, same names as in Crypto.toJSON
+    ASSET_FIELDS: list[str] = [
+        "orderWalletFree", "orderWalletLocked", "orderWalletTotal", "liquidSwapValue", "totalValue",
+        "paymentDeposit", "paymentWithdraw", "earnPlan", "earnFlexible", "earnLocked"
+    ]
+
+    SCHEMA: str = """
+        CREATE TABLE IF NOT EXISTS snapshots (
+            uuid TEXT PRIMARY KEY,
+            timestamp REAL NOT NULL,
+            time TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS snapshotsTimestamp ON snapshots(timestamp);
+
+        CREATE TABLE IF NOT EXISTS assets (
+            snapshot TEXT NOT NULL REFERENCES snapshots(uuid),
+            asset TEXT NOT NULL,
+            orderWalletFree REAL NOT NULL DEFAULT 0,
+            orderWalletLocked REAL NOT NULL DEFAULT 0,
+            orderWalletTotal REAL NOT NULL DEFAULT 0,
+            liquidSwapValue REAL NOT NULL DEFAULT 0,
+            totalValue REAL NOT NULL DEFAULT 0,
+            paymentDeposit REAL NOT NULL DEFAULT 0,
+            paymentWithdraw REAL NOT NULL DEFAULT 0,
+            earnPlan REAL NOT NULL DEFAULT 0,
+            earnFlexible REAL NOT NULL DEFAULT 0,
+            earnLocked REAL NOT NULL DEFAULT 0,
+            klines TEXT,
+            PRIMARY KEY (snapshot, asset)
+        );
+        CREATE INDEX IF NOT EXISTS assetsAsset ON assets(asset);
+
+        CREATE TABLE IF NOT EXISTS convertedTotals (
+            snapshot TEXT NOT NULL REFERENCES snapshots(uuid),
+            asset TEXT NOT NULL,
+            currency TEXT NOT NULL,
+            total REAL NOT NULL,
+            deposit REAL NOT NULL,
+            PRIMARY KEY (snapshot, asset, currency)
+        );
+        CREATE INDEX IF NOT EXISTS convertedTotalsAsset ON convertedTotals(asset, currency);
+
+        CREATE TABLE IF NOT EXISTS setTotals (
+            snapshot TEXT NOT NULL REFERENCES snapshots(uuid),
+            currency TEXT NOT NULL,
+            total REAL NOT NULL,
+            deposit REAL NOT NULL,
+            PRIMARY KEY (snapshot, currency)
+        );
+
+        CREATE TABLE IF NOT EXISTS klineMonths (
+            pair TEXT NOT NULL,
+            month TEXT NOT NULL,
+            volume REAL NOT NULL,
+            close REAL NOT NULL,
+            PRIMARY KEY (pair, month)
+        );
+    """
+
+    def getFilename(self) -> str:
+        return Files.getDatabaseSqliteFilenameWithPath(self.account)
+
+    def exists(self) -> bool:
+        return Files.databaseSqliteExists(self.account)
+
+    def __init__(self, account:str=""):
+        # name of the account, part of the filename
+        self.account:str=account
+
+    def _connect(self) -> sqlite3.Connection:
+        connection=sqlite3.connect(self.getFilename())
+        connection.executescript(SqliteStorage.SCHEMA)
+        return connection
+
+    def _loadKlineArchive(self, connection:sqlite3.Connection) -> KlineArchive:
+        archive=KlineArchive()
+        for pair, month, volume, close in connection.execute("SELECT pair, month, volume, close FROM klineMonths"):
+            archive.allMonths.setdefault(pair,{})[month]=[volume, close]
+        return archive
+
+    def _saveKlineArchive(self, connection:sqlite3.Connection, archive:KlineArchive):
+        connection.executemany("INSERT OR IGNORE INTO klineMonths (pair, month, volume, close) VALUES (?, ?, ?, ?)", archive.newMonths)
+        archive.newMonths=[]
+
+    def _buildEntries(self, connection:sqlite3.Connection, snapshotRows:list, allSnapshots:bool=False) -> list[dict]:
+        # build CryptoSet.toJSON like dicts from the rows of the given snapshots
+        entries:dict[str, dict]={}
+        for uuid, timestamp, time in snapshotRows:
+            entries[uuid]={"uuid": uuid, "timestamp": timestamp, "time": time, "crypto": [], "totals": {}}
+        if len(entries)==0:
+            return []
+
+        # all rows are read without a condition, sqlite limits the nr. of parameters
+        where=""
+        params:list=[]
+        if not allSnapshots:
+            where="WHERE snapshot IN (%s)" % (",".join("?"*len(entries)))
+            params=list(entries.keys())
+
+        cryptos:dict[tuple, dict]={}
+        columns=", ".join(SqliteStorage.ASSET_FIELDS)
+        for row in connection.execute(f"SELECT snapshot, asset, {columns}, klines FROM assets {where} ORDER BY rowid", params):
+            crypto={"asset": row[1], "convertedTotal": []}
+            for i, field in enumerate(SqliteStorage.ASSET_FIELDS):
+                crypto[field]=row[2+i]
+            if row[-1] is not None:
+                klines=json.loads(row[-1])
+                # reference into klineMonths or klines stored before the kline archive
+                crypto["klinesRef" if "month" in klines else "klines"]=klines
+            entries[row[0]]["crypto"].append(crypto)
+            cryptos[(row[0],row[1])]=crypto
+
+        for snapshot, asset, currency, total, deposit in connection.execute(f"SELECT snapshot, asset, currency, total, deposit FROM convertedTotals {where} ORDER BY rowid", params):
+            cryptos[(snapshot,asset)]["convertedTotal"].append({"name": currency, "total": total, "deposit": deposit})
+
+        for snapshot, currency, total, deposit in connection.execute(f"SELECT snapshot, currency, total, deposit FROM setTotals {where}", params):
+            entries[snapshot]["totals"][currency]={"name": currency, "total": total, "deposit": deposit}
+
+        if any("klinesRef" in crypto for crypto in cryptos.values()):
+            archive=self._loadKlineArchive(connection)
+            return [archive.resolve(entry) for entry in entries.values()]
+        return list(entries.values())
+
+    def load(self) -> list[dict]:
+        connection=self._connect()
+        try:
+            snapshotRows=connection.execute("SELECT uuid, timestamp, time FROM snapshots ORDER BY timestamp").fetchall()
+            return self._buildEntries(connection,snapshotRows,allSnapshots=True)
+        finally:
+            connection.close()
+
+    def loadIndex(self) -> list[SnapshotRef]:
+        connection=self._connect()
+        try:
+            return [SnapshotRef(timestamp,uuid) for timestamp, uuid in connection.execute("SELECT timestamp, uuid FROM snapshots ORDER BY timestamp")]
+        finally:
+            connection.close()
+
+    def iterSelected(self, refs:list[SnapshotRef]):
+        connection=self._connect()
+        try:
+            for start in range(0,len(refs),SqliteStorage.BATCH_SIZE):
+                batch=refs[start:start+SqliteStorage.BATCH_SIZE]
+                placeholders=",".join("?"*len(batch))
+                snapshotRows=connection.execute(f"SELECT uuid, timestamp, time FROM snapshots WHERE uuid IN ({placeholders})", [ref.uuid for ref in batch]).fetchall()
+                entries={entry["uuid"]: entry for entry in self._buildEntries(connection,snapshotRows)}
+                for ref in batch:
+                    yield entries[ref.uuid]
+        finally:
+            connection.close()
+
+    def loadAssetHistory(self, asset:str, currency:str="USDC") -> list[tuple]:
+        """
+        Returns (timestamp, time, total, total in currency) of an asset for all sets, oldest first.
+        """
+        connection=self._connect()
+        try:
+            return connection.execute("""
+                SELECT s.timestamp, s.time, a.totalValue, c.total
+                FROM assets a
+                JOIN snapshots s ON s.uuid=a.snapshot
+                LEFT JOIN convertedTotals c ON c.snapshot=a.snapshot AND c.asset=a.asset AND c.currency=?
+                WHERE a.asset=?
+                ORDER BY s.timestamp
+            """, (currency, asset)).fetchall()
+        finally:
+            connection.close()
+
+    def append(self, entries:list[dict]):
+        connection=self._connect()
+        try:
+            with connection:
+                archive=self._loadKlineArchive(connection)
+                for entry in entries:
+                    self._insert(connection,archive.reference(SqliteStorage._normalize(entry)))
+                self._saveKlineArchive(connection,archive)
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _normalize(entry:dict) -> dict:
+        # the columns are the keys of the current layout, entries of older versions, e.g. imported
+        # from database.json, have other keys (savingsWalletFlexible, earnStaking, totalBTC, ...)
+        cryptoSet=CryptoSet()
+        cryptoSet.fromJSON(entry)
+        return cryptoSet.toJSON()
+
+    def _insert(self, connection:sqlite3.Connection, entry:dict):
+        uuid=entry["uuid"]
+        connection.execute("INSERT OR REPLACE INTO snapshots (uuid, timestamp, time) VALUES (?, ?, ?)",
+                           (uuid, float(entry["timestamp"]), entry["time"]))
+        # a replaced set must not keep rows of its former version
+        for table in ("assets", "convertedTotals", "setTotals"):
+            connection.execute(f"DELETE FROM {table} WHERE snapshot=?", (uuid,))
+
+        columns=", ".join(SqliteStorage.ASSET_FIELDS)
+        placeholders=", ".join("?"*(len(SqliteStorage.ASSET_FIELDS)+3))
+        for crypto in entry["crypto"]:
+            values=[float(crypto.get(field,0.0)) for field in SqliteStorage.ASSET_FIELDS]
+            klines=crypto.get("klinesRef",crypto.get("klines"))
+            klines=json.dumps(klines) if klines is not None else None
+            connection.execute(f"INSERT INTO assets (snapshot, asset, {columns}, klines) VALUES ({placeholders})",
+                               [uuid, crypto["asset"]]+values+[klines])
+            for total in crypto.get("convertedTotal",[]):
+                connection.execute("INSERT OR REPLACE INTO convertedTotals (snapshot, asset, currency, total, deposit) VALUES (?, ?, ?, ?, ?)",
+                                   (uuid, crypto["asset"], total["name"], float(total["total"]), float(total["deposit"])))
+
+        for currency, total in entry.get("totals",{}).items():
+            connection.execute("INSERT INTO setTotals (snapshot, currency, total, deposit) VALUES (?, ?, ?, ?)",
+                               (uuid, currency, float(total["total"]), float(total["deposit"])))
+
+    def save(self, dataSet):
+        self.append([entry.toJSON() for entry in dataSet.unsavedSets])
+
+    def update(self, refs:list[SnapshotRef], entries):
+        """
+        Replaces only the converted totals and set totals of the given sets, in one transaction per batch.
+        """
+        connection=self._connect()
+        try:
+            batch:list[dict]=[]
+            for entry in entries:
+                batch.append(entry)
+                if len(batch)>=SqliteStorage.BATCH_SIZE:
+                    self._updateTotals(connection,batch)
+                    batch=[]
+            self._updateTotals(connection,batch)
+        finally:
+            connection.close()
+
+    def _updateTotals(self, connection:sqlite3.Connection, entries:list[dict]):
+        with connection:
+            for entry in entries:
+                uuid=entry["uuid"]
+                connection.execute("DELETE FROM convertedTotals WHERE snapshot=?", (uuid,))
+                connection.execute("DELETE FROM setTotals WHERE snapshot=?", (uuid,))
+                connection.executemany("INSERT INTO convertedTotals (snapshot, asset, currency, total, deposit) VALUES (?, ?, ?, ?, ?)",
+                                       [(uuid, crypto["asset"], total["name"], float(total["total"]), float(total["deposit"]))
+                                        for crypto in entry["crypto"] for total in crypto.get("convertedTotal",[])])
+                connection.executemany("INSERT INTO setTotals (snapshot, currency, total, deposit) VALUES (?, ?, ?, ?)",
+                                       [(uuid, currency, float(total["total"]), float(total["deposit"])) for currency, total in entry.get("totals",{}).items()])
+
+    def _moveKlinesToArchive(self, connection:sqlite3.Connection) -> int:
+        # klines of sets stored before the kline archive are replaced by a reference
+        archive=self._loadKlineArchive(connection)
+        updates:list[tuple]=[]
+        for rowid, asset, klines, timestamp in connection.execute("""
+                SELECT a.rowid, a.asset, a.klines, s.timestamp
+                FROM assets a
+                JOIN snapshots s ON s.uuid=a.snapshot
+                WHERE a.klines IS NOT NULL
+                ORDER BY s.timestamp
+            """):
+            crypto={"asset": asset, "klines": json.loads(klines)}
+            if "month" in crypto["klines"]:
+                continue
+            referenced=archive.referenceCrypto(crypto,KlineArchive.getMonth(timestamp))
+            if "klinesRef" in referenced:
+                updates.append((json.dumps(referenced["klinesRef"]), rowid))
+        connection.executemany("UPDATE assets SET klines=? WHERE rowid=?", updates)
+        self._saveKlineArchive(connection,archive)
+        return len(updates)
+
+    def compact(self) -> int:
+        connection=self._connect()
+        try:
+            with connection:
+                moved=self._moveKlinesToArchive(connection)
+            logging.debug(f"Moved klines of {moved} assets into klineMonths")
+            count=connection.execute("SELECT COUNT(*) FROM snapshots").fetchone()[0]
+            connection.execute("VACUUM")
+            connection.execute("ANALYZE")
+            logging.debug(f"Vacuumed {self.getFilename()}")
+            return count
+        finally:
+            connection.close()
@@ -0,0 +1,692 @@
+# classes to load and save all CryptoSets of a BinanceDataSet
+# License: MIT
+# Author: mhl5k
+
+import codecs
+import json
+import logging
+import os
+import struct
+
+from mhl5k.files import Files
+from klinearchive import KlineArchive
+from snapshotcodec import SnapshotCodec
+from snapshotdelta import SnapshotDelta
+
+
+class SnapshotRef:
+    """
+    Light index entry of a stored set, the set itself is only built when a command needs it.
+    Offset and length are the position in the file, not used by sqlite. Keyframe is the
+    position of the complete set a set stored as changes is rebuilt from.
+    """
+
+    def __init__(self, timestamp:float, uuid:str, offset:int=0, length:int=0, keyframe:int|None=None, cryptoSet=None):
+        self.timestamp:float=timestamp
+        self.uuid:str=uuid
+        self.offset:int=offset
+        self.length:int=length
+        self.keyframe:int=offset if keyframe is None else keyframe
+
+        # CryptoSet, once it is built
+        self.cryptoSet=cryptoSet
+
+
+def _createRef(entry:dict, offset:int, length:int, keyframe:int|None=None) -> SnapshotRef:
+    # v1 sets have no uuid, their timestamp is unique as well
+    return SnapshotRef(float(entry["timestamp"]),entry.get("uuid","%s" % (entry["timestamp"])),offset,length,keyframe)
+
+
+def _uniqueRefs(refs:list[SnapshotRef]) -> list[SnapshotRef]:
+    # the last written entry of a set wins, in file order
+    return sorted({ref.uuid: ref for ref in refs}.values(), key=lambda ref: ref.offset)
+
+
+def _readIndexFile(filename:str) -> list[SnapshotRef] | None:
+    # the index is only valid for the exact file it was built from
+    indexFilename=filename+".index"
+    if not os.path.isfile(indexFilename):
+        return None
+    try:
+        with open(indexFilename, "r", encoding="utf8") as infile:
+            content=json.load(infile)
+            infile.close()
+    except ValueError as E:
+        logging.debug(f"Ignoring broken {indexFilename}: {E}")
+        return None
+
+    stat=os.stat(filename)
+    if content.get("size")!=stat.st_size or content.get("mtime")!=stat.st_mtime_ns:
+        logging.debug(f"{indexFilename} is outdated")
+        return None
+    return [SnapshotRef(*values) for values in content["snapshots"]]
+
+
+def _writeIndexFile(filename:str, refs:list[SnapshotRef]):
+    stat=os.stat(filename)
+    content={
+        "size": stat.st_size,
+        "mtime": stat.st_mtime_ns,
+        "snapshots": [[ref.timestamp, ref.uuid, ref.offset, ref.length, ref.keyframe] for ref in refs]
+    }
+    with open(filename+".index", "w", encoding="utf8") as outfile:
+        json.dump(content, outfile, separators=(",", ":"))
+        outfile.close()
+
+
+def _loadKlineArchive(filename:str) -> KlineArchive:
+    archive=KlineArchive()
+    archiveFilename=filename+".klines"
+    if os.path.isfile(archiveFilename):
+        with open(archiveFilename, "r", encoding="utf8") as infile:
+            archive.fromJSON(json.load(infile))
+            infile.close()
+    return archive
+
+
+def _saveKlineArchive(filename:str, archive:KlineArchive):
+    # must be written before the sets which refer to the new months
+    if len(archive.newMonths)==0:
+        return
+    archiveFilename=filename+".klines"
+    with open(archiveFilename+".tmp", "w", encoding="utf8") as outfile:
+        json.dump(archive.toJSON(), outfile, separators=(",", ":"))
+        outfile.flush()
+        os.fsync(outfile.fileno())
+        outfile.close()
+    os.replace(archiveFilename+".tmp", archiveFilename)
+    archive.newMonths=[]
+
+
+def _readEntriesAt(filename:str, refs:list[SnapshotRef]):
+    # read only the bytes of the requested sets
+    with open(filename, "rb") as infile:
+        for ref in refs:
+            infile.seek(ref.offset)
+            yield json.loads(infile.read(ref.length))
+        infile.close()
+
+
+class JsonStorage:
+    """
+    One JSON document (database.json), every save rewrites all sets.
+    """
+
+    name:str = "json"
+
+    # bytes read at once while scanning, doubled while a set does not fit
+    CHUNK_SIZE: int = 1024*1024
+
+    def getFilename(self) -> str:
+        return Files.getDatabaseFilenameWithPath(self.account)
+
+    def exists(self) -> bool:
+        return Files.databaseExists(self.account)
+
+    def getKlineArchive(self) -> KlineArchive:
+        if self.klineArchive is None:
+            self.klineArchive=_loadKlineArchive(self.getFilename())
+        return self.klineArchive
+
+    def __init__(self, account:str=""):
+        # closed klines of all sets, loaded when needed
+        self.klineArchive:KlineArchive|None=None
+
+        # name of the account, part of the filename
+        self.account:str=account
+
+    def _scan(self):
+        """
+        Reads the list of sets one element after another and yields (offset, length, entry),
+        so only one set is held in memory at a time.
+        """
+        decoder=json.JSONDecoder()
+        utf8=codecs.getincrementaldecoder("utf8")()
+        chunkSize=JsonStorage.CHUNK_SIZE
+        with open(self.getFilename(), "rb") as infile:
+            # offset is the file position of buffer[position]
+            buffer=""
+            position=0
+            offset=0
+            started=False
+            eof=False
+            while True:
+                if not started:
+                    start=buffer.find('"binanceDataSet"')
+                    bracket=buffer.find("[", start) if start>=0 else -1
+                    if bracket>=0:
+                        offset=len(buffer[:bracket+1].encode("utf8"))
+                        position=bracket+1
+                        started=True
+                        continue
+                else:
+                    while position<len(buffer) and buffer[position] in " \t\r\n,":
+                        position+=1
+                        offset+=1
+                    if position<len(buffer):
+                        if buffer[position]=="]":
+                            return
+                        try:
+                            entry, end=decoder.raw_decode(buffer, position)
+                        except json.JSONDecodeError:
+                            # set is not complete in buffer, read more
+                            if eof:
+                                raise
+                        else:
+                            length=len(buffer[position:end].encode("utf8"))
+                            yield offset, length, entry
+                            offset+=length
+                            position=end
+                            chunkSize=JsonStorage.CHUNK_SIZE
+                            continue
+
+                if eof:
+                    raise ValueError(f"Unexpected end of {self.getFilename()}")
+                chunk=infile.read(chunkSize)
+                eof=len(chunk)==0
+                buffer=buffer[position:]+utf8.decode(chunk, final=eof)
+                position=0
+                chunkSize*=2
+
+    def loadIndex(self) -> list[SnapshotRef]:
+        refs=_readIndexFile(self.getFilename())
+        if refs is None:
+            refs=_uniqueRefs([_createRef(entry,offset,length) for offset, length, entry in self._scan()])
+            _writeIndexFile(self.getFilename(),refs)
+        return refs
+
+    def iterSelected(self, refs:list[SnapshotRef]):
+        archive=self.getKlineArchive()
+        for entry in _readEntriesAt(self.getFilename(),refs):
+            yield archive.resolve(entry)
+
+    def load(self) -> list[dict]:
+        with open(self.getFilename(), "r", encoding="utf8") as infile:
+            jsonContent=json.load(infile)
+            logging.debug(jsonContent)
+            infile.close()
+        archive=self.getKlineArchive()
+        return [archive.resolve(entry) for entry in jsonContent["binanceDataSet"]]
+
+    def save(self, dataSet):
+        # stored sets are copied without parsing them, only new sets are serialized
+        refs=self.loadIndex() if self.exists() else []
+        self._write(refs,[entry.toJSON() for entry in dataSet.unsavedSets])
+
+    def rewrite(self, entries):
+        # entries may be a generator, e.g. streamed from another storage
+        self._write([],entries)
+
+    def update(self, refs:list[SnapshotRef], entries):
+        # the document is written again, the other sets are copied without parsing them
+        replaced={ref.uuid for ref in refs}
+        self._write([ref for ref in self.loadIndex() if ref.uuid not in replaced],entries)
+
+    def compact(self) -> int:
+        # rewrites all sets, klines of sets stored before the kline archive are moved into it
+        refs=self.loadIndex()
+        self.rewrite(self.iterSelected(refs))
+        return len(refs)
+
+    def _write(self, refs:list[SnapshotRef], newEntries):
+        archive=self.getKlineArchive()
+        newRefs:list[SnapshotRef]=[]
+
+        # same layout as json.dump with indent 4
+        tempFilename=self.getFilename()+".tmp"
+        with open(tempFilename, "wb") as outfile:
+            # v5, klines are stored in the kline archive
+            outfile.write(b'{\n    "version": 5,\n    "binanceDataSet": [\n')
+
+            def writeEntry(content:bytes, entry:dict):
+                if len(newRefs)>0:
+                    outfile.write(b",\n")
+                outfile.write(b"        ")
+                newRefs.append(_createRef(entry,outfile.tell(),len(content)))
+                outfile.write(content)
+
+            if len(refs)>0:
+                with open(self.getFilename(), "rb") as infile:
+                    for ref in refs:
+                        infile.seek(ref.offset)
+                        content=infile.read(ref.length)
+                        writeEntry(content,{"timestamp": ref.timestamp, "uuid": ref.uuid})
+                    infile.close()
+
+            for entry in newEntries:
+                entry=archive.reference(entry)
+                content=json.dumps(entry, indent=4, sort_keys=False).replace("\n","\n        ").encode("utf8")
+                writeEntry(content,entry)
+
+            outfile.write(b"\n    ]\n}")
+            outfile.flush()
+            os.fsync(outfile.fileno())
+            outfile.close()
+        _saveKlineArchive(self.getFilename(),archive)
+        os.replace(tempFilename, self.getFilename())
+        _writeIndexFile(self.getFilename(),newRefs)
+
+
+class JsonLinesStorage:
+    """
+    Append-only log (database.jsonl) with one CryptoSet per line,
+    a save writes only the sets which have not been saved before.
+    With a keyframe interval K, every K-th set is stored complete and
+    the sets in between as changes to the set before (SnapshotDelta).
+    """
+
+    name:str = "jsonl"
+
+    # sets appended at once by update
+    UPDATE_BATCH_SIZE: int = 500
+
+    def getFilename(self) -> str:
+        return Files.getDatabaseLogFilenameWithPath(self.account)
+
+    def exists(self) -> bool:
+        return Files.databaseLogExists(self.account)
+
+    def getKlineArchive(self) -> KlineArchive:
+        if self.klineArchive is None:
+            self.klineArchive=_loadKlineArchive(self.getFilename())
+        return self.klineArchive
+
+    def __init__(self, keyframeInterval:int=0, account:str=""):
+        # closed klines of all sets, loaded when needed
+        self.klineArchive:KlineArchive|None=None
+
+        # name of the account, part of the filename
+        self.account:str=account
+
+        # 0 or 1 stores every set complete
+        self.keyframeInterval:int=keyframeInterval
+
+    def _scan(self):
+        # yields (offset, length, entry) of every line, one after another
+        with open(self.getFilename(), "rb") as infile:
+            offset=0
+            for lineNr, line in enumerate(infile, start=1):
+                if line.strip()!=b"":
+                    try:
+                        yield offset, len(line.rstrip(b"\r\n")), json.loads(line)
+                    except ValueError as E:
+                        # e.g. an interrupted append, removed by the next compaction
+                        logging.error(f"Skipping broken line {lineNr} in {self.getFilename()}: {E}")
+                offset+=len(line)
+            infile.close()
+
+    def _scanKeys(self):
+        # yields (offset, length, timestamp, uuid, isDelta) of every line
+        for offset, length, entry in self._scan():
+            ref=_createRef(entry,offset,length)
+            yield offset, length, ref.timestamp, ref.uuid, SnapshotDelta.isDelta(entry)
+
+    def _readRecordAt(self, infile, offset:int) -> tuple[dict | None, int]:
+        # returns the entry at offset (None for a broken line) and the offset of the next one
+        infile.seek(offset)
+        line=infile.readline()
+        if line==b"":
+            raise ValueError(f"Unexpected end of {self.getFilename()}")
+        try:
+            entry=json.loads(line) if line.strip()!=b"" else None
+        except ValueError:
+            entry=None
+        return entry, offset+len(line)
+
+    def load(self) -> list[dict]:
+        archive=self.getKlineArchive()
+        entries:list[dict]=[]
+        previous:dict|None=None
+        for offset, length, entry in self._scan():
+            if SnapshotDelta.isDelta(entry):
+                try:
+                    entry=SnapshotDelta.decode(entry,previous)
+                except ValueError as E:
+                    logging.error(f"Skipping set at {offset} in {self.getFilename()}: {E}")
+                    continue
+            previous=entry
+            entries.append(archive.resolve(entry))
+        return entries
+
+    def loadIndex(self) -> list[SnapshotRef]:
+        refs=_readIndexFile(self.getFilename())
+        if refs is None:
+            refs=[]
+            keyframe:int|None=None
+            for offset, length, timestamp, uuid, isDelta in self._scanKeys():
+                if not isDelta or keyframe is None:
+                    keyframe=offset
+                refs.append(SnapshotRef(timestamp,uuid,offset,length,keyframe))
+            refs=_uniqueRefs(refs)
+            _writeIndexFile(self.getFilename(),refs)
+        return refs
+
+    def _iterStored(self, refs:list[SnapshotRef]):
+        """
+        Yields the sets as stored, but complete. A set stored as changes is rebuilt from its keyframe,
+        when the sets are requested in file order, the next set continues from the set before.
+        """
+        with open(self.getFilename(), "rb") as infile:
+            current:dict|None=None
+            currentOffset=-1
+            nextOffset=0
+            for ref in refs:
+                if current is not None and ref.keyframe<=currentOffset<=ref.offset:
+                    entry, offset, position=current, currentOffset, nextOffset
+                else:
+                    entry, offset, position=None, None, ref.keyframe
+
+                while offset!=ref.offset:
+                    if position>ref.offset:
+                        raise ValueError(f"Set {ref.uuid} not found at {ref.offset} in {self.getFilename()}")
+                    stored, nextPosition=self._readRecordAt(infile,position)
+                    if stored is not None:
+                        entry=SnapshotDelta.decode(stored,entry) if SnapshotDelta.isDelta(stored) else stored
+                        offset=position
+                    position=nextPosition
+
+                current, currentOffset, nextOffset=entry, offset, position
+                yield entry
+            infile.close()
+
+    def iterSelected(self, refs:list[SnapshotRef]):
+        archive=self.getKlineArchive()
+        for entry in self._iterStored(refs):
+            yield archive.resolve(entry)
+
+    def _encodeDeltas(self, entries:list[dict], refs:list[SnapshotRef]) -> list[dict]:
+        # refs are the sets already in the file, in file order
+        if self.keyframeInterval<=1 or len(entries)==0:
+            return entries
+
+        previous:dict|None=None
+        chainLength=0
+        if len(refs)>0:
+            previous=list(self._iterStored([refs[-1]]))[0]
+            chainLength=len([ref for ref in refs if ref.keyframe==refs[-1].keyframe])
+
+        encoded:list[dict]=[]
+        for entry in entries:
+            if previous is None or chainLength>=self.keyframeInterval:
+                encoded.append(entry)
+                chainLength=1
+            else:
+                encoded.append(SnapshotDelta.encode(entry,previous))
+                chainLength+=1
+            previous=entry
+        return encoded
+
+    def _getKeyframe(self, entry:dict, offset:int, refs:list[SnapshotRef]) -> int:
+        return refs[-1].keyframe if SnapshotDelta.isDelta(entry) else offset
+
+    def _writeLines(self, outfile, entries:list[dict], refs:list[SnapshotRef]):
+        for entry in entries:
+            line=json.dumps(entry, separators=(",", ":")).encode("utf8")
+            offset=outfile.tell()
+            refs.append(_createRef(entry,offset,len(line),self._getKeyframe(entry,offset,refs)))
+            outfile.write(line+b"\n")
+        outfile.flush()
+        os.fsync(outfile.fileno())
+
+    def _getEnd(self, infile, refs:list[SnapshotRef]) -> int:
+        # end of the last complete line, a last line without line break gets one
+        if len(refs)==0:
+            return 0
+        last=max(refs, key=lambda ref: ref.offset)
+        infile.seek(last.offset)
+        line=infile.readline()
+        if not line.endswith(b"\n"):
+            infile.write(b"\n")
+            line+=b"\n"
+        return last.offset+len(line)
+
+    def _truncateIncomplete(self, refs:list[SnapshotRef]):
+        """
+        Removes what an interrupted append left behind the last complete set,
+        otherwise the next append would continue the incomplete one.
+        """
+        with open(self.getFilename(), "r+b") as infile:
+            end=self._getEnd(infile,refs)
+            size=infile.seek(0,os.SEEK_END)
+            if size>end:
+                logging.error(f"Removing incomplete set at {end} in {self.getFilename()}")
+                infile.truncate(end)
+            infile.close()
+
+    def append(self, entries:list[dict]):
+        # the index is extended by the appended lines instead of scanning the log again
+        refs=self.loadIndex() if self.exists() else []
+        if self.exists():
+            self._truncateIncomplete(refs)
+        archive=self.getKlineArchive()
+        entries=self._encodeDeltas([archive.reference(entry) for entry in entries],refs)
+        _saveKlineArchive(self.getFilename(),archive)
+        with open(self.getFilename(), "ab") as outfile:
+            self._writeLines(outfile,entries,refs)
+            outfile.close()
+        _writeIndexFile(self.getFilename(),_uniqueRefs(refs))
+
+    def rewrite(self, entries:list[dict]):
+        # write into a temporary file first, so a crash never leaves a half written log
+        tempFilename=self.getFilename()+".tmp"
+        refs:list[SnapshotRef]=[]
+        archive=self.getKlineArchive()
+        entries=self._encodeDeltas([archive.reference(entry) for entry in entries],refs)
+        _saveKlineArchive(self.getFilename(),archive)
+        with open(tempFilename, "wb") as outfile:
+            self._writeLines(outfile,entries,refs)
+            outfile.close()
+        os.replace(tempFilename, self.getFilename())
+        _writeIndexFile(self.getFilename(),_uniqueRefs(refs))
+
+    def save(self, dataSet):
+        self.append([entry.toJSON() for entry in dataSet.unsavedSets])
+
+    def update(self, refs:list[SnapshotRef], entries):
+        """
+        Appends the changed sets, the last written entry of a set wins. The former entries
+        stay in the log until the next compact.
+        """
+        batch:list[dict]=[]
+        for entry in entries:
+            batch.append(entry)
+            if len(batch)>=JsonLinesStorage.UPDATE_BATCH_SIZE:
+                self.append(batch)
+                batch=[]
+        if len(batch)>0:
+            self.append(batch)
+
+    def compact(self) -> int:
+        """
+        Rewrites the log sorted by timestamp, without duplicates and broken lines,
+        klines of sets stored before the kline archive are moved into it.
+
+        :return: nr. of sets in the compacted log
+        """
+        entries:dict[str, dict]={}
+        for entry in self.load():
+            # the last written entry of a set wins
+            key=entry.get("uuid",entry["timestamp"])
+            entries[key]=entry
+
+        sortedEntries=sorted(entries.values(), key=lambda e: float(e["timestamp"]))
+        self.rewrite(sortedEntries)
+        return len(sortedEntries)
+
+
+class BinaryStorage(JsonLinesStorage):
+    """
+    Append-only file (database.bin) like jsonl, with sets in the compact format of SnapshotCodec.
+    """
+
+    name:str = "binary"
+
+    def getFilename(self) -> str:
+        return Files.getDatabaseBinaryFilenameWithPath(self.account)
+
+    def exists(self) -> bool:
+        return Files.databaseBinaryExists(self.account)
+
+    def _scan(self, decode=SnapshotCodec.decode):
+        # yields (offset, length, decoded payload) of every record, one after another
+        with open(self.getFilename(), "rb") as infile:
+            SnapshotCodec.decodeHeader(infile.read(SnapshotCodec.HEADER.size))
+            offset=SnapshotCodec.HEADER.size
+            while True:
+                lengthBytes=infile.read(SnapshotCodec.LENGTH.size)
+                if len(lengthBytes)<SnapshotCodec.LENGTH.size:
+                    break
+                length=SnapshotCodec.LENGTH.unpack(lengthBytes)[0]
+                payload=infile.read(length)
+                if len(payload)<length:
+                    # e.g. an interrupted append, removed by the next compaction
+                    logging.error(f"Skipping incomplete record at {offset} in {self.getFilename()}")
+                    break
+                try:
+                    decoded=decode(payload)
+                except (ValueError, IndexError, struct.error) as E:
+                    # the sets behind it cannot be found without their length, removed by the next append
+                    logging.error(f"Skipping broken record at {offset} in {self.getFilename()}: {E}")
+                    break
+                offset+=SnapshotCodec.LENGTH.size
+                yield offset, length, decoded
+                offset+=length
+            infile.close()
+
+    def _getEnd(self, infile, refs:list[SnapshotRef]) -> int:
+        # end of the last complete record, a file without complete header is written again
+        if len(refs)==0:
+            return SnapshotCodec.HEADER.size if infile.seek(0,os.SEEK_END)>=SnapshotCodec.HEADER.size else 0
+        last=max(refs, key=lambda ref: ref.offset)
+        return last.offset+last.length
+
+    def _scanKeys(self):
+        # only timestamp, uuid and the delta flag of each record are decoded
+        for offset, length, (timestamp, uuid, isDelta) in self._scan(decode=SnapshotCodec.decodeKey):
+            yield offset, length, timestamp, uuid if uuid is not None else "%s" % (timestamp), isDelta
+
+    def _readRecordAt(self, infile, offset:int) -> tuple[dict | None, int]:
+        # offset is the start of the payload, behind its length
+        infile.seek(offset-SnapshotCodec.LENGTH.size)
+        lengthBytes=infile.read(SnapshotCodec.LENGTH.size)
+        if len(lengthBytes)<SnapshotCodec.LENGTH.size:
+            raise ValueError(f"Unexpected end of {self.getFilename()}")
+        length=SnapshotCodec.LENGTH.unpack(lengthBytes)[0]
+        return SnapshotCodec.decode(infile.read(length)), offset+length+SnapshotCodec.LENGTH.size
+
+    def _writeLines(self, outfile, entries:list[dict], refs:list[SnapshotRef]):
+        if outfile.tell()==0:
+            outfile.write(SnapshotCodec.encodeHeader())
+        for entry in entries:
+            payload=SnapshotCodec.encode(entry)
+            outfile.write(SnapshotCodec.LENGTH.pack(len(payload)))
+            offset=outfile.tell()
+            refs.append(_createRef(entry,offset,len(payload),self._getKeyframe(entry,offset,refs)))
+            outfile.write(payload)
+        outfile.flush()
+        os.fsync(outfile.fileno())
+
+
+def createStorage(name:str, keyframeInterval:int=0, account:str=""):
+    """
+    Returns the storage backend for the given settings name and account, the keyframe interval is used by the logs.
+    """
+    # imported here, sqlite is only needed when configured
+    from sqlitestorage import SqliteStorage
+
+    allStorages={
+        JsonStorage.name: JsonStorage,
+        JsonLinesStorage.name: JsonLinesStorage,
+        BinaryStorage.name: BinaryStorage,
+        SqliteStorage.name: SqliteStorage,
+    }
+    if name not in allStorages:
+        raise ValueError(f"Unknown storage {name}, use one of {', '.join(allStorages.keys())}")
+    if issubclass(allStorages[name], JsonLinesStorage):
+        return allStorages[name](keyframeInterval=keyframeInterval, account=account)
+    return allStorages[name](account=account)
+
+
+# Test function for module
+def _test():
+    # files of a test account next to the script, removed at the end
+    account="_test"
+
+    def createEntry(nr:int, total:str) -> dict:
+        # the last candle is still open, the ones before go into the kline archive
+        klines={"symbol": "USDC", "volumes": [1.0, 2.0, float(nr)], "closes": [10.0, 20.0, 30.0+nr]}
+        return {"uuid": f"set-{nr}", "timestamp": "%s" % (1748736000.0+nr*3600), "time": f"t{nr}",
+                "crypto": [{"asset": "ETH", "totalValue": total, "klines": klines}, {"asset": "BTC", "totalValue": "1.00000000"}],
+                "totals": {}}
+
+    def removeFiles(storage):
+        for extension in ("", ".index", ".klines", ".tmp"):
+            if os.path.isfile(storage.getFilename()+extension):
+                os.remove(storage.getFilename()+extension)
+
+    def readAll(storage) -> dict[str, dict]:
+        return {entry["uuid"]: entry for entry in storage.iterSelected(storage.loadIndex())}
+
+    entries=[createEntry(nr,"%d.00000000" % (nr)) for nr in range(7)]
+    changed=createEntry(2,"99.00000000")
+    expected={entry["uuid"]: entry for entry in entries}
+    expected[changed["uuid"]]=changed
+
+    allStorages=[JsonStorage(account=account), JsonLinesStorage(account=account), JsonLinesStorage(keyframeInterval=3, account=account), BinaryStorage(keyframeInterval=3, account=account)]
+    try:
+        for storage in allStorages:
+            removeFiles(storage)
+            storage=createStorage(storage.name,keyframeInterval=getattr(storage,"keyframeInterval",0),account=account)
+
+            # one save per set, delta chains continue across saves
+            if isinstance(storage, JsonLinesStorage):
+                for entry in entries:
+                    storage.append([entry])
+                    storage=createStorage(storage.name,keyframeInterval=storage.keyframeInterval,account=account)
+            else:
+                storage.rewrite(entries)
+            refs=storage.loadIndex()
+            assert [ref.uuid for ref in refs]==[entry["uuid"] for entry in entries]
+            assert list(storage.iterSelected(refs))==entries
+            # single sets are rebuilt from their keyframe
+            assert list(storage.iterSelected([refs[5], refs[1]]))==[entries[5], entries[1]]
+
+            # closed klines are stored once in the archive
+            assert os.path.isfile(storage.getFilename()+".klines")
+            assert storage.getKlineArchive().allMonths["ETHUSDC"]=={"2025-04": [1.0, 10.0], "2025-05": [2.0, 20.0]}
+
+            # a set written again, e.g. by --revalue, replaces the former one
+            storage.update([refs[2]],[changed])
+            storage=createStorage(storage.name,keyframeInterval=getattr(storage,"keyframeInterval",0),account=account)
+            assert readAll(storage)==expected
+            os.remove(storage.getFilename()+".index")
+            assert readAll(storage)==expected
+
+            if isinstance(storage, JsonLinesStorage):
+                assert storage.compact()==len(entries)
+                assert [entry["uuid"] for entry in storage.load()]==[entry["uuid"] for entry in entries]
+                assert readAll(storage)==expected
+
+        # a set of version 1, e.g. imported from database.json, keeps its values in the sqlite columns
+        from cryptoset import CryptoSet
+        v1={"uuid": "set-v1", "timestamp": "1600000000.5", "time": "t1", "totalBTC": "0.50000000",
+            "crypto": [{"asset": "ETH", "orderWalletFree": "1.00000000", "orderWalletLocked": "0.00000000", "orderWalletTotal": "1.00000000",
+                        "liquidSwapValue": "0.00000000", "savingsWalletFlexible": "2.00000000", "earnStaking": "3.00000000", "totalBTCValue": "0.10000000"}]}
+        storage=createStorage("sqlite",account=account)
+        allStorages.append(storage)
+        removeFiles(storage)
+        storage.append([v1])
+        loaded=CryptoSet()
+        loaded.fromJSON(readAll(storage)["set-v1"])
+        eth=loaded.allCryptos["ETH"]
+        assert (loaded.totalBTC.total, eth.earnFlexible, eth.earnLocked, eth.allTotals["BTC"].total, eth.getTotal())==(0.5, 2.0, 3.0, 0.1, 6.0)
+    finally:
+        for storage in allStorages:
+            removeFiles(storage)
+
+    # end
+    print(__file__+": All module tests did run fine.")
+
+# when file ist started directly
+if __name__ == '__main__':
+    _test()
@@ -0,0 +1,95 @@
+# class to look up available trading pairs without asking the API
+# License: MIT
+# Author: mhl5k
+
+import logging
+
+
+class SymbolIndex:
+
+    # quote assets used to split ticker symbols when an asset is not in the account list
+    COMMON_QUOTES: list[str] = ["USDT", "USDC", "FDUSD", "BTC", "ETH", "BNB", "EUR", "TRY", "BRL", "JPY"]
+
+    def addPair(self, base:str, quote:str, symbol:str):
+        self.allQuotes.setdefault(base,set()).add(quote)
+        self.allPairs[symbol]=(base,quote)
+
+    def hasPair(self, base:str, quote:str) -> bool:
+        return quote in self.allQuotes.get(base,())
+
+    def getQuotes(self, base:str) -> set[str]:
+        return self.allQuotes.get(base,set())
+
+    def getPairsOf(self, asset:str) -> list[str]:
+        """
+        Returns all symbols with the asset as base or quote, e.g. for debugging.
+        """
+        pairs=[base+asset for base in self.allBases.get(asset,())]
+        pairs+=[asset+quote for quote in self.allQuotes.get(asset,())]
+        return pairs
+
+    def pickQuote(self, base:str, preferredQuotes:list[str]) -> str | None:
+        """
+        Returns the first preferred quote which is traded with the base asset.
+
+        :param base: base asset, e.g. ETH
+        :param preferredQuotes: quotes in order of preference, e.g. ["USDC", "BTC"]
+        :return: the quote or None when no pair is available
+        """
+        quotes=self.allQuotes.get(base,())
+        for quote in preferredQuotes:
+            if quote in quotes:
+                return quote
+        return None
+
+    def _buildReverse(self):
+        # base assets per quote asset
+        self.allBases={}
+        for base, quotes in self.allQuotes.items():
+            for quote in quotes:
+                self.allBases.setdefault(quote,set()).add(base)
+
+    @staticmethod
+    def fromTickers(priceTickers:list, knownAssets:list[str]) -> "SymbolIndex":
+        """
+        Builds the index from ticker_price data. Symbols are split into base and
+        quote by the known assets of the account, the longest matching quote wins.
+        """
+        index=SymbolIndex()
+        assets=set(knownAssets)
+        quoteAssets=assets | set(SymbolIndex.COMMON_QUOTES)
+        unknown=0
+        for entry in priceTickers:
+            symbol:str=entry["symbol"]
+            for i in range(1,len(symbol)):
+                base, quote = symbol[:i], symbol[i:]
+                if quote in quoteAssets and (base in assets or quote in SymbolIndex.COMMON_QUOTES):
+                    index.addPair(base,quote,symbol)
+                    break
+            else:
+                unknown+=1
+        index._buildReverse()
+        logging.debug(f"Symbol index from tickers: {len(index.allPairs)} pairs, {unknown} symbols not splittable")
+        return index
+
+    @staticmethod
+    def fromExchangeInfo(exchangeInfo:dict) -> "SymbolIndex":
+        """
+        Builds the index from exchange_info data, which names base and quote of every symbol.
+        """
+        index=SymbolIndex()
+        for entry in exchangeInfo["symbols"]:
+            index.addPair(entry["baseAsset"],entry["quoteAsset"],entry["symbol"])
+        index._buildReverse()
+        logging.debug(f"Symbol index from exchange info: {len(index.allPairs)} pairs")
+        return index
+
+    def __init__(self):
+        # quote assets per base asset, e.g. "ETH": {"BTC", "USDC"}
+        self.allQuotes:dict[str, set[str]]={}
+
+        # base assets per quote asset
+        self.allBases:dict[str, set[str]]={}
+
+        # base and quote per symbol, e.g. "ETHBTC": ("ETH", "BTC")
+        self.allPairs:dict[str, tuple[str, str]]={}
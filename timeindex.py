@@ -0,0 +1,84 @@
+# class to find stored sets by time
+# License: MIT
+# Author: mhl5k
+
+from bisect import bisect_left, bisect_right
+
+from storage import SnapshotRef
+
+
+class SnapshotTimeIndex:
+    """
+    All SnapshotRefs sorted by timestamp, lookups are done by bisection.
+    """
+
+    def add(self, ref:SnapshotRef):
+        # new sets are usually the newest ones, no insert in between needed
+        if len(self.timestamps)==0 or ref.timestamp>=self.timestamps[-1]:
+            self.timestamps.append(ref.timestamp)
+            self.allRefs.append(ref)
+        else:
+            position=bisect_right(self.timestamps,ref.timestamp)
+            self.timestamps.insert(position,ref.timestamp)
+            self.allRefs.insert(position,ref)
+
+    def addAll(self, refs:list[SnapshotRef]):
+        if len(refs)==0:
+            return
+        self.allRefs=sorted(self.allRefs+list(refs), key=lambda x: x.timestamp)
+        self.timestamps=[ref.timestamp for ref in self.allRefs]
+
+    def getFirst(self) -> SnapshotRef | None:
+        return self.allRefs[0] if len(self.allRefs)>0 else None
+
+    def getLast(self) -> SnapshotRef | None:
+        return self.allRefs[-1] if len(self.allRefs)>0 else None
+
+    def getNearestBefore(self, timestamp:float) -> SnapshotRef | None:
+        """
+        Returns the set with the highest timestamp lower or equal the given timestamp.
+        """
+        position=bisect_right(self.timestamps,timestamp)
+        return self.allRefs[position-1] if position>0 else None
+
+    def getNearestBeforeAll(self, timestamps:list[float]) -> list[SnapshotRef | None]:
+        """
+        Returns getNearestBefore for each of the given timestamps.
+        """
+        positions=[bisect_right(self.timestamps,timestamp) for timestamp in timestamps]
+        return [self.allRefs[position-1] if position>0 else None for position in positions]
+
+    def getBefore(self, timestamp:float) -> SnapshotRef | None:
+        """
+        Returns the set with the highest timestamp lower than the given timestamp.
+        """
+        position=bisect_left(self.timestamps,timestamp)
+        return self.allRefs[position-1] if position>0 else None
+
+    def getNearestAfter(self, timestamp:float) -> SnapshotRef | None:
+        """
+        Returns the set with the lowest timestamp greater or equal the given timestamp.
+        """
+        position=bisect_left(self.timestamps,timestamp)
+        return self.allRefs[position] if position<len(self.allRefs) else None
+
+    def getRange(self, startTimestamp:float, endTimestamp:float) -> list[SnapshotRef]:
+        """
+        Returns all sets with startTimestamp <= timestamp <= endTimestamp, oldest first.
+        """
+        return self.allRefs[bisect_left(self.timestamps,startTimestamp):bisect_right(self.timestamps,endTimestamp)]
+
+    def __len__(self) -> int:
+        return len(self.allRefs)
+
+    def __getitem__(self, position):
+        return self.allRefs[position]
+
+    def __iter__(self):
+        return iter(self.allRefs)
+
+    def __init__(self, refs:list[SnapshotRef]|None=None):
+        # same order in both lists, timestamps are kept separately for bisect
+        self.allRefs:list[SnapshotRef]=[]
+        self.timestamps:list[float]=[]
+        self.addAll(refs or [])
@@ -0,0 +1,62 @@
+# class to value all cryptos of a set in several quote currencies at once
+# License: MIT
+# Author: mhl5k
+
+import logging
+
+from crypto import Crypto, PriceConversion
+from conversiongraph import ConversionGraph
+
+
+class ValuationEngine:
+    """
+    Values the total and the deposit of all cryptos in all quote currencies in one pass,
+    with the precomputed rates of the conversion graph. One engine belongs to one price
+    snapshot, each gathering values a single set with it.
+    """
+
+    def getRates(self, asset:str) -> list[tuple[str, float]]:
+        """
+        Returns (currency, rate) of all currencies the asset can be converted into.
+        """
+        return [(currency, rates[asset]) for currency, rates in self.allRates.items() if asset in rates]
+
+    def valueCryptos(self, allCryptos:dict[str, Crypto]) -> dict[str, tuple[float, float]]:
+        """
+        Sets the converted totals of all cryptos and returns the sums of total and deposit per currency.
+        """
+        totals:dict[str, float]=dict.fromkeys(self.currencies,0.0)
+        deposits:dict[str, float]=dict.fromkeys(self.currencies,0.0)
+        unconvertible:dict[str, list[str]]={currency: [] for currency in self.currencies}
+
+        ConvertedTotal=Crypto.ConvertedTotal
+        for c in allCryptos.values():
+            total=c.getTotal()
+            deposit=c.paymentDeposit
+            rates=self.getRates(c.name)
+            for currency, rate in rates:
+                t=ConvertedTotal(currency,total*rate,deposit*rate)
+                c.allTotals[currency]=t
+                totals[currency]+=t.total
+                deposits[currency]+=t.deposit
+            if len(rates)<len(self.currencies):
+                for currency in self.currencies:
+                    if c.name not in self.allRates[currency]:
+                        unconvertible[currency].append(c.name)
+
+        for currency, names in unconvertible.items():
+            if len(names)>0:
+                logging.error(f"Cannot convert to {currency}: {', '.join(names)}")
+
+        return {currency: (totals[currency], deposits[currency]) for currency in self.currencies}
+
+    def __init__(self, currencies:list[str], graph:ConversionGraph|None=None):
+        # quote currencies, in order of the converted totals of each crypto
+        self.currencies:list[str]=list(dict.fromkeys(currencies))
+        graph=graph if graph is not None else PriceConversion.graph
+
+        # routes are resolved once per currency by the graph
+        for currency in self.currencies:
+            if currency not in graph.allRates:
+                graph.precompute(currency)
+        self.allRates:dict[str, dict[str, float]]={currency: graph.allRates[currency] for currency in self.currencies}